@@ -1,5 +1,180 @@
+import json
+import sqlite3
+from contextlib import closing
+
 import pandas as pd
+from pandas.api.types import union_categoricals
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+# columns of the data lake the cleaning functions below actually use
+DONOR_COLUMNS = ['id', 'is_anonymous', 'user.string', 'amount', 'created', 'time_scrapped', 'short_url']
+CAMPAIGN_COLUMNS = ['id', 'short_url', 'is_forever_running', 'is_open_goal', 'donation_received', 'donation_count', 
+                    'donation_target', 'donation_percentage', 'campaign_start', 'campaign_last_update', 'days_remaining', 
+                    'is_open_for_donation', 'is_verified', 'campaigner.type', 'category.name', 'time_scraped']
+
+# compact dtypes of the donor columns in memory, both for the raw (created) and the cleaned (created_unix) files
+# created_ts is left out on purpose, it's the same instant as created_unix and can be derived from it when needed
+DONOR_SCHEMA = {'id': 'int64', 'is_anonymous': 'boolean', 'user.string': 'category', 'amount': 'int64', 'created': 'int64',
+                'created_unix': 'int64', 'time_scrapped': 'category', 'short_url': 'category'}
+
+
+def load_donors(lake_path, short_urls=None):
+    '''
+    Function for loading the donors from the data lake, reading only the columns used by clean_donors.
+
+    Parameters:
+    - lake_path (str): Folder of the data lake, e.g. 'data/lake/'.
+    - short_urls (list, optional): Only load the donors of these campaigns, skipping the partitions of the others. Defaults to all of them.
+    
+    Returns:
+    - DataFrame: The donors, with the compact dtypes of DONOR_SCHEMA.
+    '''
+    filters = [('short_url', 'in', list(short_urls))] if short_urls is not None else None
+    df = pq.read_table(lake_path.rstrip('/') + '/donors', columns=DONOR_COLUMNS, filters=filters, partitioning='hive').to_pandas()
+    return _to_compact(df)
+
+
+def load_campaigns(lake_path, scrape_date):
+    '''
+    Function for loading a snapshot of the campaigns from the data lake, reading only the columns used by clean_donation.
+
+    Parameters:
+    - lake_path (str): Folder of the data lake, e.g. 'data/lake/'.
+    - scrape_date (str): The date of the snapshot, e.g. '2024-04-12'.
+    
+    Returns:
+    - DataFrame: The campaigns, with their dtypes kept.
+    '''
+    return pq.read_table(lake_path.rstrip('/') + '/project_props', columns=CAMPAIGN_COLUMNS, 
+                         filters=[('scrape_date', '=', scrape_date)], partitioning='hive').to_pandas()
+
+
+
+def load_campaigns_history(history_path, scrape_date=None):
+    '''
+    Function for rebuilding a snapshot of the campaigns from the change history of the scraper (its SnapshotStore),
+    for the runs that only recorded the changed properties instead of saving a full snapshot to the data lake.
+
+    Parameters:
+    - history_path (str): The snapshot store database, e.g. 'data/project_history.db'.
+    - scrape_date (str, optional): The date of the snapshot, e.g. '2024-04-12', the last run of that day (or before it) is taken. Defaults to the last run.
+
+    Returns:
+    - DataFrame: The campaigns read by that run with the columns used by clean_donation, time_scraped being the time of the run.
+    '''
+    with closing(sqlite3.connect(history_path)) as conn:
+        run = conn.execute('SELECT scraped_at, short_urls FROM project_runs WHERE substr(scraped_at, 1, 10) <= ? '
+                           'ORDER BY scraped_at DESC LIMIT 1', (scrape_date or '9999-12-31',)).fetchone()
+        if run is None:
+            return pd.DataFrame(columns=CAMPAIGN_COLUMNS)
+
+        scraped_at, short_urls = run
+        fields = [c for c in CAMPAIGN_COLUMNS if c not in ('short_url', 'time_scraped')]
+        rows = conn.execute(f"SELECT short_url, field, value FROM project_history WHERE valid_from <= ? AND (valid_to IS NULL OR valid_to > ?) "
+                            f"AND field IN ({','.join('?' * len(fields))})", [scraped_at, scraped_at] + fields).fetchall()
+
+    records = {short_url: {'short_url': short_url} for short_url in json.loads(short_urls)}
+    for short_url, field, value in rows:
+        if short_url in records:
+            records[short_url][field] = json.loads(value)
+
+    df = pd.DataFrame.from_records(list(records.values()), columns=CAMPAIGN_COLUMNS)
+    df['time_scraped'] = scraped_at
+    return df.infer_objects()
+
+
+def _to_compact(df):
+    # a failed or blank row has no id, amount or time, it's not a donation and can't be held in the int64 columns
+    missing = df[[column for column, dtype in DONOR_SCHEMA.items() if dtype == 'int64' and column in df]].isna().any(axis=1)
+    if missing.any():
+        df = df[~missing].reset_index(drop=True)
+
+    for column, dtype in DONOR_SCHEMA.items():
+        if column not in df:
+            continue
+        if dtype == 'boolean' and df[column].dtype == object:
+            df[column] = df[column].map({'True': True, 'False': False, True: True, False: False}).astype(dtype)
+        elif dtype == 'int64' and df[column].dtype != 'int64':
+            df[column] = pd.to_numeric(df[column]).astype(dtype)
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def _concat_compact(chunks, columns):
+    # a source without any donor, e.g. an empty partition, still gets the compact schema
+    if not chunks:
+        return pd.DataFrame({column: pd.Series(dtype=DONOR_SCHEMA[column]) for column in columns})
+
+    # concatenating categoricals with different categories would turn them back into python strings
+    columns = {}
+    for column in chunks[0].columns:
+        if isinstance(chunks[0][column].dtype, pd.CategoricalDtype):
+            columns[column] = union_categoricals([chunk[column] for chunk in chunks])
+        else:
+            columns[column] = pd.concat([chunk[column] for chunk in chunks], ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def load_donors_compact(source, chunksize=1000000, dedup=False):
+    '''
+    Function for loading a donors table with the compact dtypes of DONOR_SCHEMA, several times smaller in memory than a plain read.
+
+    The file is read chunk by chunk and every chunk is made compact right away, so the generic python objects
+    are never held for the whole table. The columns outside of DONOR_SCHEMA are not loaded.
+
+    Parameters:
+    - source (str): The donors as a CSV file (raw or cleaned), or as a Parquet file or dataset folder.
+    - chunksize (int, optional): Number of donors read at a time. Defaults to 1000000.
+    - dedup (bool, optional): Whether to drop the donations whose id was already loaded, keeping the first one. The scraper already
+                              drops them while crawling, so it's only needed for files scraped before it did. Defaults to False.
+
+    Returns:
+    - DataFrame: The donors.
+    '''
+    if str(source).endswith('.csv'):
+        # amount is read as a float since some files hold it as e.g. 5000.0, it's converted to int64 afterwards
+        dtype = {column: ('float64' if column == 'amount' else dtype) for column, dtype in DONOR_SCHEMA.items() if dtype != 'boolean'}
+        columns = [column for column in DONOR_SCHEMA if column in pd.read_csv(source, nrows=0).columns]
+        chunks = pd.read_csv(source, usecols=lambda column: column in DONOR_SCHEMA, dtype=dtype, chunksize=chunksize)
+    else:
+        dataset = ds.dataset(source, partitioning='hive')
+        columns = [column for column in DONOR_SCHEMA if column in dataset.schema.names]
+        chunks = (batch.to_pandas() for batch in dataset.to_batches(columns=columns, batch_size=chunksize))
+
+    compact, num_read = [], 0
+    for chunk in chunks:
+        num_read += len(chunk)
+        compact.append(_to_compact(chunk))
+    df = _concat_compact(compact, columns)
+    if len(df) < num_read:
+        print(f'Dropped {num_read - len(df)} rows without an id, amount or time.')
+
+    if dedup:
+        num_rows = len(df)
+        df = df[~df['id'].duplicated()].reset_index(drop=True)
+        print(f'Dropped {num_rows - len(df)} duplicated donations.')
+
+    print(f'Loaded {len(df)} donations, {memory_footprint(df)["total"] / 1024 ** 2:.1f} MB in memory.')
+    return df
+
 
+def memory_footprint(df):
+    '''
+    Function for measuring the memory used by a DataFrame, counting the python objects it holds.
+
+    Parameters:
+    - df (DataFrame): The DataFrame to measure.
+
+    Returns:
+    - dict: Bytes used by every column, and by the whole DataFrame under 'total'.
+    '''
+    usage = df.memory_usage(deep=True, index=True)
+    footprint = {column: int(usage[column]) for column in df.columns}
+    footprint['total'] = int(usage.sum())
+    return footprint
 
 def clean_donors(df, save_path):
     '''
@@ -12,11 +187,7 @@ def clean_donors(df, save_path):
     Returns:
     - DataFrame: Cleaned DataFrame.
     '''
-    columns = ['id', 'is_anonymous', 'user.string', 'amount', 'created', 'time_scrapped', 'short_url']  # only taking the important columns
-    df = df.loc[:, columns]
-    df = df.rename(columns={'created': 'created_unix'})  
-    df['created_ts'] = pd.to_datetime(df['created_unix'], unit='s')  # convert unix timestamp to utc timestamp
-    df = df[['id', 'is_anonymous', 'user.string', 'amount', 'created_unix', 'created_ts', 'time_scrapped', 'short_url']]  # rearrange the columns
+    df = _clean_donors_frame(df)
     
     print(df.head(5))
     df.to_csv(save_path, index=False)
@@ -35,10 +206,23 @@ def clean_donation(df, save_path):
     Returns:
     - DataFrame: Cleaned DataFrame.
     '''
-    columns = ['id', 'short_url', 'is_forever_running', 'is_open_goal', 'donation_received', 'donation_count', 
-               'donation_target', 'donation_percentage', 'campaign_start', 'campaign_last_update', 'days_remaining', 
-               'is_open_for_donation', 'is_verified', 'campaigner.type', 'category.name', 'time_scraped']
-    df = df.loc[:, columns]
+    df = _clean_donation_frame(df)
+    
+    print(df.head(5))
+    df.to_csv(save_path, index=False)
+    return df
+
+
+def _clean_donors_frame(df):
+    df = df.loc[:, DONOR_COLUMNS]  # only taking the important columns
+    df = df.rename(columns={'created': 'created_unix'})  
+    df['created_ts'] = pd.to_datetime(df['created_unix'], unit='s')  # convert unix timestamp to utc timestamp
+    df = df[['id', 'is_anonymous', 'user.string', 'amount', 'created_unix', 'created_ts', 'time_scrapped', 'short_url']]  # rearrange the columns
+    return df
+
+
+def _clean_donation_frame(df):
+    df = df.loc[:, CAMPAIGN_COLUMNS]
     df['start_ts_utc'] = pd.to_datetime(df['campaign_start'], unit='s')
     df['last_ts_utc'] = pd.to_datetime(df['campaign_last_update'], unit='s')
     df['days_running'] = (df['last_ts_utc'] - df['start_ts_utc']).dt.days
@@ -49,7 +233,67 @@ def clean_donation(df, save_path):
                         'donation_percentage', 'start_ts_utc', 'last_ts_utc', 'days_running', 'days_remaining', 'days_duration', 'is_open_for_donation', 
                         'is_verified', 'campaigner.type', 'category.name', 'time_scraped'] 
     df = df[columns_arranged]
+    return df
+
+
+def _csv_dtypes(source, columns, chunksize):
+    # a chunk without missing values would be typed as int instead of float, so every column gets the
+    # type pandas would give it on the whole file, by promoting the types found in every chunk
+    empty = [df.iloc[:0] for df in pd.read_csv(source, usecols=columns, chunksize=chunksize)]
+    return pd.concat(empty).dtypes.to_dict()
+
+
+def _read_chunks(source, columns, chunksize):
+    if str(source).endswith('.csv'):
+        yield from pd.read_csv(source, usecols=columns, dtype=_csv_dtypes(source, columns, chunksize), chunksize=chunksize)
+    else:
+        for batch in ds.dataset(source, partitioning='hive').to_batches(columns=columns, batch_size=chunksize):
+            yield batch.to_pandas()
+
+
+def _clean_chunked(source, save_path, clean, columns, chunksize):
+    num_rows, num_chunks = 0, 0
+    with open(save_path, 'w', newline='') as fh:
+        for df in _read_chunks(source, columns, chunksize):
+            df = clean(df)
+            if num_chunks == 0:
+                print(df.head(5))
+            df.to_csv(fh, index=False, header=num_chunks == 0)
+            num_rows, num_chunks = num_rows + len(df), num_chunks + 1
+    return num_rows
+
+
+def clean_donors_chunked(source, save_path, chunksize=500000):
+    '''
+    Function for cleaning the donors list file chunk by chunk, so the memory used stays the same however many donors we have.
+
+    It gives the same file as clean_donors on the whole table, without ever loading it at once. A CSV file is read twice,
+    the first pass only settles the dtype of every column.
+
+    Parameters:
+    - source (str): The donors as a CSV file, or as a Parquet file or dataset folder (e.g. 'data/lake/donors').
+    - save_path (str): Where to save the DataFrame as a CSV file.
+    - chunksize (int, optional): Number of donors cleaned at a time. Defaults to 500000.
     
-    print(df.head(5))
-    df.to_csv(save_path, index=False)
-    return df
\ No newline at end of file
+    Returns:
+    - int: Number of donors written.
+    '''
+    return _clean_chunked(source, save_path, _clean_donors_frame, DONOR_COLUMNS, chunksize)
+
+
+def clean_donation_chunked(source, save_path, chunksize=500000):
+    '''
+    Function for cleaning the campaigns list file chunk by chunk, so the memory used stays the same however many campaigns we have.
+
+    It gives the same file as clean_donation on the whole table, without ever loading it at once. A CSV file is read twice,
+    the first pass only settles the dtype of every column.
+
+    Parameters:
+    - source (str): The campaigns as a CSV file, or as a Parquet file or dataset folder.
+    - save_path (str): Where to save the DataFrame as a CSV file.
+    - chunksize (int, optional): Number of campaigns cleaned at a time. Defaults to 500000.
+    
+    Returns:
+    - int: Number of campaigns written.
+    '''
+    return _clean_chunked(source, save_path, _clean_donation_frame, CAMPAIGN_COLUMNS, chunksize)
@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+
+
+# columns of the campaigns merged into every donation
+CAMPAIGN_COLUMNS = ['start_ts_utc', 'is_open_goal', 'is_open_for_donation', 'is_verified', 'donation_target',
+                    'campaigner.type', 'category.name', 'time_scraped', 'short_url', 'is_forever_running']
+
+FEATURE_COLUMNS = ['id', 'created_ts', 'day_ts', 'user.string', 'is_anonymous', 'amount', 'cumsum_amt', 'donation_target',
+                   'percentage_progress', 'days_passed', 'is_open_goal', 'is_forever_running',
+                   'is_open_for_donation', 'is_verified', 'campaigner.type',
+                   'category.name', 'short_url', 'start_ts_utc', 'time_scraped', 'pp_dummy']
+
+PROGRESS_BINS = [0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1, 2]
+PROGRESS_LABELS = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 'over']
+
+
+def progress_features(df_donors, df_donations, tz='Etc/GMT+7'):
+    '''
+    Function for merging every donation with its campaign and computing how far the campaign was when it was made.
+
+    The donations are sorted once, campaign by campaign (in the order of their first donation) and from the earliest
+    donation within a campaign, so every sequential feature is a plain grouped transform over contiguous rows.
+
+    Parameters:
+    - df_donors (DataFrame): The cleaned donors, with short_url, amount, user.string and created_ts (or created_unix).
+    - df_donations (DataFrame): The cleaned campaigns, one row per short_url, with the columns of CAMPAIGN_COLUMNS.
+    - tz (str, optional): Timezone created_ts is converted to, before taking its day name. Defaults to 'Etc/GMT+7'.
+
+    Returns:
+    - DataFrame: One row per donation of a known campaign, with the columns of FEATURE_COLUMNS.
+    '''
+    if 'created_ts' in df_donors:
+        created_ts = pd.to_datetime(df_donors['created_ts'], format='%Y-%m-%d %H:%M:%S')
+    else:
+        # the compact donors only keep the epoch
+        created_ts = pd.to_datetime(df_donors['created_unix'], unit='s')
+
+    # sort by time, then group the campaigns in the order of their first donation, keeping the time order within them
+    by_time = np.argsort(created_ts.to_numpy(), kind='stable')
+    codes, _ = pd.factorize(df_donors['short_url'].iloc[by_time], sort=False)
+    order = by_time[np.argsort(codes, kind='stable')]
+
+    df = df_donors.drop(columns=['created_unix'], errors='ignore').iloc[order].reset_index(drop=True)
+    df['created_ts'] = created_ts.iloc[order].to_numpy()
+    if isinstance(df['short_url'].dtype, pd.CategoricalDtype):
+        df['short_url'] = df['short_url'].cat.remove_unused_categories()
+    df['cumsum_amt'] = df.groupby('short_url', sort=False)['amount'].cumsum()
+
+    df = pd.merge(df, df_donations[CAMPAIGN_COLUMNS], on='short_url', validate='many_to_one')
+    df['start_ts_utc'] = pd.to_datetime(df['start_ts_utc'], format='%Y-%m-%d %H:%M:%S')
+    df['percentage_progress'] = df['cumsum_amt'] / df['donation_target']
+    df['days_passed'] = df['created_ts'] - df['start_ts_utc']
+
+    # created_ts was converted from epoch, so it's still in UTC
+    df['created_ts'] = df['created_ts'].dt.tz_localize('UTC').dt.tz_convert(tz)
+    df['day_ts'] = df['created_ts'].dt.day_name()
+    df['pp_dummy'] = df['user.string'].notna().astype(int)  # 1 for donors with a profile picture
+
+    return df[FEATURE_COLUMNS]
+
+
+def filter_campaigns(df, min_progress=0.9):
+    '''
+    Function for keeping only the campaigns that reached more than min_progress of their target and that aren't forever running.
+
+    Parameters:
+    - df (DataFrame): Output of progress_features.
+    - min_progress (float, optional): The progress a campaign has to exceed. Defaults to 0.9.
+
+    Returns:
+    - DataFrame: The donations of the campaigns kept.
+    '''
+    max_progress = df.groupby('short_url', sort=False)['percentage_progress'].transform('max')
+    return df[(max_progress > min_progress) & (df['is_forever_running'] == False)]
+
+
+def add_progress_bins(df):
+    '''
+    Function for binning the progress of every donation by 10% (progress_bin) and by 50% (progress_bin_50pct).
+    '''
+    df = df.copy()
+    df['progress_bin'] = pd.cut(df['percentage_progress'], PROGRESS_BINS, labels=PROGRESS_LABELS)
+    df['progress_bin_50pct'] = pd.cut(df['percentage_progress'], [0, 0.5, 2], labels=['below50', 'above50'])
+    return df
+
+
+def add_timedelta_features(df):
+    '''
+    Function for computing the time since the previous donation of the same campaign (created_timedelta and created_timedelta_s)
+    and the order of every donation within its campaign. The first donation of a campaign counts from the campaign start.
+
+    Parameters:
+    - df (DataFrame): Donations sorted like the output of progress_features.
+
+    Returns:
+    - DataFrame: The donations with the new columns.
+    '''
+    df = df.reset_index(drop=True)
+    groups = df.groupby('short_url', sort=False)
+
+    df['created_timedelta'] = groups['created_ts'].diff().fillna(df['days_passed'])
+    df['created_timedelta_s'] = df['created_timedelta'].dt.total_seconds()
+    df['order'] = groups.cumcount() + 1
+    return df
+
+
+def add_days_category(df, days_threshold=365, timedelta_threshold=30):
+    '''
+    Function for flagging the campaigns that ran for less than days_threshold days without any gap of timedelta_threshold
+    days or more between donations ('below_threshold'), the others are 'above_threshold'.
+
+    Parameters:
+    - df (DataFrame): Output of add_timedelta_features.
+    - days_threshold (int, optional): Maximum number of days since the campaign start. Defaults to 365.
+    - timedelta_threshold (int, optional): Maximum number of days between two donations. Defaults to 30.
+
+    Returns:
+    - DataFrame: The donations with the days_category column.
+    '''
+    groups = df.groupby('short_url', sort=False)
+    below = ((groups['days_passed'].transform('max') < pd.Timedelta(days_threshold, unit='d')) &
+             (groups['created_timedelta'].transform('max') < pd.Timedelta(timedelta_threshold, unit='d')))
+
+    df = df.copy()
+    df['days_category'] = np.where(below, 'below_threshold', 'above_threshold')
+    return df
+
+
+def build_features(df_donors, df_donations, min_progress=0.9, days_threshold=365, timedelta_threshold=30, tz='Etc/GMT+7'):
+    '''
+    Function for computing every feature of the seed money analysis (df_analysis in the notebook) in a single sorted pass.
+
+    Parameters:
+    - df_donors (DataFrame): The cleaned donors, deduplicated on id.
+    - df_donations (DataFrame): The cleaned campaigns, one row per short_url.
+    - min_progress (float, optional): Only keep the campaigns that exceeded this progress. Defaults to 0.9.
+    - days_threshold (int, optional): See add_days_category. Defaults to 365.
+    - timedelta_threshold (int, optional): See add_days_category. Defaults to 30.
+    - tz (str, optional): See progress_features. Defaults to 'Etc/GMT+7'.
+
+    Returns:
+    - DataFrame: One row per donation, with the progress, bins, time deltas, order and days category.
+    '''
+    df = progress_features(df_donors, df_donations, tz)
+    df = filter_campaigns(df, min_progress)
+    df = add_progress_bins(df)
+    df = add_timedelta_features(df)
+    return add_days_category(df, days_threshold, timedelta_threshold)
@@ -0,0 +1,291 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+STATISTICS = ('mean', 'median', 'count')
+
+# weights a batch of medians may hold at once, one per resample and (campaign, bin, distinct value) entry
+MEDIAN_BATCH_CELLS = 250000
+
+
+def cluster_tables(df, group='progress_bin', value='amount', cluster='short_url', order=None):
+    '''
+    Function for reducing the donations to the tables every resample is computed from: the sum and the count of the
+    donations of each campaign in each bin, and how many donations of each campaign and bin have each distinct value.
+    A resample then only weights these rows, so its cost doesn't grow with the number of donations.
+
+    Parameters:
+    - df (DataFrame): One row per donation, e.g. the output of features.build_features.
+    - group (str, optional): The column of the bins, e.g. 'progress_bin' or 'progress_bin_50pct'. Defaults to 'progress_bin'.
+    - value (str, optional): The column of the donation size. Defaults to 'amount'.
+    - cluster (str, optional): The column of the campaign, the unit that gets resampled. Defaults to 'short_url'.
+    - order (list, optional): The bins in order, e.g. ['below50', 'above50']. Defaults to the categories of a categorical column, or the sorted values.
+
+    Returns:
+    - dict: The bin labels ('groups'), the number of campaigns ('clusters') and donations ('donations'), the 'sums' and 'counts'
+            of every campaign and bin (row c * len(groups) + g), and the 'entries' of the medians: the 'group', 'cluster',
+            'value' and 'count' of every distinct value of a campaign and bin, sorted by value, and their order by bin ('by_group').
+    '''
+    df = df[df[group].notna() & df[value].notna()]
+    if order is not None:
+        unknown = set(df[group].unique()) - set(order)
+        if unknown:
+            raise ValueError(f"order is missing the bins {sorted(map(str, unknown))}.")
+        df = df.assign(**{group: pd.Categorical(df[group], categories=order, ordered=True)})
+    if isinstance(df[group].dtype, pd.CategoricalDtype):
+        groups = df[group].cat.remove_unused_categories().cat.categories
+        group_codes = df[group].cat.remove_unused_categories().cat.codes.to_numpy()
+    else:
+        group_codes, groups = pd.factorize(df[group], sort=True)
+    cluster_codes, clusters = pd.factorize(df[cluster], sort=False)
+    values, value_codes = np.unique(df[value].to_numpy(dtype='float64'), return_inverse=True)
+
+    num_groups = len(groups)
+    num_rows = len(clusters) * num_groups
+    rows = cluster_codes.astype('int64') * num_groups + group_codes
+
+    # one entry per distinct (value, bin, campaign), sorted by value, with the number of donations it stands for
+    keys, entry_counts = np.unique((value_codes * num_groups + group_codes) * len(clusters) + cluster_codes, return_counts=True)
+    entry_groups = (keys // len(clusters) % num_groups).astype('int16')
+    entries = {'group': entry_groups, 'cluster': keys % len(clusters), 'value': values[keys // len(clusters) // num_groups],
+               'count': entry_counts.astype('float64'), 'by_group': np.argsort(entry_groups, kind='stable')}
+
+    return {
+        'groups': list(groups),
+        'clusters': len(clusters),
+        'donations': len(df),
+        'sums': np.bincount(rows, weights=values[value_codes], minlength=num_rows),
+        'counts': np.bincount(rows, minlength=num_rows).astype('float64'),
+        'entries': entries,
+    }
+
+
+def _medians(entries, totals, weights, groups=None):
+    '''
+    Medians of every bin of a batch of resamples, averaging the two middle donations like np.median.
+
+    The entries are sorted by value, so once a stable sort brings the entries of every bin together they're still sorted
+    by value within it, and the cumulative weights of a batch find both middle donations of every bin with a single
+    binary search. The bins of a bootstrap are those of the entries, so their order is sorted once in cluster_tables.
+
+    Parameters:
+    - entries (dict): The entries of cluster_tables.
+    - totals (np.ndarray): Number of donations in every bin of every resample, (resamples x bins).
+    - weights (np.ndarray): Number of donations every entry stands for in every resample, (resamples x entries).
+    - groups (np.ndarray, optional): The bin of every entry in every resample, (resamples x entries). Defaults to the bins of the entries.
+
+    Returns:
+    - np.ndarray: The medians, (resamples x bins), NaN for an empty bin.
+    '''
+    num_resamples, num_entries = weights.shape
+    if groups is None:
+        order = entries['by_group']
+        weights = weights[:, order]
+    else:
+        order = np.argsort(groups, axis=1, kind='stable')
+        weights = np.take_along_axis(weights, order, axis=1)
+
+    resamples = np.arange(num_resamples)[:, None]
+    before = totals.cumsum(axis=1) - totals
+
+    # every resample is shifted above the one before it, so the cumulative weights of the batch are sorted as one array
+    cumulative = weights.cumsum(axis=1)
+    shift = resamples * (cumulative[:, -1].max() + 1)
+    cumulative = (cumulative + shift).ravel()
+
+    middles = []
+    for rank in ((totals - 1) // 2, totals // 2):
+        position = np.searchsorted(cumulative, shift + before + rank, side='right') - resamples * num_entries
+        position = position.clip(0, num_entries - 1)
+        position = order[position] if groups is None else np.take_along_axis(order, position, axis=1)
+        middles.append(entries['value'][position])
+
+    return np.where(totals > 0, (middles[0] + middles[1]) / 2, np.nan)
+
+
+def _batch_statistics(tables, sources, weights, statistics):
+    '''
+    Compute the statistics of a batch of resamples, where bin g of resample b takes the donations of bin sources[b, c, g]
+    of campaign c, weights[b, c] times.
+    '''
+    num_resamples, num_clusters, num_groups = sources.shape
+    resamples = np.arange(num_resamples)[:, None, None]
+
+    # sparse (resamples * bins) x (campaigns * bins) matrix summing the rows of the tables into the bins of every resample
+    rows = np.broadcast_to(resamples * num_groups + np.arange(num_groups), sources.shape)
+    columns = np.arange(num_clusters)[None, :, None] * num_groups + sources
+    selection = sparse.csr_matrix((np.broadcast_to(weights[:, :, None], sources.shape).ravel(), (rows.ravel(), columns.ravel())),
+                                  shape=(num_resamples * num_groups, num_clusters * num_groups))
+
+    counts = (selection @ tables['counts']).reshape(num_resamples, num_groups)
+    result = {}
+    if 'mean' in statistics:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result['mean'] = (selection @ tables['sums']).reshape(num_resamples, num_groups) / counts
+    if 'count' in statistics:
+        # donations per campaign in the bin
+        result['count'] = counts / tables['clusters']
+    if 'median' in statistics:
+        entries = tables['entries']
+        entry_weights = weights[:, entries['cluster']] * entries['count']
+        entry_groups = None
+        if not (sources == np.arange(num_groups)).all():
+            # the bin every bin of a campaign went to
+            destinations = sources.argsort(axis=2).astype('int16')
+            entry_groups = destinations[:, entries['cluster'], entries['group']]
+        result['median'] = _medians(entries, counts, entry_weights, entry_groups)
+    return result
+
+
+def _resample(tables, kind, seed, size, statistics):
+    '''
+    Compute the statistics of `size` resamples, in batches of vectorized index draws.
+    '''
+    rng = np.random.default_rng(seed)
+    num_clusters, num_groups = tables['clusters'], len(tables['groups'])
+    batch = size
+    if 'median' in statistics:
+        batch = max(1, min(size, MEDIAN_BATCH_CELLS // max(len(tables['entries']['count']), 1)))
+
+    results = []
+    for start in range(0, size, batch):
+        num_resamples = min(batch, size - start)
+        if kind == 'bootstrap':
+            # draw the campaigns with replacement, every campaign keeps its own bins
+            weights = rng.multinomial(num_clusters, np.full(num_clusters, 1 / num_clusters), size=num_resamples).astype('float64')
+            sources = np.broadcast_to(np.arange(num_groups), (num_resamples, num_clusters, num_groups))
+        else:
+            # shuffle the bin labels within every campaign, the campaigns themselves stay together
+            sources = rng.random((num_resamples, num_clusters, num_groups)).argsort(axis=2)
+            weights = np.ones((num_resamples, num_clusters))
+        results.append(_batch_statistics(tables, sources, weights, statistics))
+
+    return {statistic: np.concatenate([r[statistic] for r in results]) for statistic in statistics}
+
+
+_worker_tables = None
+
+
+def _init_worker(tables):
+    # the tables are sent once to every worker instead of with every chunk
+    global _worker_tables
+    _worker_tables = tables
+
+
+def _resample_in_worker(args):
+    return _resample(_worker_tables, *args)
+
+
+def _run(tables, kind, statistics, n_resamples, seed, n_jobs, chunk_size):
+    # the resamples are split into chunks of a fixed size, each with its own child seed,
+    # so the results are the same whatever the number of processes
+    sizes = [min(chunk_size, n_resamples - start) for start in range(0, n_resamples, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(kind, s, size, statistics) for s, size in zip(seeds, sizes)]
+
+    n_jobs = os.cpu_count() if n_jobs is None else n_jobs
+    if n_jobs == 1 or len(tasks) == 1:
+        chunks = [_resample(tables, *task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks)), initializer=_init_worker, initargs=(tables,)) as executor:
+            chunks = list(executor.map(_resample_in_worker, tasks))
+
+    return {statistic: np.concatenate([chunk[statistic] for chunk in chunks]) for statistic in statistics}
+
+
+def _observed(tables, statistics):
+    # the statistics of the data itself: every campaign once, with its own bins
+    sources = np.broadcast_to(np.arange(len(tables['groups'])), (1, tables['clusters'], len(tables['groups'])))
+    return {s: v[0] for s, v in _batch_statistics(tables, sources, np.ones((1, tables['clusters'])), statistics).items()}
+
+
+def bootstrap(df, group='progress_bin', value='amount', cluster='short_url', statistics=STATISTICS, n_resamples=10000, confidence=0.95,
+              seed=None, n_jobs=None, chunk_size=500):
+    '''
+    Function for the campaign-clustered bootstrap of the per-bin mean and median donation and donations per campaign:
+    every resample draws the campaigns with replacement, keeping all the donations of a campaign together.
+
+    Parameters:
+    - df (DataFrame): One row per donation, with the group, value and cluster columns.
+    - group (str, optional): The column of the bins. Defaults to 'progress_bin'.
+    - value (str, optional): The column of the donation size. Defaults to 'amount'.
+    - cluster (str, optional): The column of the campaign. Defaults to 'short_url'.
+    - statistics (tuple, optional): Any of 'mean', 'median' and 'count' (donations per campaign). Defaults to STATISTICS.
+    - n_resamples (int, optional): Number of bootstrap resamples. Defaults to 10000.
+    - confidence (float, optional): Level of the percentile confidence intervals. Defaults to 0.95.
+    - seed (int, optional): Seed of the resamples, the same seed gives the same results. Defaults to None.
+    - n_jobs (int, optional): Number of processes, 1 to stay in this process. Defaults to None, one per CPU.
+    - chunk_size (int, optional): Number of resamples per task sent to a process. Defaults to 500.
+
+    Returns:
+    - DataFrame: One row per bin and statistic, with the estimate, its standard error and confidence interval,
+                 and the number of donations and campaigns of the bin.
+    '''
+    tables = cluster_tables(df, group, value, cluster)
+    statistics = tuple(statistics)
+    observed = _observed(tables, statistics)
+    resampled = _run(tables, 'bootstrap', statistics, n_resamples, seed, n_jobs, chunk_size)
+
+    num_groups = len(tables['groups'])
+    counts = tables['counts'].reshape(tables['clusters'], num_groups)
+    alpha = (1 - confidence) / 2
+    records = []
+    for statistic in statistics:
+        low, high = np.nanquantile(resampled[statistic], [alpha, 1 - alpha], axis=0)
+        se = np.nanstd(resampled[statistic], axis=0, ddof=1)
+        for g, label in enumerate(tables['groups']):
+            records.append({'group': label, 'statistic': statistic, 'estimate': observed[statistic][g], 'se': se[g],
+                            'ci_low': low[g], 'ci_high': high[g], 'n_donations': int(counts[:, g].sum()),
+                            'n_campaigns': int((counts[:, g] > 0).sum())})
+
+    return pd.DataFrame.from_records(records)
+
+
+def permutation_test(df, group='progress_bin', value='amount', cluster='short_url', statistics=STATISTICS, n_resamples=10000,
+                     seed=None, n_jobs=None, chunk_size=500, order=None):
+    '''
+    Function for the campaign-clustered permutation test of whether the per-bin statistics differ across the bins.
+
+    Under the null hypothesis the bins are exchangeable within a campaign, so every permutation shuffles which bin
+    the donations of each campaign belong to, moving them as whole blocks. The test statistic is the variance of the
+    statistic across the bins; with two bins (e.g. below50 and above50) that's the squared half difference,
+    so the test is the two-sided test of the difference.
+
+    Parameters:
+    - df (DataFrame): One row per donation, with the group, value and cluster columns.
+    - group (str, optional): The column of the bins. Defaults to 'progress_bin'.
+    - value (str, optional): The column of the donation size. Defaults to 'amount'.
+    - cluster (str, optional): The column of the campaign. Defaults to 'short_url'.
+    - statistics (tuple, optional): Any of 'mean', 'median' and 'count' (donations per campaign). Defaults to STATISTICS.
+    - n_resamples (int, optional): Number of permutations. Defaults to 10000.
+    - seed (int, optional): Seed of the permutations, the same seed gives the same results. Defaults to None.
+    - n_jobs (int, optional): Number of processes, 1 to stay in this process. Defaults to None, one per CPU.
+    - chunk_size (int, optional): Number of permutations per task sent to a process. Defaults to 500.
+    - order (list, optional): The bins in order, e.g. ['below50', 'above50'], required unless the column is numeric or an ordered
+                              categorical, so the sign of the difference doesn't depend on the alphabetical order of the labels. Defaults to None.
+
+    Returns:
+    - DataFrame: One row per statistic, with the observed variance across the bins, the difference between the last
+                 and the first bin, and the p-value.
+    '''
+    dtype = df[group].dtype
+    ordered = dtype.ordered if isinstance(dtype, pd.CategoricalDtype) else pd.api.types.is_numeric_dtype(dtype)
+    if order is None and not ordered:
+        raise ValueError(f"the bins of {group} have no order, pass order= or make it an ordered categorical.")
+    tables = cluster_tables(df, group, value, cluster, order)
+    statistics = tuple(statistics)
+    observed = _observed(tables, statistics)
+    resampled = _run(tables, 'permutation', statistics, n_resamples, seed, n_jobs, chunk_size)
+
+    records = []
+    for statistic in statistics:
+        spread = np.nanvar(observed[statistic])
+        null = np.nanvar(resampled[statistic], axis=1)
+        records.append({'statistic': statistic, 'spread': spread, 'difference': observed[statistic][-1] - observed[statistic][0],
+                        'p_value': (1 + np.sum(null >= spread * (1 - 1e-12))) / (1 + n_resamples), 'n_resamples': n_resamples})
+
+    return pd.DataFrame.from_records(records)
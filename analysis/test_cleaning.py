@@ -0,0 +1,146 @@
+import json
+import sqlite3
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import cleaning as cln
+
+
+def make_donors(num_donors):
+    return pd.DataFrame({
+        'id': range(1000, 1000 + num_donors),
+        'is_anonymous': [n % 3 == 0 for n in range(num_donors)],
+        'comment': 'semoga lekas sembuh',
+        'user.string': [None if n % 2 or n > 20 else f'https://img.example/{n}.jpg' for n in range(num_donors)],
+        'amount': [5000 * (n % 7 + 1) for n in range(num_donors)],
+        'created': [1712900000 + 60 * n for n in range(num_donors)],
+        'time_scrapped': '2024-04-12 19:00:00',
+        'short_url': ['bantuwarga' if n % 2 else 'sehatisyawal' for n in range(num_donors)],
+    })
+
+
+def make_campaigns(num_campaigns):
+    return pd.DataFrame({
+        'id': range(num_campaigns), 'short_url': [f'campaign{n}' for n in range(num_campaigns)],
+        'is_forever_running': [n == 7 for n in range(num_campaigns)], 'is_open_goal': False,
+        'donation_received': 1000, 'donation_count': 3, 'donation_target': 10000, 'donation_percentage': 0.1,
+        'campaign_start': 1700000000, 'campaign_end': 1720000000, 'campaign_last_update': [1710000000 + 3600 * n for n in range(num_campaigns)],
+        'days_remaining': [None if n == 7 else n for n in range(num_campaigns)], 'is_open_for_donation': True,
+        'is_verified': True, 'campaigner.type': 'PERSONAL', 'category.name': None, 'time_scraped': '2024-04-12 19:00:00',
+    })
+
+
+def test_clean_donors_chunked_matches_the_in_memory_path(tmp_path):
+    make_donors(95).to_csv(tmp_path / 'donors.csv', index=False)
+
+    cln.clean_donors(pd.read_csv(tmp_path / 'donors.csv'), tmp_path / 'in_memory.csv')
+    num_rows = cln.clean_donors_chunked(str(tmp_path / 'donors.csv'), tmp_path / 'chunked.csv', chunksize=10)
+
+    assert num_rows == 95
+    assert (tmp_path / 'chunked.csv').read_bytes() == (tmp_path / 'in_memory.csv').read_bytes()
+
+
+def test_clean_donation_chunked_matches_the_in_memory_path(tmp_path):
+    make_campaigns(30).to_csv(tmp_path / 'campaigns.csv', index=False)
+
+    cln.clean_donation(pd.read_csv(tmp_path / 'campaigns.csv'), tmp_path / 'in_memory.csv')
+    cln.clean_donation_chunked(str(tmp_path / 'campaigns.csv'), tmp_path / 'chunked.csv', chunksize=4)
+
+    assert (tmp_path / 'chunked.csv').read_bytes() == (tmp_path / 'in_memory.csv').read_bytes()
+
+
+def test_clean_donors_chunked_reads_parquet(tmp_path):
+    df = make_donors(50)
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path / 'donors.parquet', row_group_size=8)
+
+    cln.clean_donors(df, tmp_path / 'in_memory.csv')
+    cln.clean_donors_chunked(str(tmp_path / 'donors.parquet'), tmp_path / 'chunked.csv', chunksize=8)
+
+    assert (tmp_path / 'chunked.csv').read_bytes() == (tmp_path / 'in_memory.csv').read_bytes()
+
+
+def test_load_donors_compact_types_and_dedups(tmp_path):
+    df = make_donors(300)
+    # the same donations show up again on a later page
+    pd.concat([df, df.iloc[40:60]]).to_csv(tmp_path / 'donors.csv', index=False)
+
+    compact = cln.load_donors_compact(str(tmp_path / 'donors.csv'), chunksize=64, dedup=True)
+    plain = pd.read_csv(tmp_path / 'donors.csv')
+
+    assert list(compact['id']) == list(df['id'])
+    assert compact['short_url'].dtype == 'category'
+    assert compact['is_anonymous'].dtype == 'boolean'
+    assert compact['amount'].dtype == 'int64'
+    assert compact['created'].dtype == 'int64'
+    assert 'comment' not in compact
+    assert list(compact['short_url'].astype(str)) == list(df['short_url'])
+    assert cln.memory_footprint(compact)['total'] * 3 < cln.memory_footprint(plain)['total']
+
+
+def test_load_donors_compact_handles_empty_sources_and_blank_rows(tmp_path):
+    # a campaign without any donor yet
+    make_donors(0).to_csv(tmp_path / 'empty.csv', index=False)
+    pq.write_table(pa.Table.from_pandas(make_donors(0)), tmp_path / 'empty.parquet')
+
+    for source in ['empty.csv', 'empty.parquet']:
+        empty = cln.load_donors_compact(str(tmp_path / source))
+        assert len(empty) == 0
+        assert empty['amount'].dtype == 'int64'
+        assert empty['short_url'].dtype == 'category'
+
+    # a failed row left without an amount
+    df = make_donors(50)
+    df.loc[[3, 17], 'amount'] = None
+    df.to_csv(tmp_path / 'donors.csv', index=False)
+
+    compact = cln.load_donors_compact(str(tmp_path / 'donors.csv'), chunksize=16)
+    assert len(compact) == 48
+    assert compact['amount'].dtype == 'int64'
+    assert 1003 not in set(compact['id'])
+
+
+def test_load_donors_compact_feeds_the_features(tmp_path):
+    import features as ft
+
+    cln.clean_donors(make_donors(120), tmp_path / 'donors_cleaned.csv')
+    campaigns = pd.DataFrame({'short_url': ['bantuwarga', 'sehatisyawal'], 'donation_target': 100000,
+                              'start_ts_utc': '2024-04-01 00:00:00', 'is_open_goal': False, 'is_open_for_donation': True,
+                              'is_verified': True, 'campaigner.type': 'PERSONAL', 'category.name': 'Medis',
+                              'time_scraped': '2024-04-12 19:00:00', 'is_forever_running': False})
+
+    compact = cln.load_donors_compact(str(tmp_path / 'donors_cleaned.csv'))
+    expected = ft.progress_features(pd.read_csv(tmp_path / 'donors_cleaned.csv'), campaigns)
+    result = ft.progress_features(compact, campaigns)
+
+    assert list(result['id']) == list(expected['id'])
+    assert list(result['cumsum_amt']) == list(expected['cumsum_amt'])
+    assert list(result['created_ts']) == list(expected['created_ts'])
+
+
+def test_load_campaigns_history_rebuilds_the_snapshot_of_a_run(tmp_path):
+    # the tables written by the SnapshotStore of the scraper: every field of the first run, then the one change of the second
+    df = make_campaigns(2).drop(columns='time_scraped')
+    with sqlite3.connect(tmp_path / 'history.db') as conn:
+        conn.execute('CREATE TABLE project_history (short_url TEXT, field TEXT, value TEXT, valid_from TEXT, valid_to TEXT)')
+        conn.execute('CREATE TABLE project_runs (scraped_at TEXT PRIMARY KEY, short_urls TEXT)')
+        conn.executemany('INSERT INTO project_history VALUES (?, ?, ?, ?, ?)',
+                         [(record['short_url'], field, json.dumps(value), '2024-04-11 19:00:00',
+                           '2024-04-12 19:00:00' if (record['short_url'], field) == ('campaign0', 'donation_received') else None)
+                          for record in df.to_dict('records') for field, value in record.items() if field != 'short_url'])
+        conn.execute("INSERT INTO project_history VALUES ('campaign0', 'donation_received', '5000', '2024-04-12 19:00:00', NULL)")
+        conn.execute("INSERT INTO project_runs VALUES ('2024-04-11 19:00:00', '[\"campaign0\", \"campaign1\"]')")
+        # the second run could only read one of the campaigns
+        conn.execute("INSERT INTO project_runs VALUES ('2024-04-12 19:00:00', '[\"campaign0\"]')")
+
+    latest = cln.load_campaigns_history(str(tmp_path / 'history.db'))
+    before = cln.load_campaigns_history(str(tmp_path / 'history.db'), '2024-04-11')
+
+    assert list(latest.columns) == cln.CAMPAIGN_COLUMNS
+    assert latest.to_dict('records')[0]['donation_received'] == 5000
+    assert list(latest['time_scraped']) == ['2024-04-12 19:00:00']
+    assert list(before['short_url']) == ['campaign0', 'campaign1']
+    assert list(before['donation_received']) == [1000, 1000]
+    assert before['campaign_last_update'].dtype == 'int64'
+    assert cln.load_campaigns_history(str(tmp_path / 'history.db'), '2024-04-01').empty
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+
+import features as ft
+
+
+def make_tables(seed=0):
+    rng = np.random.default_rng(seed)
+    campaigns = pd.DataFrame({
+        'short_url': ['bantuwarga', 'sehatisyawal', 'rumahsinggah', 'airbersih', 'selamanya'],
+        'donation_target': [1000000, 500000, 2000000, 300000, 800000],
+        'start_ts_utc': ['2024-01-01 00:00:00', '2024-01-10 00:00:00', '2023-01-05 00:00:00', '2024-02-01 00:00:00', '2024-01-01 00:00:00'],
+        'is_open_goal': False, 'is_open_for_donation': True, 'is_verified': True,
+        'campaigner.type': 'PERSONAL', 'category.name': ['Medis', 'Medis', 'Panti', 'Bencana', 'Zakat'],
+        'time_scraped': '2024-04-12 19:00:00', 'is_forever_running': [False, False, False, False, True],
+    })
+
+    num_donors = 400
+    created = pd.Timestamp('2024-02-15') + pd.to_timedelta(rng.choice(60 * 24 * 3600, num_donors, replace=False), unit='s')
+    donors = pd.DataFrame({
+        'id': np.arange(num_donors) + 1000,
+        'is_anonymous': rng.random(num_donors) < 0.3,
+        'user.string': np.where(rng.random(num_donors) < 0.5, 'https://img.example/a.jpg', None),
+        'amount': rng.choice([5000, 10000, 20000, 50000, 100000], num_donors).astype(float),
+        'created_ts': created.strftime('%Y-%m-%d %H:%M:%S'),
+        'short_url': rng.choice(list(campaigns['short_url']) + ['unknown'], num_donors),
+    })
+    return donors, campaigns
+
+
+def notebook_features(df_donors, df_donations):
+    # the notebook cells computing df_analysis, kept as they are
+    df_donors = df_donors.copy()
+    df_donors.sort_values(by='created_ts', inplace=True)
+    df_donors.reset_index(drop=True, inplace=True)
+    df_donors['cumsum_amt'] = df_donors.groupby(['short_url'])['amount'].cumsum()
+
+    col_to_merge_donation = ['short_url', 'donation_target', 'start_ts_utc']
+    df_merged_no_cat = pd.merge(df_donors, df_donations[col_to_merge_donation], on='short_url')
+    df_merged_no_cat['percentage_progress'] = df_merged_no_cat['cumsum_amt'] / df_merged_no_cat['donation_target']
+    df_merged_no_cat['created_ts'] = pd.to_datetime(df_merged_no_cat['created_ts'], format='%Y-%m-%d %H:%M:%S')
+    df_merged_no_cat['start_ts_utc'] = pd.to_datetime(df_merged_no_cat['start_ts_utc'], format='%Y-%m-%d %H:%M:%S')
+    df_merged_no_cat['days_passed'] = df_merged_no_cat['created_ts'] - df_merged_no_cat['start_ts_utc']
+    df_merged_no_cat['created_ts'] = pd.to_datetime(df_merged_no_cat['created_ts'], utc=True, format='%Y-%m-%d %H:%M:%S')
+    df_merged_no_cat['created_ts'] = df_merged_no_cat['created_ts'].dt.tz_convert('Etc/GMT+7')
+    df_merged_no_cat['day_ts'] = df_merged_no_cat['created_ts'].dt.day_name()
+    column_arrange = ['id', 'created_ts', 'day_ts', 'user.string', 'is_anonymous', 'amount', 'cumsum_amt',
+                      'percentage_progress', 'days_passed', 'short_url']
+    df_merged_no_cat = df_merged_no_cat[column_arrange]
+
+    col_to_merge_category = ['start_ts_utc', 'is_open_goal', 'is_open_for_donation', 'is_verified', 'donation_target',
+                             'campaigner.type', 'category.name', 'time_scraped', 'short_url', 'is_forever_running']
+    column_arrange_cat = ['id', 'created_ts', 'day_ts', 'user.string', 'is_anonymous', 'amount', 'cumsum_amt', 'donation_target',
+                          'percentage_progress', 'days_passed', 'is_open_goal', 'is_forever_running',
+                          'is_open_for_donation', 'is_verified', 'campaigner.type',
+                          'category.name', 'short_url', 'start_ts_utc', 'time_scraped']
+    df_merged_with_cat = pd.merge(df_merged_no_cat, df_donations[col_to_merge_category], on='short_url')
+    df_merged_with_cat = df_merged_with_cat[column_arrange_cat]
+    df_merged_with_cat['pp_dummy'] = df_merged_with_cat['user.string']
+    df_merged_with_cat.loc[~df_merged_with_cat['pp_dummy'].isnull(), 'pp_dummy'] = 1
+    df_merged_with_cat.loc[df_merged_with_cat['pp_dummy'].isnull(), 'pp_dummy'] = 0
+    df_analysis = df_merged_with_cat
+
+    max_percentage = dict(df_analysis.groupby(['short_url'], sort=False)['percentage_progress'].max())
+    max_percentage_filtered = {key: value for (key, value) in max_percentage.items() if value > 0.9}
+    df_analysis = df_analysis.loc[(df_analysis['short_url'].isin(list(max_percentage_filtered.keys())))]
+    df_analysis = df_analysis[df_analysis['is_forever_running'] == False].copy()
+
+    df_analysis['progress_bin'] = pd.cut(df_analysis["percentage_progress"],
+                                         [0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1, 2],
+                                         labels=[1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 'over'])
+    df_analysis['progress_bin_50pct'] = pd.cut(df_analysis["percentage_progress"], [0, 0.5, 2], labels=['below50', 'above50'])
+
+    df_analysis['created_timedelta'] = (df_analysis.groupby('short_url')['created_ts'].diff(-1) * (-1)).shift(1)
+    df_analysis['created_timedelta_s'] = df_analysis['created_timedelta'].dt.total_seconds()
+    df_analysis.reset_index(inplace=True, drop=True)
+    for row in range(len(df_analysis)):
+        if pd.isna(df_analysis.loc[row, 'created_timedelta_s']) == True:
+            df_analysis.loc[row, 'created_timedelta'] = df_analysis.loc[row, 'days_passed']
+            df_analysis.loc[row, 'created_timedelta_s'] = df_analysis.loc[row, 'days_passed'].total_seconds()
+    df_analysis['order'] = df_analysis.groupby('short_url').cumcount() + 1
+
+    dayspassed_cat = df_analysis[['short_url', 'days_passed', 'created_timedelta']].groupby('short_url').max().reset_index()
+    for i in range(len(dayspassed_cat)):
+        if dayspassed_cat.loc[i, 'days_passed'] < pd.Timedelta(365, unit='d') and dayspassed_cat.loc[i, 'created_timedelta'] < pd.Timedelta(30, unit='d'):
+            dayspassed_cat.loc[i, 'days_category'] = 'below_threshold'
+        else:
+            dayspassed_cat.loc[i, 'days_category'] = 'above_threshold'
+    return pd.merge(df_analysis, dayspassed_cat[['short_url', 'days_category']], on='short_url')
+
+
+def test_build_features_matches_the_notebook():
+    df_donors, df_donations = make_tables()
+
+    expected = notebook_features(df_donors, df_donations)
+    # the notebook carries the unparsed start_ts_utc of its second merge, the module keeps it parsed
+    expected['start_ts_utc'] = pd.to_datetime(expected['start_ts_utc'])
+    result = ft.build_features(df_donors, df_donations)
+
+    # the campaigns below 90% and the forever running one are dropped, both thresholds are hit
+    assert set(result['short_url']) == {'bantuwarga', 'sehatisyawal', 'rumahsinggah', 'airbersih'}
+    assert set(result['days_category']) == {'below_threshold', 'above_threshold'}
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, check_categorical=False)
+
+
+def test_progress_features_restarts_every_campaign():
+    df_donors = pd.DataFrame({
+        'id': [1, 2, 3, 4], 'is_anonymous': False, 'user.string': [None, 'a.jpg', None, None], 'amount': [10.0, 20.0, 30.0, 40.0],
+        'created_ts': ['2024-03-01 10:00:00', '2024-03-01 09:00:00', '2024-03-01 11:00:00', '2024-03-01 08:00:00'],
+        'short_url': ['a', 'b', 'a', 'b'],
+    })
+    _, df_donations = make_tables()
+    df_donations = df_donations.head(2).assign(short_url=['a', 'b'], donation_target=100)
+
+    df = ft.add_timedelta_features(ft.progress_features(df_donors, df_donations))
+
+    assert list(df['id']) == [4, 2, 1, 3]
+    assert list(df['cumsum_amt']) == [40.0, 60.0, 10.0, 40.0]
+    assert list(df['order']) == [1, 2, 1, 2]
+    assert list(df['pp_dummy']) == [0, 1, 0, 0]
+    assert df.loc[1, 'created_timedelta_s'] == 3600
+    assert df.loc[0, 'created_timedelta'] == df.loc[0, 'days_passed']
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import resampling as rs
+
+
+def make_donations(num_donations=3000, num_campaigns=12, effect=0, seed=0):
+    rng = np.random.default_rng(seed)
+    progress = rng.random(num_donations) * 1.2
+    df = pd.DataFrame({
+        'short_url': [f'campaign{n}' for n in rng.integers(0, num_campaigns, num_donations)],
+        'amount': rng.choice([5000, 10000, 20000, 50000, 100000], num_donations) + rng.integers(0, 4, num_donations) * 1000,
+        'progress_bin': pd.cut(progress, [0, 0.3, 0.6, 0.9, 2], labels=[1, 2, 3, 'over']),
+    })
+    # donations made further in the campaign get bigger
+    df['amount'] = df['amount'] + (effect * df['progress_bin'].cat.codes * 10000)
+    return df
+
+
+def naive_statistics(df):
+    grouped = df.groupby('progress_bin')['amount']
+    return {'mean': grouped.mean().to_numpy(), 'median': grouped.median().to_numpy(),
+            'count': grouped.size().to_numpy() / df['short_url'].nunique()}
+
+
+def test_observed_statistics_match_pandas():
+    df = make_donations()
+    observed = rs._observed(rs.cluster_tables(df), rs.STATISTICS)
+    expected = naive_statistics(df)
+
+    for statistic in rs.STATISTICS:
+        np.testing.assert_allclose(observed[statistic], expected[statistic])
+
+
+def test_resamples_match_the_resampled_campaigns():
+    df = make_donations(600, num_campaigns=8)
+    tables = rs.cluster_tables(df)
+    campaigns = pd.factorize(df['short_url'])[1]
+
+    # the same draws as _resample, applied to the donations themselves
+    bootstrap = rs._resample(tables, 'bootstrap', 7, 5, rs.STATISTICS)
+    weights = np.random.default_rng(7).multinomial(8, np.full(8, 1 / 8), size=5)
+    for b in range(5):
+        resampled = pd.concat([df[df['short_url'] == c] for c, w in zip(campaigns, weights[b]) for _ in range(w)])
+        expected = naive_statistics(resampled)
+        np.testing.assert_allclose(bootstrap['mean'][b], expected['mean'])
+        np.testing.assert_allclose(bootstrap['median'][b], expected['median'])
+        np.testing.assert_allclose(bootstrap['count'][b], expected['count'] * resampled['short_url'].nunique() / 8)
+
+    permutation = rs._resample(tables, 'permutation', 7, 5, rs.STATISTICS)
+    sources = np.random.default_rng(7).random((5, 8, 4)).argsort(axis=2)
+    codes = df['progress_bin'].cat.codes.to_numpy()
+    for b in range(5):
+        destinations = sources[b].argsort(axis=1)
+        clusters = pd.Index(campaigns).get_indexer(df['short_url'])
+        permuted = df.assign(progress_bin=pd.Categorical.from_codes(destinations[clusters, codes], df['progress_bin'].cat.categories))
+        expected = naive_statistics(permuted)
+        for statistic in rs.STATISTICS:
+            np.testing.assert_allclose(permutation[statistic][b], expected[statistic])
+
+
+def test_results_are_reproducible_whatever_the_processes():
+    df = make_donations()
+
+    inline = rs.bootstrap(df, n_resamples=300, seed=42, n_jobs=1, chunk_size=100)
+    pooled = rs.bootstrap(df, n_resamples=300, seed=42, n_jobs=2, chunk_size=100)
+    other = rs.bootstrap(df, n_resamples=300, seed=43, n_jobs=1, chunk_size=100)
+
+    pd.testing.assert_frame_equal(inline, pooled)
+    assert not inline['se'].equals(other['se'])
+    assert list(inline['group'].unique()) == [1, 2, 3, 'over']
+    assert (inline['ci_low'] <= inline['estimate']).all() and (inline['estimate'] <= inline['ci_high']).all()
+
+
+def test_permutation_test_finds_the_effect_of_the_progress():
+    df = make_donations(effect=1)
+    df['progress_bin_50pct'] = np.where(df['progress_bin'].isin([1]), 'below50', 'above50')
+
+    with_effect = rs.permutation_test(df, n_resamples=200, seed=0, n_jobs=1).set_index('statistic')
+    without_effect = rs.permutation_test(make_donations(effect=0), n_resamples=200, seed=0, n_jobs=1).set_index('statistic')
+    split = rs.permutation_test(df, group='progress_bin_50pct', statistics=['mean'], n_resamples=200, seed=0, n_jobs=1,
+                                order=['below50', 'above50'])
+
+    assert with_effect.loc['mean', 'p_value'] < 0.01
+    assert with_effect.loc['median', 'p_value'] < 0.01
+    assert without_effect.loc['mean', 'p_value'] > 0.05
+    assert split.loc[0, 'p_value'] < 0.01
+
+
+def test_permutation_test_difference_follows_the_order_of_the_bins():
+    df = make_donations(effect=1)
+    df['progress_bin_50pct'] = np.where(df['progress_bin'].isin([1]), 'below50', 'above50')
+
+    # alphabetically above50 comes first, which would flip the sign
+    with pytest.raises(ValueError, match='order'):
+        rs.permutation_test(df, group='progress_bin_50pct', n_resamples=10, n_jobs=1)
+
+    split = rs.permutation_test(df, group='progress_bin_50pct', statistics=['mean'], n_resamples=10, seed=0, n_jobs=1,
+                                order=['below50', 'above50'])
+    df['progress_bin_50pct'] = pd.Categorical(df['progress_bin_50pct'], categories=['below50', 'above50'], ordered=True)
+    categorical = rs.permutation_test(df, group='progress_bin_50pct', statistics=['mean'], n_resamples=10, seed=0, n_jobs=1)
+
+    # the later donations are bigger
+    assert split.loc[0, 'difference'] > 0
+    assert categorical.loc[0, 'difference'] == split.loc[0, 'difference']
+    with pytest.raises(ValueError, match='missing the bins'):
+        rs.permutation_test(df, group='progress_bin_50pct', n_resamples=10, n_jobs=1, order=['below50'])
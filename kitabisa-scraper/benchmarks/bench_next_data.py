@@ -0,0 +1,100 @@
+'''
+Micro-benchmark of the campaign JSON extraction.
+
+Compares the previous path (splitting the syntax-highlighted view-source markup, json.loads, then
+pd.json_normalize and pd.concat for every page) with extract_campaign() on the raw html of the page.
+
+Usage, from the kitabisa-scraper folder:
+    python -m benchmarks.bench_next_data [--pages DIR] [--repeat N]
+
+DIR holds saved raw campaign pages (*.html). Without it, pages are synthesized from the saved
+project_props CSV in data/, which keeps the real size of the descriptions.
+'''
+import argparse
+import glob
+import json
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from modules.parsers import extract_campaign, extract_next_data
+from kitabisa_scraper_tests.standin import make_campaign_page
+
+
+VIEW_SOURCE_START = '__NEXT_DATA__</span>" <span class="html-attribute-name">type</span>="<span class="html-attribute-value">application/json</span>"&gt;</span>'
+VIEW_SOURCE_END = '<span class="html-tag">&lt;/script&gt;</span><span class="html-tag">'
+
+
+def load_pages(pages_dir):
+    if pages_dir is not None:
+        return [Path(path).read_text() for path in sorted(glob.glob(pages_dir + '/*.html'))]
+
+    path = sorted(glob.glob('data/project_props_*.csv'))[-1]
+    pages = []
+    for row in pd.read_csv(path).to_dict('records'):
+        # rebuild the nested campaign from the flattened columns
+        campaign = {}
+        for column, value in row.items():
+            if column == 'time_scraped':
+                continue
+            value = None if isinstance(value, float) and value != value else value
+            keys = column.split('.')
+            parent = campaign
+            for key in keys[:-1]:
+                parent = parent.setdefault(key, {})
+            parent[keys[-1]] = value
+        pages.append(make_campaign_page(campaign))
+    return pages
+
+
+def to_view_source(content):
+    # the view-source page wraps the payload in the syntax highlighting markup the previous path split on
+    payload = json.dumps(extract_next_data(content))
+    return '<span class="html-tag">&lt;script <span class="html-attribute-name">id</span>="<span class="html-attribute-value">' \
+        + VIEW_SOURCE_START + payload + VIEW_SOURCE_END + '&lt;/body&gt;</span>'
+
+
+def previous_path(view_source_pages):
+    df_project_props = pd.DataFrame()
+    for content in view_source_pages:
+        json_script = content.split(VIEW_SOURCE_START)[1].split(VIEW_SOURCE_END)[0]
+        json_format = json.loads(json_script)
+        df = pd.json_normalize(json_format['props']['pageProps']['dehydratedState']['queries'][0]['state']['data']['dataCampaigns'])
+        df_project_props = pd.concat([df_project_props, df], ignore_index=True)
+    return df_project_props
+
+
+def current_path(pages):
+    return pd.DataFrame.from_records([extract_campaign(content) for content in pages])
+
+
+def best_of(func, pages, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(pages)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', default=None, help='folder of saved raw campaign pages (*.html)')
+    parser.add_argument('--repeat', type=int, default=5, help='number of runs, the best one is reported')
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages)
+    view_source_pages = [to_view_source(content) for content in pages]
+
+    previous = best_of(previous_path, view_source_pages, args.repeat)
+    current = best_of(current_path, pages, args.repeat)
+
+    print(f'pages: {len(pages)}')
+    print(f'view-source split + json_normalize + concat: {previous * 1000:.1f} ms ({len(pages) / previous:.0f} pages/s)')
+    print(f'__NEXT_DATA__ extract + projection:          {current * 1000:.1f} ms ({len(pages) / current:.0f} pages/s)')
+    print(f'speedup: {previous / current:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,32 +1,59 @@
-from dagster import Definitions, load_assets_from_modules
-
 from dagster import (
+    AssetKey,
     AssetSelection,
     Definitions,
+    RunRequest,
     ScheduleDefinition,
+    asset_sensor,
     define_asset_job,
     load_assets_from_modules,
+    multiprocess_executor,
 )
 
 from . import assets
+from .io_managers import ParquetIOManager
 
 
 all_assets = load_assets_from_modules([assets])
 
+# the donors are partitioned by campaign, so they get their own job
 kitabisascrape_job = define_asset_job('kitabisascrape_job', 
-                                      selection=AssetSelection.all()
+                                      selection=AssetSelection.all() - AssetSelection.assets(assets.donors_scraper)
                                       )
 
+# every campaign runs in its own process, how many crawl at the same time is capped by the
+# `kitabisa_donors` pool (see dagster.yaml), so the throughput scales with the cores we give it
+donors_job = define_asset_job('donors_job',
+                              selection=AssetSelection.assets(assets.donors_scraper),
+                              partitions_def=assets.campaign_partitions,
+                              executor_def=multiprocess_executor
+                              )
+
 kitabisascrape_schedule = ScheduleDefinition(job=kitabisascrape_job,        # pass the kitabisa scrape job to the scheduler
                                              cron_schedule='0 19 * * *'     # schedule by following cron scheduler format
                                              )
 
+
+@asset_sensor(asset_key=AssetKey('projects_to_read'), job=donors_job)
+def donors_sensor(context, asset_event):
+    '''
+    Launch a donors_scraper run for every campaign listed by the latest projects_to_read.
+    '''
+    df_to_read = context.repository_def.load_asset_value(AssetKey('projects_to_read'), instance=context.instance)
+
+    for project_id in df_to_read['short_url']:
+        # one run per campaign and per projects_to_read materialization, a failed campaign can be rerun on its own
+        yield RunRequest(run_key=f'{project_id}:{asset_event.storage_id}', partition_key=project_id)
+
+
 # dagster `Definitions()`` are entities that dagster learns about by importing your code
 # we use Definitions() object here to combine definitions and have them aware of each other
-# combine between assets, jobs, and the schedule
+# combine between assets, jobs, the schedule and the sensor
 
 defs = Definitions(
-    assets=all_assets,                      # pass all assets, as we want to use all assets from the module
-    jobs=[kitabisascrape_job],              # pass the job...
-    schedules=[kitabisascrape_schedule]     # and the scheduler
-)
\ No newline at end of file
+    assets=all_assets,                          # pass all assets, as we want to use all assets from the module
+    jobs=[kitabisascrape_job, donors_job],      # pass the jobs...
+    schedules=[kitabisascrape_schedule],        # the scheduler...
+    sensors=[donors_sensor],                    # the sensor launching the donors of every campaign...
+    resources={'io_manager': ParquetIOManager(base_dir='data/io/')}     # and how the assets pass their DataFrames
+)
@@ -1,37 +1,65 @@
 import pandas as pd
-import os
 from modules import projects, donors
-from dagster import asset, AssetKey, AssetExecutionContext, MetadataValue, MaterializeResult
+from modules.cache import ResponseCache
+from modules.storage import ParquetStore
+from modules.snapshots import SnapshotStore
+from modules.state import CrawlState
+from modules.governor import RequestGovernor
+from modules.metrics import RunMetrics
+from modules.browser import shared_browser
+from dagster import (asset, AssetIn, AssetKey, AssetExecutionContext, Backoff, DynamicPartitionsDefinition, Failure, MetadataValue,
+                     MaterializeResult, Output, RetryPolicy)
 
 
+# the DataFrames returned by the assets below are handed to each other by the io manager (see io_managers.py)
+
 @asset
-def projects_scraper(context: AssetExecutionContext) -> MaterializeResult:
+def projects_scraper(context: AssetExecutionContext) -> Output[pd.DataFrame]:
     url = 'https://kitabisa.com/explore/all'
-    num_scroll = 300
+    num_scroll = 300        # upper bound, the scroll stops earlier once the listing stops growing
     save_path = 'data/'
-
-    with projects.Scraper(save_path) as projects_scraper:
+    pool_size = 4           # how many headless drivers read the project pages in parallel
+    recycle_after = 200     # restart a driver after this many pages to keep chrome memory bounded
+    max_memory_mb = 1024    # or as soon as it uses more memory than this
+    cache_path = 'data/cache/'  # raw campaign pages, reused by reruns while they're fresh
+    store = ParquetStore('data/lake/')  # typed snapshots, partitioned by scrape date
+    snapshots_path = 'data/project_history.db'  # the project properties, only the fields that changed since the previous run instead of a full snapshot
+    governor = RequestGovernor()  # paces the drivers of the pool together, slowing down when kitabisa pushes back
+    # stage latencies, pages, bytes, retries and driver memory, as json lines and a prometheus textfile
+    metrics = RunMetrics(log_path='data/metrics/projects_scraper.jsonl', prom_path='data/metrics/projects_scraper.prom',
+                         labels={'asset': 'projects_scraper'})
+
+    # warm headless drivers, reused by every scraper of the process instead of starting chrome for each of them
+    browser = shared_browser(size=pool_size, recycle_after=recycle_after, max_memory_mb=max_memory_mb)
+
+    with metrics, ResponseCache(cache_path) as cache, SnapshotStore(snapshots_path) as snapshots, \
+            projects.Scraper(save_path, pool_size, recycle_after, cache=cache, store=store, governor=governor, metrics=metrics,
+                             browser=browser, snapshots=snapshots) as projects_scraper:
         df_projects = projects_scraper.projectlist_scrape(url, num_scroll)
         df_project_props, file_path = projects_scraper.projectprops_scrape()
+        history = snapshots.stats()
     
     context.log.info(f"Successfully scrape {len(df_projects)} projects the data to a CSV file.")
+    run_metrics = metrics.summary()
     
-    return MaterializeResult(
+    return Output(
+        df_project_props,   # passed to the downstream (projects_filter) function
         metadata={
             "num_records": len(df_projects), 
             "preview": MetadataValue.md(df_project_props.head().to_markdown()),
-            "file_path": file_path  # pass file_path to downstream (projects_filter) function
+            "file_path": str(file_path),
+            "scraped_at": projects_scraper.today,
+            "changes": MetadataValue.json(projects_scraper.changes),
+            "history": MetadataValue.json(history),
+            "requests": MetadataValue.json(governor.stats()),
+            "pages_per_s": run_metrics['pages_per_s'],
+            "metrics": MetadataValue.json(run_metrics),
         }
     )
 
 
-@asset(deps=[projects_scraper])
-def projects_filter(context: AssetExecutionContext) -> MaterializeResult:
-
-    # access metadata that contains file_path from upstream function (projects_scraper)
-    event_log_entry = context.instance.get_latest_materialization_event(AssetKey('projects_scraper'))     
-    metadata = event_log_entry.dagster_event.event_specific_data.materialization.metadata     
-    file_path = metadata['file_path'].value
+@asset
+def projects_filter(context: AssetExecutionContext, projects_scraper: pd.DataFrame) -> Output[pd.DataFrame]:
 
     # define where to save the data
     save_path = 'data/'
@@ -40,66 +68,102 @@ def projects_filter(context: AssetExecutionContext) -> MaterializeResult:
     cols_to_take = ['short_url', 'donation_count', 'donation_received', 'donation_target', 'donation_percentage', 
                     'campaign_start', 'campaign_end', 'days_remaining', 'category.name', 'is_forever_running', 'is_open_goal']
 
-    df_projects_final = projects.ProjectsFinalize(file_path, save_path)
+    # name the cleaned and filtered projects after the run that scraped them, like its project_props
+    scraped = context.instance.get_latest_materialization_event(AssetKey('projects_scraper'))
+    scraped_at = scraped.asset_materialization.metadata.get('scraped_at') if scraped is not None else None
+
+    df_projects_final = projects.ProjectsFinalize(projects_scraper, save_path, store=ParquetStore('data/lake/'),
+                                                  timestamp=scraped_at.value if scraped_at is not None else None)
     df_projects_final.projects_data_cleaning(cols_to_take)
 
     df_projects_final, file_path = df_projects_final.projects_filter(donation_pct, dev_mode=True)
 
     context.log.info(f"Successfully cleaned and produce the final dataframe! Total records: {len(df_projects_final)}.")
 
-    return MaterializeResult(
+    return Output(
+        df_projects_final,
         metadata={
             "num_records": len(df_projects_final), 
             "preview": MetadataValue.md(df_projects_final.head().to_markdown()),
-            "filtered_file_path": file_path
+            "filtered_file_path": str(file_path)
         }
     )
 
 
-@asset(deps=[projects_filter])
-def projects_to_read(context: AssetExecutionContext) -> MaterializeResult:
-    
-    # access metadata that contains file_path from upstream function (projects_filter)
-    event_log_entry = context.instance.get_latest_materialization_event(AssetKey('projects_filter'))     
-    metadata = event_log_entry.dagster_event.event_specific_data.materialization.metadata     
-    file_path = metadata['filtered_file_path'].value
-
-    # filter all projects that we haven't read and saved into the data folder
-    data_folder = 'data/'
-    file_prefix = 'donorsinfo_appended_'
-    file_suffix = '.csv'
-
-    files = os.listdir(data_folder)
-    filtered_files = [f for f in files if f.startswith(file_prefix) and f.endswith(file_suffix)]
-    
-    # file_ids, that includes all the projects we have read
-    # projects_to_read, that includes all the projects we have filtered from the scraped data
-    file_ids = [f.replace(file_prefix, '').replace(file_suffix, '') for f in filtered_files]
-    projects_to_read = list(pd.read_csv(file_path)['short_url'])
+# only the short_url column of the filtered projects is read
+@asset(ins={'projects_filter': AssetIn(metadata={'columns': ['short_url']})})
+def projects_to_read(context: AssetExecutionContext, projects_filter: pd.DataFrame) -> Output[pd.DataFrame]:
 
-    # filter out projects_to_read
-    projects_to_read = [x for x in projects_to_read if x not in file_ids]
+    # the crawl state store is the manifest of every project crawled so far, with its status
+    state_path = 'data/crawl_state.db'
+    refresh_after = 20      # hours before a completely crawled project gets its new donations read again
 
-    return MaterializeResult(
+    with CrawlState(state_path) as state:
+        plan = state.plan(list(projects_filter['short_url']), refresh_after)
+
+    # projects never read or whose crawl didn't finish, then the projects we have read before but are still live,
+    # which only need the donations made since then
+    df_to_read = pd.DataFrame({
+        'short_url': plan['to_read'] + plan['to_refresh'],
+        'action': ['read'] * len(plan['to_read']) + ['refresh'] * len(plan['to_refresh']),
+    })
+
+    # register a donors_scraper partition for every campaign we haven't seen before
+    registered = set(context.instance.get_dynamic_partitions('campaigns'))
+    context.instance.add_dynamic_partitions('campaigns', [p for p in df_to_read['short_url'] if p not in registered])
+
+    return Output(
+        df_to_read,
         metadata={
-            "projects_to_read": projects_to_read
+            "num_to_read": len(plan['to_read']),
+            "num_to_refresh": len(plan['to_refresh'])
         }
     )
 
 
-@asset(deps=[projects_to_read])
-def donors_scraper(context: AssetExecutionContext) -> None:
-   
-    # access metadata that contains file_path from upstream function (projects_scraper)
-    event_log_entry = context.instance.get_latest_materialization_event(AssetKey('projects_to_read'))     
-    metadata = event_log_entry.dagster_event.event_specific_data.materialization.metadata     
-    list_projects_to_read = metadata['projects_to_read'].value
+# one partition per campaign, registered by projects_to_read, so every campaign is crawled, retried and rerun on its own
+campaign_partitions = DynamicPartitionsDefinition(name='campaigns')
+
+
+@asset(deps=[projects_to_read], partitions_def=campaign_partitions, pool='kitabisa_donors',
+       retry_policy=RetryPolicy(max_retries=3, delay=60, backoff=Backoff.EXPONENTIAL))
+def donors_scraper(context: AssetExecutionContext) -> MaterializeResult:
+    project_id = context.partition_key
 
     save_path = 'data/'
     max_attempts = 3
-
-    with donors.Scraper(save_path) as scraper:
-        for project in list_projects_to_read:
-            scraper.donors_scrape(project, max_attempts)
-    
-    context.log.info(f"Successfully read all the donor information from the projects we have.")
\ No newline at end of file
+    cache_path = 'data/cache/'  # raw donor pages, reused by reruns while they're fresh
+    store = ParquetStore('data/lake/')  # completed crawls are published here, partitioned by project and scrape date
+    governor = RequestGovernor()  # retries with backoff and slows down when kitabisa pushes back
+    metrics = RunMetrics(log_path='data/metrics/donors_scraper.jsonl', prom_path=f'data/metrics/donors_scraper_{project_id}.prom',
+                         labels={'asset': 'donors_scraper', 'project_id': project_id})
+
+    # a new project is crawled from the start, an unfinished crawl resumes where it stopped,
+    # and a project crawled completely before only gets its new donations
+    with metrics, ResponseCache(cache_path) as cache, donors.Scraper(save_path, cache=cache, store=store, governor=governor,
+                                                                     metrics=metrics) as scraper:
+        previous = scraper.state.get(project_id)
+        summary = scraper.donors_scrape(project_id, max_attempts, incremental=True)
+
+    delta = previous is not None and previous['status'] == 'done'
+    run_metrics = metrics.summary()
+    metadata = {
+        "project_id": project_id,
+        "num_pages": summary['pages'],
+        "num_records": summary['rows'],
+        "num_new_records": summary['rows'] - previous['rows'] if delta else summary['rows'],
+        "mode": 'delta' if delta else 'full',
+        "num_duplicates": summary['duplicates'],  # donations seen again on a shifted page or already stored, dropped before writing
+        "duplicate_rate": summary['duplicate_rate'],
+        "requests": MetadataValue.json(governor.stats()),
+        "pages_per_s": run_metrics['pages_per_s'],
+        "metrics": MetadataValue.json(run_metrics),
+    }
+
+    # the retry policy runs the partition again, resuming from the last committed page
+    if not summary['completed']:
+        raise Failure(description=f"Failed to read all the donors of {project_id} after {max_attempts} attempts on a page.", metadata=metadata)
+
+    context.log.info(f"Successfully read {metadata['num_new_records']} new donors of {project_id}.")
+
+    return MaterializeResult(metadata=metadata)
@@ -0,0 +1,44 @@
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dagster import ConfigurableIOManager, InputContext, OutputContext
+
+
+class ParquetIOManager(ConfigurableIOManager):
+    '''
+    Hand the DataFrames of the assets to each other as typed Parquet files, instead of passing file paths
+    and lists through the materialization metadata.
+
+    Every output is written once under base_dir (one file per partition for partitioned assets), and only the
+    columns listed in the `columns` metadata of the downstream input are read back, memory mapped.
+    '''
+
+    base_dir: str = 'data/io/'
+
+    def _path(self, context):
+        path = Path(self.base_dir).joinpath(*context.asset_key.path)
+        if context.has_asset_partitions:
+            return path / f'{context.asset_partition_key}.parquet'
+        return path.with_suffix('.parquet')
+
+    def handle_output(self, context: OutputContext, obj):
+        if obj is None:
+            return
+        if not isinstance(obj, pd.DataFrame):
+            raise TypeError(f'ParquetIOManager only stores DataFrames, got {type(obj).__name__}.')
+
+        path = self._path(context)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # write next to the file first, so a failed run never leaves a half written input for the next assets
+        tmp_path = path.with_suffix('.parquet.tmp')
+        pq.write_table(pa.Table.from_pandas(obj, preserve_index=False), tmp_path, compression='zstd')
+        tmp_path.replace(path)
+
+        context.add_output_metadata({'num_rows': len(obj), 'columns': list(obj.columns), 'path': str(path)})
+
+    def load_input(self, context: InputContext):
+        columns = (context.definition_metadata or {}).get('columns')
+        return pq.read_table(self._path(context), columns=columns, memory_map=True).to_pandas()
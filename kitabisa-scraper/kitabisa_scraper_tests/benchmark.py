@@ -0,0 +1,304 @@
+'''
+Offline benchmark of the scrapers against the local Kitabisa stand-in server.
+
+Every scenario runs end to end in its own process, so its peak memory is measured on its own, and reports
+the pages read per second, the wall time and the peak RSS. The results are compared with the stored
+baseline, run it before and after a change to see whether it made the scrapers faster or slower:
+
+    python -m kitabisa_scraper_tests.benchmark                   # compare with benchmark_baseline.json
+    python -m kitabisa_scraper_tests.benchmark --save-baseline   # store the results as the new baseline
+    python -m kitabisa_scraper_tests.benchmark donors --scale 4  # only some scenarios, with more data
+
+The baseline depends on the machine it was recorded on, record a new one before comparing on another machine.
+'''
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+from dagster import DagsterInstance, materialize
+
+# imported before the scenarios start, so their wall time doesn't include loading pandas or dagster
+from kitabisa_scraper import assets
+from kitabisa_scraper.io_managers import ParquetIOManager
+from modules import projects, donors
+from modules.browser import BrowserManager
+from modules.crawler import DonorsCrawler
+from modules.governor import RequestGovernor
+from modules.metrics import RunMetrics, peak_rss
+from modules.state import CrawlState
+from kitabisa_scraper_tests.standin import KitabisaStandin, StandinBrowser, make_campaigns, make_donations
+
+
+BASELINE_PATH = Path(__file__).with_name('benchmark_baseline.json')
+PACKAGE_ROOT = Path(__file__).resolve().parents[1]
+
+# the dependencies of the scrapers and the assets, checking the crawl state from the command line shouldn't load any of them
+HEAVY_MODULES = ('dagster', 'lxml', 'numpy', 'pandas', 'pyarrow', 'requests', 'selenium')
+
+# the stand-in answers right away, so the listing doesn't need the few seconds the live site needs to load more cards
+SCROLL_TIMEOUT = 0.3
+
+
+def _fast_governor():
+    # the stand-in is local, so only the throttling it injects should slow the crawl down
+    return RequestGovernor(rate=200, max_rate=1000, burst=50, target_latency=1, backoff_base=0.05, backoff_cap=1, cooldown=1)
+
+
+def _crawl_donors(workdir, donations, standin, governor=None, max_rounds=5):
+    metrics = RunMetrics()
+    pending = list(donations)
+    with donors.Scraper(str(workdir) + '/', base_url=standin.url, governor=governor, metrics=metrics) as scraper:
+        # the crawls stopped by the injected errors are resumed, as the retry policy of the job would
+        for _ in range(max_rounds):
+            progress = DonorsCrawler(scraper, max_concurrency=8, max_per_host=8).crawl(pending, max_attempts=5)
+            pending = [project_id for project_id, p in progress.items() if p['status'] != 'done']
+            if not pending:
+                break
+
+    if pending:
+        raise RuntimeError(f'{len(pending)} campaigns were not crawled completely.')
+    rows = sum(sum(1 for _ in open(workdir / f'donorsinfo_appended_{project_id}.csv')) - 1 for project_id in donations)
+    expected = sum(len(d) for d in donations.values())
+    if rows != expected:
+        raise RuntimeError(f'Read {rows} donors instead of {expected}.')
+    return metrics.summary()
+
+
+def scenario_donors(workdir, scale):
+    '''
+    Crawl the donors of many campaigns at once through the http engine, with a few milliseconds of latency.
+    '''
+    donations = {f'bantuwarga{n}': make_donations(300) for n in range(max(1, int(16 * scale)))}
+    with KitabisaStandin(donations, latency=0.005) as standin:
+        summary = _crawl_donors(workdir, donations, standin)
+    return {'pages': summary['counters']['pages'], 'rows': summary['counters']['rows']}
+
+
+def scenario_donors_faults(workdir, scale):
+    '''
+    Same crawl through the request governor, while the server fails 5% of the pages and throttles above 150 requests per second.
+    '''
+    donations = {f'bantuwarga{n}': make_donations(300) for n in range(max(1, int(16 * scale)))}
+    with KitabisaStandin(donations, latency=0.005, error_rate=0.05, max_rps=150) as standin:
+        summary = _crawl_donors(workdir, donations, standin, governor=_fast_governor())
+    return {'pages': summary['counters']['pages'], 'rows': summary['counters']['rows'],
+            'retries': summary['counters'].get('retries', 0), 'injected': standin.injected}
+
+
+def scenario_projects(workdir, scale):
+    '''
+    Scroll the explore listing to the end, then read every campaign page and extract its __NEXT_DATA__.
+    '''
+    campaigns = make_campaigns(max(12, int(240 * scale)))
+    metrics = RunMetrics()
+    with KitabisaStandin({}, campaigns=campaigns, latency=0.005) as standin, \
+            BrowserManager(driver_factory=lambda: StandinBrowser(standin.url)) as browser:
+        with projects.Scraper(str(workdir) + '/', pool_size=8, base_url=standin.url, metrics=metrics, browser=browser) as scraper:
+            df_projects = scraper.projectlist_scrape(standin.url + '/explore/all', 300, patience=2, scroll_timeout=SCROLL_TIMEOUT)
+            df_project_props, _ = scraper.projectprops_scrape()
+
+    if len(df_projects) != len(campaigns) or len(df_project_props) != len(campaigns):
+        raise RuntimeError(f'Read {len(df_projects)} cards and {len(df_project_props)} campaigns instead of {len(campaigns)}.')
+    # the explore page and every batch of cards count as pages too
+    return {'pages': len(standin.requests), 'rows': len(df_project_props)}
+
+
+def scenario_job(workdir, scale):
+    '''
+    Materialize the Dagster assets end to end: the projects, their filter, the campaigns to read and one donors_scraper
+    partition per campaign, as the job and the sensor would.
+    '''
+    campaigns = make_campaigns(max(10, int(40 * scale)))
+    # projects_filter keeps the campaigns between 10% and 50%
+    expected = [c['short_url'] for c in campaigns if 0.1 < c['donation_percentage'] < 0.5]
+    donations = {short_url: make_donations(100) for short_url in expected}
+
+    os.chdir(workdir)
+    instance = DagsterInstance.ephemeral()
+    resources = {'io_manager': ParquetIOManager(base_dir='data/io/')}
+    run_config = {'loggers': {'console': {'config': {'log_level': 'WARNING'}}}}  # the steps of every run would bury the results
+
+    with KitabisaStandin(donations, campaigns=campaigns, latency=0.005) as standin:
+
+        class StandinScraper(projects.Scraper):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, base_url=standin.url, **kwargs)
+
+            def projectlist_scrape(self, url, num_scroll, patience=3, scroll_timeout=SCROLL_TIMEOUT):
+                return super().projectlist_scrape(url, num_scroll, patience, scroll_timeout)
+
+        browser = BrowserManager(driver_factory=lambda: StandinBrowser(standin.url))
+        with browser, mock.patch.object(assets, 'shared_browser', lambda **options: browser), \
+                mock.patch.object(assets.projects, 'Scraper', StandinScraper), \
+                mock.patch.object(assets.donors, 'Scraper', functools.partial(donors.Scraper, base_url=standin.url)), \
+                mock.patch.object(assets, 'RequestGovernor', _fast_governor):
+            result = materialize([assets.projects_scraper, assets.projects_filter, assets.projects_to_read],
+                                 resources=resources, instance=instance, run_config=run_config)
+            pages = result.asset_materializations_for_node('projects_scraper')[0].metadata['metrics'].value['counters']['pages']
+
+            rows = 0
+            for partition in instance.get_dynamic_partitions('campaigns'):
+                result = materialize([assets.donors_scraper], partition_key=partition, resources=resources, instance=instance,
+                                     run_config=run_config)
+                metadata = result.asset_materializations_for_node('donors_scraper')[0].metadata
+                pages += metadata['num_pages'].value
+                rows += metadata['num_records'].value
+
+    if sorted(instance.get_dynamic_partitions('campaigns')) != sorted(expected) or rows != 100 * len(expected):
+        raise RuntimeError(f'Read {rows} donors of {len(instance.get_dynamic_partitions("campaigns"))} campaigns, '
+                           f'instead of {100 * len(expected)} donors of {len(expected)} campaigns.')
+    return {'pages': pages, 'rows': rows}
+
+
+def _run_cli(workdir, argv):
+    # -X importtime writes the cumulative import time of every module to stderr, nested imports are indented
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-m', 'modules.cli'] + argv, cwd=PACKAGE_ROOT,
+                             capture_output=True, text=True, check=True)
+    import_us, imported = 0, set()
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        imported.add(name.strip().split('.')[0])
+        if not name[1:].startswith(' '):
+            import_us += int(cumulative)
+    return import_us / 1000, sorted(imported.intersection(HEAVY_MODULES))
+
+
+def scenario_startup(workdir, scale):
+    '''
+    Check the crawl state with the status subcommand in a new interpreter every time, as a cron wrapper would,
+    and measure its import time. Every run counts as a page.
+    '''
+    with CrawlState(workdir / 'crawl_state.db') as state:
+        for n in range(50):
+            state.commit(f'bantuwarga{n}', '' if n % 5 else 'page_3', 3, 30, 3000, 'done' if n % 5 else 'failed', 1000000 + n)
+
+    runs = max(2, int(20 * scale))
+    import_ms = []
+    for _ in range(runs):
+        ms, heavy = _run_cli(workdir, ['status', '--save-path', str(workdir) + '/'])
+        if heavy:
+            raise RuntimeError(f"The status subcommand imported {', '.join(heavy)}.")
+        import_ms.append(ms)
+    return {'pages': runs, 'rows': runs, 'import_ms': round(min(import_ms), 1)}
+
+
+SCENARIOS = {
+    'donors': scenario_donors,
+    'donors_faults': scenario_donors_faults,
+    'projects': scenario_projects,
+    'job': scenario_job,
+    'startup': scenario_startup,
+}
+
+
+def _run_scenario(name, scale, results):
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        start = time.perf_counter()
+        try:
+            result = SCENARIOS[name](Path(workdir), scale)
+        finally:
+            os.chdir(cwd)
+        wall = time.perf_counter() - start
+
+    result.update(wall_s=round(wall, 3), pages_per_s=round(result['pages'] / wall, 1), peak_rss_mb=round(peak_rss() / 1024 ** 2, 1))
+    results.put(result)
+
+
+def run_scenario(name, scale=1):
+    '''
+    Run a scenario in a new process, so its peak memory isn't mixed with the other scenarios.
+
+    Args:
+        name (str): The name of the scenario, a key of SCENARIOS.
+        scale (float, optional): Multiplier of the number of campaigns. Defaults to 1.
+
+    Returns:
+        dict: The pages and rows read, wall_s, pages_per_s and peak_rss_mb.
+    '''
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=_run_scenario, args=(name, scale, results))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        raise RuntimeError(f'The {name} scenario failed, see the traceback above.')
+    return results.get()
+
+
+def compare(results, baseline, tolerance=0.25):
+    '''
+    Compare the results of the scenarios with the baseline.
+
+    Args:
+        results (dict): Results of every scenario, as returned by run_scenario.
+        baseline (dict): Results stored as the baseline.
+        tolerance (float, optional): Relative change allowed before it counts as a regression. Defaults to 0.25.
+
+    Returns:
+        list: The regressions found, as readable strings.
+    '''
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]
+        if result['pages_per_s'] < before['pages_per_s'] * (1 - tolerance):
+            regressions.append(f"{name}: {result['pages_per_s']} pages/s, down from {before['pages_per_s']}")
+        if result['wall_s'] > before['wall_s'] * (1 + tolerance):
+            regressions.append(f"{name}: {result['wall_s']} s, up from {before['wall_s']}")
+        if result['peak_rss_mb'] > before['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(f"{name}: {result['peak_rss_mb']} MB peak RSS, up from {before['peak_rss_mb']}")
+        if 'import_ms' in before and result['import_ms'] > before['import_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: {result['import_ms']} ms of imports, up from {before['import_ms']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the scrapers against the local Kitabisa stand-in server.')
+    parser.add_argument('scenarios', nargs='*', help=f"scenarios to run, all of them by default: {', '.join(SCENARIOS)}")
+    parser.add_argument('--scale', type=float, default=1, help='multiplier of the number of campaigns')
+    parser.add_argument('--baseline', default=str(BASELINE_PATH), help='JSON file of the baseline')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='relative change allowed before failing')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of every scenario, the fastest one is kept')
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    results = {}
+    for name in args.scenarios or SCENARIOS:
+        # the fastest run is the least disturbed by whatever else the machine was doing
+        results[name] = min((run_scenario(name, args.scale) for _ in range(args.repeat)), key=lambda result: result['wall_s'])
+        print(f"{name:<15} {results[name]['pages']:>7} pages  {results[name]['wall_s']:>8.2f} s  "
+              f"{results[name]['pages_per_s']:>8.1f} pages/s  {results[name]['peak_rss_mb']:>7.1f} MB")
+
+    baseline_path = Path(args.baseline)
+    baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+    if args.save_baseline:
+        baseline.update({name: dict(result, scale=args.scale) for name, result in results.items()})
+        baseline_path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+        print(f'Saved the baseline to {baseline_path}.')
+        return 0
+
+    # only the scenarios run at the scale of the baseline are comparable
+    comparable = {name: result for name, result in results.items() if baseline.get(name, {}).get('scale') == args.scale}
+    regressions = compare(comparable, baseline, args.tolerance)
+    for regression in regressions:
+        print('REGRESSION', regression)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,338 @@
+import json
+import random
+import socket
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import requests
+
+
+def make_donations(num_donations, start_id=1000000, start_ts=1712900000):
+    '''
+    Build a list of synthetic donations, sorted from the newest one like the donors API does.
+
+    Args:
+        num_donations (int): How many donations to generate.
+        start_id (int, optional): The id of the oldest donation. Defaults to 1000000.
+        start_ts (int, optional): The unix timestamp of the oldest donation. Defaults to 1712900000.
+
+    Returns:
+        list: List of donation dicts.
+    '''
+    donations = []
+    for n in range(num_donations):
+        donations.append({
+            'id': start_id + n,
+            'is_anonymous': n % 3 == 0,
+            'amount': 5000 * (n % 7 + 1),
+            'created': start_ts + 60 * n,
+            'user': {'name': f'donor {n}', 'string': None if n % 2 else f'https://img.example/{n}.jpg'},
+        })
+    return donations[::-1]
+
+
+def make_campaign_page(campaign):
+    '''
+    Render a campaign page the way Kitabisa's Next.js frontend does, with the campaign embedded in `__NEXT_DATA__`.
+
+    Args:
+        campaign (dict): The campaign, as found in `dataCampaigns`.
+
+    Returns:
+        str: The html of the page.
+    '''
+    next_data = {'props': {'pageProps': {'dehydratedState': {'queries': [{'state': {'data': {'dataCampaigns': campaign}}}]}}},
+                 'page': '/campaign/[shortUrl]'}
+    return ('<!DOCTYPE html><html><head><title>' + campaign.get('title', '') + '</title></head><body><div id="__next"></div>'
+            '<script id="__NEXT_DATA__" type="application/json">' + json.dumps(next_data) + '</script></body></html>')
+
+
+def make_campaigns(num_campaigns, start_ts=1712900000):
+    '''
+    Build a list of synthetic campaigns, as found in `dataCampaigns`, cycling through every donation percentage
+    from 0% to 90% so that some of them pass the filters of projects_filter.
+
+    Args:
+        num_campaigns (int): How many campaigns to generate.
+        start_ts (int, optional): The unix timestamp the campaigns start at. Defaults to 1712900000.
+
+    Returns:
+        list: List of campaign dicts.
+    '''
+    campaigns = []
+    for n in range(num_campaigns):
+        percentage = (n % 10) / 10
+        campaigns.append({
+            'id': 5000 + n,
+            'title': f'Bantu Warga {n}',
+            'short_url': f'bantuwarga{n}',
+            'is_forever_running': False,
+            'is_open_goal': False,
+            'donation_received': int(percentage * 10000000),
+            'donation_count': 10 * n,
+            'donation_target': 10000000,
+            'donation_percentage': percentage,
+            'campaign_start': start_ts,
+            'campaign_end': start_ts + 90 * 24 * 60 * 60,
+            'campaign_last_update': start_ts + 24 * 60 * 60,
+            'days_remaining': 30,
+            'is_open_for_donation': True,
+            'is_verified': n % 2 == 0,
+            'campaigner': {'name': 'Orang Baik', 'type': 'PERSONAL'},
+            'category': {'name': 'Kemanusiaan'},
+        })
+    return campaigns
+
+
+def make_project_card(campaign):
+    '''
+    Render the card of a campaign the way the explore listing does.
+    '''
+    return ('<a href="/campaign/' + campaign['short_url'] + '"><div>'
+            '<span class="my-[0.25em] mx-[0em] overflow-hidden break-words text-sm font-semibold text-tundora">' + campaign['title'] + '</span>'
+            '<div class="my-[0.25em] mx-[0em] flex w-full items-center align-middle text-xs text-[rgba(0,0,0,0.9)]">'
+            + campaign['campaigner']['name'] + '</div>'
+            '<div class="flex flex-col">TerkumpulRp' + f"{campaign['donation_received']:,}".replace(',', '.') + '</div>'
+            '<div class="flex flex-col text-right">Sisa hari' + str(campaign['days_remaining']) + '</div>'
+            '</div></a>')
+
+
+# the explore page loads its next cards when scrolled to the bottom, like the infinite listing of Kitabisa
+EXPLORE_SCRIPT = '''
+<script>
+let loading = false;
+window.addEventListener('scroll', async () => {
+  const main = document.getElementById('cards');
+  if (loading || main.dataset.done === 'true' || window.innerHeight + window.scrollY < document.body.scrollHeight - 10) return;
+  loading = true;
+  const response = await fetch('/explore/all?offset=' + main.children.length);
+  const fragment = await response.text();
+  if (fragment === '') main.dataset.done = 'true';
+  main.insertAdjacentHTML('beforeend', fragment);
+  loading = false;
+});
+</script>
+'''
+
+
+class KitabisaStandin:
+    '''
+    A local stand-in server for the Kitabisa APIs, used to test the scrapers without hitting the live site.
+
+    Args:
+        donations (dict): Mapping of project_id to its list of donations, newest first.
+        page_size (int, optional): How many donations or campaigns are returned per page. Defaults to 10.
+        campaigns (list, optional): Campaigns served by the `/campaigns` listing endpoint, the `/explore/all` page and the 
+                                    `/campaign/<short_url>` pages. Defaults to None.
+        cards_per_scroll (int, optional): How many cards of the explore page are loaded at once. Defaults to 12.
+        latency (float, optional): Seconds every response is delayed by. Defaults to 0.
+        error_rate (float, optional): Share of the donor and campaign pages answered with a 500. Defaults to 0.
+        max_rps (float, optional): Requests per second above which the server answers 429 with a Retry-After. Defaults to None, never throttling.
+        retry_after (int, optional): Seconds asked in the Retry-After header of a 429. Defaults to 1.
+        seed (int, optional): Seed of the injected errors. Defaults to 0.
+
+    Attributes:
+        requests (list): Paths of all requests the server received.
+        fail_cursors (set): Cursors of donor pages that answer with an error.
+        injected (dict): How many errors and 429 were injected.
+    '''
+
+    def __init__(self, donations, page_size=10, campaigns=None, cards_per_scroll=12, latency=0, error_rate=0, max_rps=None,
+                 retry_after=1, seed=0):
+        self.donations = donations
+        self.page_size = page_size
+        self.campaigns = campaigns or []
+        self.cards_per_scroll = cards_per_scroll
+        self.latency = latency
+        self.error_rate = error_rate
+        self.max_rps = max_rps
+        self.retry_after = retry_after
+        self.requests = []
+        self.fail_cursors = set()
+        self.injected = {'errors': 0, 'throttled': 0}
+        self.server = None
+        self.thread = None
+        self._rng = random.Random(seed)
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                # the headers and the body are written separately, without this every response waits for a delayed ack
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_GET(self):
+                standin.requests.append(self.path)
+                if standin.latency:
+                    time.sleep(standin.latency)
+                status, body, headers = standin.respond(self.path)
+                # pages are served as html, everything else as json
+                if isinstance(body, str):
+                    payload, content_type = body.encode(), 'text/html; charset=utf-8'
+                else:
+                    payload, content_type = json.dumps(body).encode(), 'application/json'
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def respond(self, path):
+        '''
+        Answer a request, injecting the throttling and the errors before routing it.
+
+        Returns:
+            tuple: The status, the body and the extra headers of the response.
+        '''
+        if self.max_rps is not None:
+            now = time.monotonic()
+            with self._lock:
+                while self._recent and self._recent[0] <= now - 1:
+                    self._recent.popleft()
+                throttled = len(self._recent) >= self.max_rps
+                if throttled:
+                    self.injected['throttled'] += 1
+                else:
+                    self._recent.append(now)
+            if throttled:
+                return 429, {'message': 'too many requests'}, {'Retry-After': str(self.retry_after)}
+
+        if self.error_rate and not path.startswith('/explore'):
+            with self._lock:
+                failed = self._rng.random() < self.error_rate
+                if failed:
+                    self.injected['errors'] += 1
+            if failed:
+                return 500, {'message': 'internal server error'}, {}
+
+        status, body = self.route(path)
+        return status, body, {}
+
+    def route(self, path):
+        parsed = urlparse(path)
+        parts = parsed.path.strip('/').split('/')
+
+        if len(parts) == 3 and parts[0] == 'campaigns' and parts[2] == 'donors':
+            return self.donors_page(parts[1], parse_qs(parsed.query))
+        if parts == ['campaigns']:
+            return self.campaigns_page(parse_qs(parsed.query))
+        if len(parts) == 2 and parts[0] == 'campaign':
+            return self.campaign_page(parts[1])
+        if parts == ['explore', 'all']:
+            return self.explore_page(parse_qs(parsed.query))
+        return 404, {'message': 'not found'}
+
+    def explore_page(self, query):
+        # the page itself holds the first cards, every scroll then asks for the cards from `offset`
+        if 'offset' in query:
+            start = int(query['offset'][0])
+            return 200, ''.join(make_project_card(c) for c in self.campaigns[start:start + self.cards_per_scroll])
+
+        cards = ''.join(make_project_card(c) for c in self.campaigns[:self.cards_per_scroll])
+        return 200, ('<!DOCTYPE html><html><head><title>Explore</title></head><body>'
+                     '<main id="cards">' + cards + '</main>' + EXPLORE_SCRIPT + '</body></html>')
+
+    def campaign_page(self, short_url):
+        campaign = next((c for c in self.campaigns if c['short_url'] == short_url), None)
+        if campaign is None:
+            return 404, '<html><body>not found</body></html>'
+        return 200, make_campaign_page(campaign)
+
+    def campaigns_page(self, query):
+        # the cursor of the listing is simply the offset of the next page
+        start = int(query.get('next', ['0'])[0])
+        page = self.campaigns[start:start + self.page_size]
+        more = start + self.page_size < len(self.campaigns)
+        return 200, {'data': page, 'next': str(start + self.page_size) if more else ''}
+
+    def donors_page(self, project_id, query):
+        if project_id not in self.donations:
+            return 404, {'message': 'campaign not found'}
+
+        donations = self.donations[project_id]
+        cursor = query.get('next', [''])[0]
+        if cursor in self.fail_cursors:
+            return 500, {'message': 'internal server error'}
+
+        # the cursor is `<id>_<created>` of the last donation on the previous page
+        start = 0
+        if cursor:
+            last_id = int(cursor.split('_')[0])
+            start = next((n + 1 for n, d in enumerate(donations) if d['id'] == last_id), len(donations))
+
+        page = donations[start:start + self.page_size]
+        more = start + self.page_size < len(donations)
+        next_cursor = f"{page[-1]['id']}_{page[-1]['created']}" if page and more else ''
+        return 200, {'data': page, 'next': next_cursor}
+
+
+class StandinBrowser:
+    '''
+    A minimal stand-in for a Chrome WebDriver, loading the pages of the stand-in server over http. On the explore
+    page, every scroll appends the next cards, like the script of the page does in a real browser.
+
+    Args:
+        base_url (str): Root URL of the stand-in server, every page loaded is read from it.
+    '''
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.html = ''
+        self.done = False
+
+    def _fetch(self, path):
+        response = self.session.get(self.base_url + path)
+        response.raise_for_status()
+        return response.text
+
+    def get(self, url):
+        if url == 'about:blank':
+            self.html, self.done = '', False
+            return
+        parsed = urlparse(url)
+        self.html = self._fetch(parsed.path + ('?' + parsed.query if parsed.query else ''))
+        self.done = False
+
+    @property
+    def page_source(self):
+        return self.html
+
+    def execute_script(self, script):
+        cards = self.html.count('<a href="/campaign/')
+        if script.startswith('window.scrollTo'):
+            fragment = '' if self.done else self._fetch(f'/explore/all?offset={cards}')
+            self.done = fragment == ''
+            self.html = self.html.replace('</main>', fragment + '</main>', 1)
+            return None
+        return [cards * 300, cards]
+
+    def quit(self):
+        self.session.close()
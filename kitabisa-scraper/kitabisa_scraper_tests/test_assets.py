@@ -1 +1,75 @@
+import functools
 
+import pandas as pd
+from dagster import AssetKey, AssetMaterialization, DagsterInstance, materialize
+
+import kitabisa_scraper
+from kitabisa_scraper import assets
+from kitabisa_scraper.io_managers import ParquetIOManager
+from modules import donors
+from modules.cache import ResponseCache
+from modules.state import CrawlState
+from kitabisa_scraper_tests.standin import KitabisaStandin, make_donations
+
+
+def test_donors_scraper_materializes_one_campaign_per_partition(tmp_path, monkeypatch):
+    donations = {'bantuwarga': make_donations(45), 'sehatisyawal': make_donations(12)}
+    monkeypatch.chdir(tmp_path)
+    instance = DagsterInstance.ephemeral()
+    instance.add_dynamic_partitions('campaigns', ['bantuwarga', 'sehatisyawal'])
+
+    with KitabisaStandin(donations) as standin:
+        monkeypatch.setattr(assets.donors, 'Scraper', functools.partial(donors.Scraper, base_url=standin.url))
+        # every response is stale right away, so the rerun sees the new donations on the first page
+        monkeypatch.setattr(assets, 'ResponseCache', functools.partial(ResponseCache, ttls=[], default_ttl=-1))
+        result = materialize([assets.donors_scraper], partition_key='bantuwarga', instance=instance)
+
+        donations['bantuwarga'][:0] = make_donations(5, start_id=donations['bantuwarga'][0]['id'] + 1)
+        rerun = materialize([assets.donors_scraper], partition_key='bantuwarga', instance=instance)
+
+    assert result.success
+    metadata = result.asset_materializations_for_node('donors_scraper')[0].metadata
+    assert metadata['num_records'].value == 45
+    assert metadata['mode'].value == 'full'
+
+    # the second run of the partition only reads the new donations
+    metadata = rerun.asset_materializations_for_node('donors_scraper')[0].metadata
+    assert (metadata['mode'].value, metadata['num_new_records'].value) == ('delta', 5)
+    assert not (tmp_path / 'data' / 'donorsinfo_appended_sehatisyawal.csv').exists()
+
+
+def test_projects_assets_hand_dataframes_through_the_io_manager(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    instance = DagsterInstance.ephemeral()
+    io_manager = ParquetIOManager()
+
+    # what projects_scraper would have handed over
+    df_props = pd.DataFrame({'short_url': ['a', 'b', 'c', 'd'], 'donation_percentage': [0.05, 0.3, 0.4, 0.9],
+                             'donation_count': 3, 'donation_received': 1000, 'donation_target': 5000,
+                             'campaign_start': 1700000000, 'campaign_end': 1720000000, 'days_remaining': 10,
+                             'category.name': 'Medis', 'is_forever_running': False, 'is_open_goal': False,
+                             'time_scraped': '2024-04-13 00:00:10'})
+    # the run started before midnight, its pages were read after it
+    instance.report_runless_asset_event(AssetMaterialization('projects_scraper', metadata={'scraped_at': '2024-04-12 23:59:00'}))
+    (tmp_path / 'data' / 'io').mkdir(parents=True)
+    df_props.to_parquet(tmp_path / 'data' / 'io' / 'projects_scraper.parquet')
+    with CrawlState('data/crawl_state.db') as state:
+        state.commit('c', '', pages=1, rows=5, file_offset=500, status='done')
+        state.conn.execute("UPDATE crawl_state SET updated_at = '2024-01-01 00:00:00'")
+
+    result = materialize([assets.projects_scraper, assets.projects_filter, assets.projects_to_read],
+                         selection=['projects_filter', 'projects_to_read'], resources={'io_manager': io_manager}, instance=instance)
+
+    assert result.success
+    df_to_read = kitabisa_scraper.defs.load_asset_value(AssetKey('projects_to_read'), instance=instance)
+    assert list(df_to_read['short_url']) == ['b', 'c']
+    assert list(df_to_read['action']) == ['read', 'refresh']
+    assert instance.get_dynamic_partitions('campaigns') == ['b', 'c']
+    # the filtered projects land in the partition of the run, next to its project_props
+    filtered_path = result.asset_materializations_for_node('projects_filter')[0].metadata['filtered_file_path'].value
+    assert filtered_path.endswith('scrape_date=2024-04-12')
+
+    # the lists stay out of the event log, only their sizes are recorded
+    metadata = result.asset_materializations_for_node('projects_to_read')[0].metadata
+    assert metadata['num_to_read'].value == 1
+    assert 'projects_to_read' not in metadata
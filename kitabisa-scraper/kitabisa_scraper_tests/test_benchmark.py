@@ -0,0 +1,42 @@
+import pytest
+
+from kitabisa_scraper_tests import benchmark
+
+
+@pytest.mark.parametrize('name', list(benchmark.SCENARIOS))
+def test_benchmark_scenarios_run_end_to_end(name, tmp_path, monkeypatch):
+    # the scenarios raise if they didn't read every page of the stand-in
+    monkeypatch.chdir(tmp_path)
+    result = benchmark.SCENARIOS[name](tmp_path, scale=0.1)
+
+    assert result['pages'] > 0
+    assert result['rows'] > 0
+
+
+def test_donors_faults_scenario_recovers_from_the_injected_errors(tmp_path):
+    result = benchmark.scenario_donors_faults(tmp_path, scale=0.25)
+
+    assert result['rows'] == 4 * 300
+    assert result['retries'] >= result['injected']['errors'] > 0
+
+
+def test_run_scenario_measures_a_separate_process():
+    result = benchmark.run_scenario('donors', scale=0.1)
+
+    assert result['pages'] == 30
+    assert result['wall_s'] > 0
+    assert result['pages_per_s'] == pytest.approx(result['pages'] / result['wall_s'], rel=0.05)
+    assert result['peak_rss_mb'] > 0
+
+
+def test_compare_reports_the_regressions_beyond_the_tolerance():
+    baseline = {'donors': {'pages_per_s': 100, 'wall_s': 10, 'peak_rss_mb': 200},
+                'projects': {'pages_per_s': 100, 'wall_s': 10, 'peak_rss_mb': 200}}
+    results = {'donors': {'pages_per_s': 90, 'wall_s': 11, 'peak_rss_mb': 210},
+               'projects': {'pages_per_s': 50, 'wall_s': 20, 'peak_rss_mb': 300},
+               'job': {'pages_per_s': 1, 'wall_s': 100, 'peak_rss_mb': 999}}
+
+    regressions = benchmark.compare(results, baseline, tolerance=0.25)
+
+    assert len(regressions) == 3
+    assert all(r.startswith('projects:') for r in regressions)
@@ -0,0 +1,144 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from modules import browser, projects
+from modules.browser import DriverPool, BrowserManager
+from kitabisa_scraper_tests.standin import KitabisaStandin, StandinBrowser, make_campaigns
+
+
+class FakeDriver:
+    instances = []
+
+    def __init__(self):
+        self.pages = []
+        self.closed = False
+        FakeDriver.instances.append(self)
+
+    def get(self, url):
+        self.pages.append(url)
+
+    def quit(self):
+        self.closed = True
+
+
+def test_driver_pool_keeps_order_and_recycles_drivers():
+    FakeDriver.instances = []
+
+    def load(driver, item):
+        driver.get(item)
+        return item * 2
+
+    with DriverPool(3, recycle_after=5, driver_factory=FakeDriver) as pool:
+        results = pool.map(load, list(range(40)))
+
+    assert results == [item * 2 for item in range(40)]
+    assert all(len(driver.pages) <= 5 for driver in FakeDriver.instances)
+    assert sum(len(driver.pages) for driver in FakeDriver.instances) == 40
+    assert len(FakeDriver.instances) >= 40 // 5
+    assert pool.restarts >= len(FakeDriver.instances) - 3
+    assert all(driver.closed for driver in FakeDriver.instances)
+
+
+def test_driver_pool_restarts_a_driver_above_its_memory_ceiling():
+    FakeDriver.instances = []
+    memory = {}
+
+    def memory_of(driver):
+        # every page leaks 100 MB
+        memory[driver] = memory.get(driver, 0) + 100
+        return memory[driver]
+
+    with DriverPool(1, recycle_after=1000, driver_factory=FakeDriver, max_memory=250, check_every=1, memory_of=memory_of) as pool:
+        pool.map(lambda driver, item: driver.get(item), list(range(9)))
+
+    # a driver serves 3 pages before its memory goes above the ceiling
+    assert pool.memory_restarts == 3
+    assert [len(driver.pages) for driver in FakeDriver.instances] == [3, 3, 3, 0]
+
+
+def test_driver_pool_replaces_failed_drivers_without_shrinking():
+    FakeDriver.instances = []
+    starts = []
+
+    def factory():
+        # the third start of a driver fails
+        starts.append(len(starts))
+        if len(starts) == 3:
+            raise RuntimeError('chrome did not start')
+        return FakeDriver()
+
+    def load(driver, item):
+        if item == 0:
+            raise RuntimeError('tab crashed')
+        driver.get(item)
+
+    with DriverPool(1, recycle_after=2, driver_factory=factory) as pool:
+        with pytest.raises(RuntimeError, match='tab crashed'):
+            pool.run(load, 0)
+        # the crashed driver was quit and replaced instead of going back to the pool
+        assert FakeDriver.instances[0].closed
+        assert pool.restarts == 1
+
+        # the second page recycles the driver, the replacement fails to start and its slot is dropped
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(pool.map, load, [1, 2, 3, 4, 5]).result(timeout=5)
+        assert len(pool._drivers) == 1
+
+    assert sum(len(driver.pages) for driver in FakeDriver.instances) == 5
+    assert all(driver.closed for driver in FakeDriver.instances)
+
+
+def test_new_driver_blocks_resources_and_loads_eagerly(monkeypatch):
+    started = []
+
+    class FakeChrome:
+        def __init__(self, options):
+            self.options = options
+            self.cdp = []
+            started.append(self)
+
+        def execute_cdp_cmd(self, cmd, params):
+            self.cdp.append((cmd, params))
+
+    # new_driver imports selenium when it's called
+    monkeypatch.setattr('selenium.webdriver.Chrome', FakeChrome)
+
+    driver = browser.new_driver()
+    assert '--headless=new' in driver.options.arguments
+    assert driver.options.page_load_strategy == 'eager'
+    assert ('Network.setBlockedURLs', {'urls': browser.BLOCKED_URLS}) in driver.cdp
+
+    driver = browser.new_driver(headless=False, block_resources=False, page_load_strategy='normal')
+    assert not any(argument.startswith('--headless') for argument in driver.options.arguments)
+    assert driver.cdp == []
+
+
+def test_scrapers_share_the_warm_drivers_of_a_browser_manager(tmp_path):
+    campaigns = make_campaigns(30)
+    started = []
+
+    with KitabisaStandin({}, campaigns=campaigns) as standin:
+        def factory():
+            started.append(StandinBrowser(standin.url))
+            return started[-1]
+
+        with BrowserManager(size=2, driver_factory=factory) as shared:
+            for run in range(2):
+                with projects.Scraper(str(tmp_path) + f'/{run}/', engine='selenium', base_url=standin.url, browser=shared) as scraper:
+                    df_projects = scraper.projectlist_scrape(standin.url + '/explore/all', 10, patience=1, scroll_timeout=0.2)
+                    df_project_props, _ = scraper.projectprops_scrape()
+
+                assert len(df_projects) == len(df_project_props) == 30
+
+    # the listing and the project pages of both runs went through the same two drivers
+    assert len(started) == 2
+    assert shared.stats() == {'drivers': 0, 'restarts': 0, 'memory_restarts': 0}
+
+
+def test_shared_browser_is_created_once_per_process(monkeypatch):
+    monkeypatch.setattr(browser, '_shared', None)
+    monkeypatch.setattr(browser.atexit, 'register', lambda func: None)
+
+    assert browser.shared_browser(size=3) is browser.shared_browser()
+    assert browser.shared_browser().size == 3
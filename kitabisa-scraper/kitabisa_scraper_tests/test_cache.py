@@ -0,0 +1,94 @@
+import hashlib
+import json
+
+import pytest
+
+from modules import donors
+from modules.cache import ResponseCache, CachedFetcher
+from modules.fetchers import HttpFetcher
+from kitabisa_scraper_tests.standin import KitabisaStandin, make_donations
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1712900000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_response_cache_expires_by_endpoint(tmp_path):
+    clock = Clock()
+    with ResponseCache(tmp_path, ttls=[('/donors', 60)], default_ttl=3600, clock=clock) as cache:
+        cache.put('https://core.kitabisa.com/campaigns/a/donors?sort=verified&', '{"data": []}')
+        cache.put('https://kitabisa.com/campaign/a', '<html></html>')
+
+        clock.now += 120
+        assert cache.get('https://core.kitabisa.com/campaigns/a/donors?sort=verified&') is None
+        assert cache.get('https://core.kitabisa.com/campaigns/a/donors?sort=verified&', ignore_ttl=True) == '{"data": []}'
+        assert cache.get('https://kitabisa.com/campaign/a') == '<html></html>'
+
+
+def test_response_cache_evicts_least_recently_used(tmp_path):
+    clock = Clock()
+    with ResponseCache(tmp_path, max_bytes=300, clock=clock) as cache:
+        for n in range(3):
+            clock.now += 1
+            cache.put(f'https://kitabisa.com/campaign/{n}', str(n) * 100)
+        # the first page was read most recently, so the second one goes first
+        clock.now += 1
+        cache.get('https://kitabisa.com/campaign/0')
+        clock.now += 1
+        cache.put('https://kitabisa.com/campaign/3', '3' * 100)
+
+        assert cache.size() == (3, 300)
+        assert cache.get('https://kitabisa.com/campaign/0') is not None
+        assert cache.get('https://kitabisa.com/campaign/1') is None
+
+        # overwriting a page only counts the difference, the total is kept without summing the index
+        cache.put('https://kitabisa.com/campaign/3', '3' * 50)
+        assert cache._total == cache.size()[1] == 250
+
+    # and it's counted again when the cache is opened
+    with ResponseCache(tmp_path, max_bytes=300, clock=clock) as cache:
+        assert cache._total == 250
+
+
+def test_cached_donors_rerun_skips_the_network(tmp_path):
+    donations = {'bantuwarga': make_donations(25)}
+
+    with KitabisaStandin(donations) as standin, ResponseCache(tmp_path / 'cache') as cache:
+        for _ in range(2):
+            with donors.Scraper(str(tmp_path) + '/', base_url=standin.url, cache=cache) as scraper:
+                scraper.donors_scrape('bantuwarga', 2)
+
+        assert len(standin.requests) == 3
+        assert cache.hits == 3
+
+        offline = CachedFetcher(HttpFetcher(), cache, offline=True)
+        with pytest.raises(LookupError):
+            offline.get_json(standin.url + '/campaigns/unknown/donors?sort=verified&')
+        assert len(standin.requests) == 3
+
+
+def test_cached_json_keeps_the_raw_body(tmp_path):
+    # formatted differently from what json.dumps would write back
+    raw = '{\n  "data": [{"id": 1000000, "comment": "Semoga lekas sembuh \\u2764"}],\n  "next": ""\n}'
+
+    class RawFetcher:
+        def get_json_text(self, url):
+            return raw
+
+        def get_json(self, url):
+            return json.loads(raw)
+
+        def close(self):
+            pass
+
+    with ResponseCache(tmp_path / 'cache') as cache:
+        data = CachedFetcher(RawFetcher(), cache).get_json('https://core.kitabisa.com/campaigns/a/donors?sort=verified&')
+
+        # the body is stored as the server sent it, under the digest of that payload
+        assert cache.get('https://core.kitabisa.com/campaigns/a/donors?sort=verified&') == raw
+        assert cache.conn.execute('SELECT digest FROM responses').fetchone()[0] == hashlib.sha256(raw.encode('utf-8')).hexdigest()
+        assert CachedFetcher(RawFetcher(), cache, offline=True).get_json('https://core.kitabisa.com/campaigns/a/donors?sort=verified&') == data
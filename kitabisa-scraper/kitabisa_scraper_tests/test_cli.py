@@ -0,0 +1,70 @@
+import json
+import subprocess
+import sys
+
+import pandas as pd
+
+from modules import cli
+from modules.state import CrawlState
+from kitabisa_scraper_tests import benchmark
+from kitabisa_scraper_tests.standin import KitabisaStandin, make_campaigns, make_donations
+
+
+def test_status_does_not_import_the_heavy_dependencies(tmp_path):
+    with CrawlState(tmp_path / 'crawl_state.db') as state:
+        state.commit('bantuwarga', '', pages=3, rows=25, file_offset=2500, status='done')
+
+    script = ('import json, sys; from modules import cli; cli.main(["status", "--save-path", sys.argv[1], "--json"]); '
+              'print(json.dumps(sorted({m.split(".")[0] for m in sys.modules})))')
+    process = subprocess.run([sys.executable, '-c', script, str(tmp_path) + '/'], cwd=benchmark.PACKAGE_ROOT,
+                             capture_output=True, text=True, check=True)
+    status, imported = process.stdout.splitlines()
+
+    assert json.loads(status)['summary'] == {'done': {'projects': 1, 'rows': 25, 'pages': 3}}
+    assert not set(json.loads(imported)).intersection(benchmark.HEAVY_MODULES)
+
+
+def test_listing_then_props_from_the_saved_project_list(tmp_path, capsys):
+    campaigns = make_campaigns(6)
+    save_path = str(tmp_path) + '/'
+
+    with KitabisaStandin({}, campaigns=campaigns) as standin:
+        assert cli.main(['listing', '--save-path', save_path, '--api', standin.url + '/campaigns']) == 0
+        assert cli.main(['props', '--save-path', save_path, '--base-url', standin.url, '--history', str(tmp_path / 'history.db')]) == 0
+
+    assert 'Saved 6 projects' in capsys.readouterr().out
+    assert len(list(tmp_path.glob('project_list_*.csv'))) == 1
+    assert cli.main(['props', '--save-path', str(tmp_path / 'empty') + '/']) == 1
+
+
+def test_donors_resume_and_status(tmp_path, capsys):
+    donations = {'bantuwarga0': make_donations(25), 'bantuwarga1': make_donations(15)}
+    save_path = str(tmp_path) + '/'
+
+    with KitabisaStandin(donations) as standin:
+        assert cli.main(['donors', 'bantuwarga0', '--save-path', save_path, '--base-url', standin.url]) == 0
+
+        # a crawl killed before its first commit is left running
+        with CrawlState(tmp_path / 'crawl_state.db') as state:
+            state.commit('bantuwarga1', '', pages=0, rows=0, file_offset=0)
+        assert cli.main(['status', '--save-path', save_path]) == 0
+        assert 'unfinished: bantuwarga1' in capsys.readouterr().out
+
+        assert cli.main(['resume', '--save-path', save_path, '--base-url', standin.url]) == 0
+        assert cli.main(['resume', '--save-path', save_path, '--base-url', standin.url]) == 0
+
+    (tmp_path / 'projects.txt').write_text('bantuwarga0\nbantuwarga1\nbantuwarga2\n')
+    assert cli.main(['status', '--save-path', save_path, '--projects', str(tmp_path / 'projects.txt')]) == 0
+    out = capsys.readouterr().out
+    assert 'No unfinished crawl.' in out
+    assert 'done               2           40' in out
+    assert 'to read: 1, to refresh: 0' in out
+    assert len(pd.read_csv(tmp_path / 'donorsinfo_appended_bantuwarga1.csv')) == 15
+
+
+def test_the_http_engine_does_not_import_selenium():
+    script = ('import json, sys; import modules.donors, modules.projects, modules.crawler; '
+              'print(json.dumps(sorted({m.split(".")[0] for m in sys.modules})))')
+    process = subprocess.run([sys.executable, '-c', script], cwd=benchmark.PACKAGE_ROOT, capture_output=True, text=True, check=True)
+
+    assert 'selenium' not in json.loads(process.stdout)
@@ -0,0 +1,30 @@
+import pandas as pd
+
+from modules import donors, crawler
+from kitabisa_scraper_tests.standin import KitabisaStandin, make_donations
+
+
+def test_crawl_many_projects_tracks_progress(tmp_path):
+    donations = {f'project{n}': make_donations(10 * n + 5, start_id=1000 * n) for n in range(1, 5)}
+    save_path = str(tmp_path) + '/'
+
+    with KitabisaStandin(donations) as standin:
+        with donors.Scraper(save_path, base_url=standin.url, pool_size=4) as scraper:
+            progress = crawler.DonorsCrawler(scraper, max_concurrency=4, max_per_host=2).crawl(
+                list(donations) + ['missingproject'], max_attempts=2)
+
+    for project_id, project_donations in donations.items():
+        assert progress[project_id]['status'] == 'done'
+        assert progress[project_id]['rows'] == len(project_donations)
+        df = pd.read_csv(tmp_path / f'donorsinfo_appended_{project_id}.csv')
+        assert list(df['id']) == [d['id'] for d in project_donations]
+
+    assert progress['missingproject']['status'] == 'failed'
+    assert progress['missingproject']['error'] is not None
+
+
+def test_host_budget_shares_one_semaphore_per_host():
+    budget = crawler.HostBudget(max_per_host=2)
+
+    assert budget.slot('https://core.kitabisa.com/a') is budget.slot('https://core.kitabisa.com/b')
+    assert budget.slot('https://core.kitabisa.com/a') is not budget.slot('https://kitabisa.com/a')
@@ -0,0 +1,61 @@
+import pandas as pd
+
+from modules import donors
+from modules.dedup import DonationIndex
+from modules.metrics import RunMetrics
+from kitabisa_scraper_tests.standin import KitabisaStandin, make_donations
+
+
+def test_donors_scrape_drops_donations_repeated_by_shifted_pages(tmp_path):
+    donations = make_donations(30)
+    # new donations pushed five of them down while we paged, so they show up again on the next pages
+    donations = {'bantuwarga': donations[:15] + donations[10:15] + donations[15:]}
+    metrics = RunMetrics()
+
+    with KitabisaStandin(donations) as standin:
+        with donors.Scraper(str(tmp_path) + '/', base_url=standin.url, batch_rows=10, metrics=metrics) as scraper:
+            summary = scraper.donors_scrape('bantuwarga', max_attempts=2)
+
+    df = pd.read_csv(tmp_path / 'donorsinfo_appended_bantuwarga.csv')
+    assert len(df) == 30
+    assert not df['id'].duplicated().any()
+    assert (summary['rows'], summary['duplicates'], summary['duplicate_rate']) == (30, 10, 0.25)
+    assert metrics.counters['duplicates'] == 10
+
+
+def test_donors_scrape_skips_donations_stored_by_an_earlier_run(tmp_path):
+    donations = {'bantuwarga': make_donations(25)}
+    save_path = str(tmp_path) + '/'
+
+    with KitabisaStandin(donations) as standin:
+        with donors.Scraper(save_path, base_url=standin.url, batch_rows=10) as scraper:
+            scraper.donors_scrape('bantuwarga', max_attempts=2)
+
+        # reading the pages again from the first page only appends what the file doesn't hold yet
+        donations['bantuwarga'] = make_donations(28)
+        with donors.Scraper(save_path, base_url=standin.url, batch_rows=10) as scraper:
+            summary = scraper.donors_scrape('bantuwarga', max_attempts=2, start_id='page_1', init=False)
+            assert scraper.index.count('bantuwarga') == 28
+
+    df = pd.read_csv(tmp_path / 'donorsinfo_appended_bantuwarga.csv')
+    assert sorted(df['id']) == sorted(d['id'] for d in donations['bantuwarga'])
+    # the rows count the donors of the whole file, 3 of them appended by this run
+    assert (summary['rows'], summary['duplicates']) == (28, 25)
+
+
+def test_donation_index_is_cut_back_with_the_file_and_backfilled(tmp_path):
+    with DonationIndex(tmp_path / 'state.db') as index:
+        index.add('bantuwarga', [1, 2, 3], file_offset=100)
+        index.add('bantuwarga', [4, 5], file_offset=200)
+
+        # the second batch was written after the last commit, so it's cut off with the file
+        seen = index.load('bantuwarga', truncate_at=100)
+        page = pd.DataFrame({'id': [5, 3, 4, 4]})
+        assert list(seen.drop_seen(page)['id']) == [5, 4]
+        assert index.count('bantuwarga') == 3
+
+        # a file written before the index existed is indexed the first time it's appended to
+        pd.DataFrame({'id': [7, 8], 'amount': [5000, 10000]}).to_csv(tmp_path / 'old.csv', index=False)
+        seen = index.load('lama', filepath=tmp_path / 'old.csv')
+        assert seen.drop_seen(pd.DataFrame({'id': [8, 9]}))['id'].tolist() == [9]
+        assert index.count('lama') == 2
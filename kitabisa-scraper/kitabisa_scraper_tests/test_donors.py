@@ -0,0 +1,80 @@
+import pandas as pd
+import pytest
+
+from modules import donors
+from kitabisa_scraper_tests.standin import KitabisaStandin, make_donations
+
+
+def test_donors_scrape_http_engine(tmp_path):
+    donations = {'bantuwarga': make_donations(25)}
+    save_path = str(tmp_path) + '/'
+
+    with KitabisaStandin(donations) as standin:
+        with donors.Scraper(save_path, engine='http', base_url=standin.url) as scraper:
+            scraper.donors_scrape('bantuwarga', max_attempts=3)
+
+    df = pd.read_csv(tmp_path / 'donorsinfo_appended_bantuwarga.csv')
+    assert len(standin.requests) == 3
+    assert list(df['id']) == [d['id'] for d in donations['bantuwarga']]
+    assert (df['short_url'] == 'bantuwarga').all()
+    assert not (tmp_path / 'donorsinfo_individual_bantuwarga' / '1.csv').exists()
+
+
+def test_donors_scrape_debug_pages(tmp_path):
+    donations = {'bantuwarga': make_donations(25)}
+    save_path = str(tmp_path) + '/'
+
+    with KitabisaStandin(donations) as standin:
+        with donors.Scraper(save_path, base_url=standin.url, batch_rows=10) as scraper:
+            summary = scraper.donors_scrape('bantuwarga', 3, debug_pages=True)
+
+    assert summary == {'project_id': 'bantuwarga', 'pages': 3, 'rows': 25, 'duplicates': 0, 'duplicate_rate': 0.0, 'completed': True}
+    assert len(pd.read_csv(tmp_path / 'donorsinfo_individual_bantuwarga' / '3.csv')) == 5
+
+
+def test_donors_scrape_resume_from_start_id(tmp_path):
+    donations = {'bantuwarga': make_donations(25)}
+    save_path = str(tmp_path) + '/'
+    tenth = donations['bantuwarga'][9]
+
+    with KitabisaStandin(donations) as standin:
+        with donors.Scraper(save_path, base_url=standin.url) as scraper:
+            scraper.donors_scrape('bantuwarga', 3, start_id=f"{tenth['id']}_{tenth['created']}", init=False)
+
+    df = pd.read_csv(tmp_path / 'donorsinfo_appended_bantuwarga.csv')
+    assert list(df['id']) == [d['id'] for d in donations['bantuwarga'][10:]]
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        donors.Scraper('data/', engine='curl')
+
+
+def test_donors_scrape_keeps_the_log_of_an_interrupted_crawl(tmp_path):
+    donations = {'bantuwarga': make_donations(25)}
+    save_path = str(tmp_path) + '/'
+
+    class InterruptedFetcher:
+        def __init__(self, fetcher):
+            self.fetcher = fetcher
+            self.calls = 0
+
+        def get_json(self, url):
+            self.calls += 1
+            if self.calls == 2:
+                raise KeyboardInterrupt
+            return self.fetcher.get_json(url)
+
+        def close(self):
+            self.fetcher.close()
+
+    with KitabisaStandin(donations) as standin:
+        with donors.Scraper(save_path, base_url=standin.url) as scraper:
+            scraper.fetcher = InterruptedFetcher(scraper.fetcher)
+            with pytest.raises(KeyboardInterrupt) as interrupted:
+                scraper.donors_scrape('bantuwarga', 3)
+
+            # the log is closed with the crawl, not once the traceback holding it goes away
+            log = (tmp_path / 'donorsinfo_individual_bantuwarga' / 'log_donorsinfo.txt').read_text()
+            assert log == 'succesfully read bantuwarga at the page of page_1\n'
+            assert interrupted.traceback
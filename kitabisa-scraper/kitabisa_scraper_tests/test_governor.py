@@ -0,0 +1,137 @@
+import random
+
+import requests
+
+from modules import donors
+from modules.governor import RequestGovernor, classify, THROTTLED, TRANSIENT, PARSE, PERMANENT
+from kitabisa_scraper_tests.standin import KitabisaStandin, make_donations
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def http_error(status, retry_after=None, body=b''):
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    if retry_after is not None:
+        response.headers['Retry-After'] = str(retry_after)
+    return requests.HTTPError(response=response)
+
+
+def make_governor(clock, **kwargs):
+    return RequestGovernor(clock=clock, sleep=clock.sleep, rng=random.Random(0), **kwargs)
+
+
+def test_classify_failures():
+    assert classify(http_error(429)) == THROTTLED
+    assert classify(http_error(503)) == TRANSIENT
+    assert classify(requests.ConnectionError()) == TRANSIENT
+    assert classify(ValueError('Expecting value')) == PARSE
+    assert classify(http_error(404)) == PERMANENT
+
+
+def test_classify_forbidden_pages_apart_from_challenges():
+    # a removed or private campaign is retried in vain, and every retry would slow down the whole host
+    assert classify(http_error(403, body=b'<html><h1>403 Forbidden</h1></html>')) == PERMANENT
+    assert classify(http_error(403, retry_after=30)) == THROTTLED
+    assert classify(http_error(403, body=b'<title>Just a moment...</title><script src="/cdn-cgi/challenge-platform/cf-chl"></script>')) == THROTTLED
+
+
+def test_classify_driver_errors_once_selenium_is_loaded():
+    from selenium.common.exceptions import WebDriverException
+
+    assert classify(WebDriverException('chrome not reachable')) == TRANSIENT
+
+
+def test_token_bucket_paces_the_requests_of_a_host():
+    clock = FakeClock()
+    governor = make_governor(clock, rate=2, burst=2)
+
+    for _ in range(6):
+        governor.acquire('https://core.kitabisa.com/campaigns/a/donors')
+    # another host has its own bucket
+    governor.acquire('https://kitabisa.com/campaign/a')
+
+    # the burst goes out at once, then one request every half second
+    assert clock.now == 2.0
+    assert governor.stats()['core.kitabisa.com']['requests'] == 6
+
+
+def test_rate_adapts_to_latency_and_throttling():
+    clock = FakeClock()
+    governor = make_governor(clock, rate=2, max_rate=3, target_latency=1)
+    url = 'https://core.kitabisa.com/campaigns/a/donors'
+
+    for _ in range(10):
+        governor.record(url, latency=0.2)
+    assert governor.stats()['core.kitabisa.com']['rate'] == 3
+
+    governor.record(url, error=http_error(429))
+    assert governor.stats()['core.kitabisa.com']['rate'] == 1.5
+
+    for _ in range(5):
+        governor.record(url, latency=5)
+    assert governor.stats()['core.kitabisa.com']['rate'] < 1.5
+
+
+def test_circuit_breaker_pauses_a_failing_host():
+    clock = FakeClock()
+    governor = make_governor(clock, failure_threshold=3, cooldown=60, burst=10)
+    url = 'https://core.kitabisa.com/campaigns/a/donors'
+
+    for _ in range(3):
+        governor.acquire(url)
+        governor.record(url, error=http_error(503))
+    assert governor.stats()['core.kitabisa.com']['circuit_open']
+
+    governor.acquire(url)
+    assert clock.now >= 60
+
+    # the first request after the pause is a probe, failing again opens the circuit right away
+    governor.record(url, error=http_error(503))
+    assert governor.stats()['core.kitabisa.com']['circuit_opened'] == 2
+
+
+def test_backoff_grows_with_jitter_and_follows_retry_after():
+    clock = FakeClock()
+    governor = make_governor(clock, backoff_base=1, backoff_cap=8)
+    url = 'https://core.kitabisa.com/campaigns/a/donors'
+
+    for attempt in range(1, 7):
+        governor.backoff(url, attempt, http_error(503))
+    governor.backoff(url, 1, http_error(429, retry_after=30))
+
+    assert all(0 <= wait <= min(8, 2 ** (n)) for n, wait in enumerate(clock.sleeps[:6]))
+    assert clock.sleeps[-1] == 30
+
+
+def test_donors_scrape_backs_off_and_stops_on_permanent_errors(tmp_path):
+    donations = {'bantuwarga': make_donations(30)}
+    clock = FakeClock()
+    governor = make_governor(clock, rate=100, burst=100)
+
+    with KitabisaStandin(donations) as standin:
+        tenth = donations['bantuwarga'][9]
+        standin.fail_cursors.add(f"{tenth['id']}_{tenth['created']}")
+        with donors.Scraper(str(tmp_path) + '/', base_url=standin.url, governor=governor) as scraper:
+            summary = scraper.donors_scrape('bantuwarga', max_attempts=3)
+            standin.requests.clear()
+            missing = scraper.donors_scrape('tidakada', max_attempts=3)
+
+    assert summary['completed'] is False
+    # two backoffs between the three attempts of the failing page, none after the last one
+    assert len(clock.sleeps) == 2
+    assert missing['completed'] is False
+    assert len(standin.requests) == 1
+    assert governor.stats()[standin.url.split('//')[1]][PERMANENT] == 1
@@ -0,0 +1,73 @@
+import json
+
+from modules import donors
+from modules.metrics import Histogram, RunMetrics
+from kitabisa_scraper_tests.standin import KitabisaStandin, make_donations
+
+
+def test_histogram_estimates_quantiles_from_its_buckets():
+    histogram = Histogram(buckets=(0.1, 1, 10))
+    for value in [0.05] * 90 + [5] * 10:
+        histogram.observe(value)
+
+    assert histogram.counts == [90, 0, 10, 0]
+    assert histogram.quantile(0.5) < 0.1
+    assert 1 < histogram.quantile(0.95) <= 5
+    assert histogram.summary()['max_s'] == 5
+
+
+def test_run_metrics_buffers_events_and_writes_prometheus_text(tmp_path):
+    ticks = iter(range(100))
+    metrics = RunMetrics(log_path=str(tmp_path / 'run.jsonl'), prom_path=str(tmp_path / 'run.prom'), buffer_size=3,
+                         labels={'asset': 'donors_scraper'}, clock=lambda: next(ticks))
+
+    with metrics:
+        with metrics.time('fetch'):
+            pass
+        metrics.inc('pages', 2)
+        metrics.set('driver_rss_bytes', 300)
+        metrics.set('driver_rss_bytes', 200)
+        metrics.event('page', cursor='page_1')
+        metrics.event('page', cursor='page_2')
+        # nothing is written until the buffer is full
+        assert not (tmp_path / 'run.jsonl').exists()
+        metrics.event('page', cursor='page_3')
+        metrics.event('page', cursor='page_4')
+        assert len((tmp_path / 'run.jsonl').read_text().splitlines()) == 3
+
+    events = [json.loads(line) for line in (tmp_path / 'run.jsonl').read_text().splitlines()]
+    assert [e['cursor'] for e in events] == ['page_1', 'page_2', 'page_3', 'page_4']
+
+    prom = (tmp_path / 'run.prom').read_text().splitlines()
+    assert 'kitabisa_scraper_stage_seconds_bucket{asset="donors_scraper",stage="fetch",le="1"} 1' in prom
+    assert 'kitabisa_scraper_pages_total{asset="donors_scraper"} 2' in prom
+    assert 'kitabisa_scraper_driver_rss_bytes_max{asset="donors_scraper"} 300' in prom
+    assert metrics.gauges['driver_rss_bytes'] == 200
+
+
+def test_donors_scrape_records_stages_and_retries(tmp_path):
+    donations = {'bantuwarga': make_donations(25)}
+    metrics = RunMetrics(log_path=str(tmp_path / 'metrics' / 'donors.jsonl'))
+
+    with KitabisaStandin(donations) as standin:
+        tenth = donations['bantuwarga'][9]
+        standin.fail_cursors.add(f"{tenth['id']}_{tenth['created']}")
+        with donors.Scraper(str(tmp_path) + '/', base_url=standin.url, metrics=metrics) as scraper:
+            scraper.donors_scrape('bantuwarga', max_attempts=2)
+            standin.fail_cursors.clear()
+            scraper.donors_scrape('bantuwarga', max_attempts=2)
+
+    summary = metrics.summary()
+    assert summary['counters']['pages'] == 3
+    assert summary['counters']['rows'] == 25
+    assert summary['counters']['errors_transient'] == 2
+    assert summary['counters']['retries'] == 1
+    assert summary['counters']['bytes'] > 0
+    assert summary['stages']['fetch']['count'] == 5
+    assert {'json_decode', 'json_normalize', 'csv_write', 'page'} <= set(summary['stages'])
+
+    # the scraper flushes the buffered events when it exits
+    events = [json.loads(line) for line in (tmp_path / 'metrics' / 'donors.jsonl').read_text().splitlines()]
+    assert [e['event'] for e in events] == ['page', 'error', 'error', 'page', 'page']
+    # the per-page debug log is still written, through a single open file
+    assert len((tmp_path / 'donorsinfo_individual_bantuwarga' / 'log_donorsinfo.txt').read_text().splitlines()) == 5
@@ -0,0 +1,61 @@
+from modules.parsers import parse_project_cards, extract_campaign, PROJECT_CARD_FIELDS, CAMPAIGN_FIELDS
+from kitabisa_scraper_tests.standin import make_campaign_page
+
+
+def make_card(short_url, org=None, name=None, received=None, days=None):
+    fields = {'project_org': org, 'project_name': name, 'donation_received': received, 'days_to_go': days}
+    inner = ''.join(f'<{PROJECT_CARD_FIELDS[field][0]} class="{PROJECT_CARD_FIELDS[field][1]}">{value}</{PROJECT_CARD_FIELDS[field][0]}>'
+                    for field, value in fields.items() if value is not None)
+    return f'<div class="card"><a href="/campaign/{short_url}"><img src="x.jpg"></a><div>{inner}</div></div>'
+
+
+def test_parse_project_cards_keeps_fields_within_their_card():
+    content = '<html><body><a href="/explore">explore</a>' + ''.join([
+        make_card('bantuwarga', 'Orang Baik', 'Bantu Warga', 'TerkumpulRp1.500.000', 'Sisa hari12'),
+        make_card('tanpaorganisasi', None, 'Tanpa Organisasi', 'TersediaRp20.000', 'Sisa hari3'),
+        make_card('bantukucing', 'Rumah Kucing', 'Bantu Kucing', 'TerkumpulRp0', 'Sisa hari40'),
+    ]) + '</body></html>'
+
+    df = parse_project_cards(content)
+
+    assert list(df['short_url']) == ['bantuwarga', 'tanpaorganisasi', 'bantukucing']
+    assert df.loc[1, 'project_org'] is None
+    assert list(df['project_name']) == ['Bantu Warga', 'Tanpa Organisasi', 'Bantu Kucing']
+    assert list(df['donation_received']) == ['1500000', '20000', '0']
+    assert list(df['days_to_go']) == ['12', '3', '40']
+
+
+def test_parse_project_cards_merges_the_image_and_name_links_of_a_card():
+    def make_two_link_card(short_url, org, name, received, days):
+        fields = {'project_org': org, 'donation_received': received, 'days_to_go': days}
+        inner = ''.join(f'<{PROJECT_CARD_FIELDS[field][0]} class="{PROJECT_CARD_FIELDS[field][1]}">{value}</{PROJECT_CARD_FIELDS[field][0]}>'
+                        for field, value in fields.items())
+        tag, class_name = PROJECT_CARD_FIELDS['project_name']
+        return (f'<div class="card"><a href="/campaign/{short_url}"><img src="x.jpg"></a>'
+                f'<div><a href="/campaign/{short_url}/"><{tag} class="{class_name}">{name}</{tag}></a>{inner}</div></div>')
+
+    content = '<html><body>' + ''.join([
+        make_two_link_card('bantuwarga', 'Orang Baik', 'Bantu Warga', 'TerkumpulRp1.500.000', 'Sisa hari12'),
+        make_two_link_card('bantukucing', 'Rumah Kucing', 'Bantu Kucing', 'TerkumpulRp0', 'Sisa hari40'),
+    ]) + '</body></html>'
+
+    df = parse_project_cards(content)
+
+    assert list(df['short_url']) == ['bantuwarga', 'bantukucing']
+    assert list(df['project_name']) == ['Bantu Warga', 'Bantu Kucing']
+    assert list(df['project_org']) == ['Orang Baik', 'Rumah Kucing']
+    assert list(df['donation_received']) == ['1500000', '0']
+    assert list(df['days_to_go']) == ['12', '40']
+
+
+def test_extract_campaign_projects_the_fields_we_use():
+    campaign = {'id': 521470, 'short_url': 'bantuwarga', 'title': 'Bantu Warga', 'description': '<p>panjang</p>' * 100,
+                'donation_target': 50000000, 'campaigner': {'type': 'PERSONAL', 'name': 'Orang Baik'}, 'category': None}
+
+    record = extract_campaign(make_campaign_page(campaign))
+
+    assert list(record) == CAMPAIGN_FIELDS
+    assert record['id'] == 521470
+    assert record['donation_target'] == 50000000
+    assert record['campaigner.type'] == 'PERSONAL'
+    assert record['category.name'] is None
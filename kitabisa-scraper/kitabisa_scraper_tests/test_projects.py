@@ -0,0 +1,67 @@
+import pandas as pd
+
+from modules import projects
+from modules.fetchers import HttpFetcher
+from kitabisa_scraper_tests.standin import KitabisaStandin
+
+
+class FakeListingDriver:
+    '''
+    Pretends to be an infinite listing that grows by 12 cards per scroll until it runs out of campaigns.
+    '''
+
+    def __init__(self, max_cards):
+        self.max_cards = max_cards
+        self.cards = 12
+        self.scrolls = 0
+
+    def execute_script(self, script):
+        if script.startswith('window.scrollTo'):
+            self.scrolls += 1
+            self.cards = min(self.cards + 12, self.max_cards)
+            return None
+        return [self.cards * 300, self.cards]
+
+
+def test_load_listing_stops_once_the_listing_stops_growing():
+    scraper = projects.Scraper('data/')
+    scraper.driver_projectlist = FakeListingDriver(max_cards=60)
+
+    scrolls = scraper._load_listing(num_scroll=300, patience=2, scroll_timeout=0.3)
+
+    # 4 scrolls that load new cards, then 2 scrolls in a row without anything new
+    assert scrolls == 6
+    assert scraper.driver_projectlist.cards == 60
+
+
+def test_projectlist_fetch_reads_the_listing_without_rendering(tmp_path):
+    campaigns = [{'short_url': f'campaign{n}', 'title': f'Campaign {n}', 'campaigner': {'name': 'Orang Baik'},
+                  'donation_received': 1000 * n, 'days_remaining': n} for n in range(23)]
+
+    with KitabisaStandin({}, campaigns=campaigns) as standin:
+        scraper = projects.Scraper(str(tmp_path) + '/')
+        scraper.fetcher = HttpFetcher()
+        df_projects = scraper.projectlist_fetch(standin.url + '/campaigns')
+        scraper.fetcher.close()
+
+    assert list(df_projects['short_url']) == [c['short_url'] for c in campaigns]
+    assert list(df_projects.columns) == ['short_url', 'project_org', 'project_name', 'donation_received', 'days_to_go', 'time_scraped']
+    assert list(scraper.project_list) == [c['short_url'] for c in campaigns]
+    assert len(pd.read_csv(tmp_path / f'project_list_{scraper.today}.csv')) == 23
+
+
+def test_projectprops_scrape_keeps_the_order_of_the_project_list(tmp_path):
+    campaigns = [{'id': n, 'short_url': f'campaign{n}', 'donation_target': 1000000, 'donation_percentage': n / 10,
+                  'category': {'name': 'Kemanusiaan'}} for n in range(12)]
+
+    with KitabisaStandin({}, campaigns=campaigns) as standin:
+        scraper = projects.Scraper(str(tmp_path) + '/', pool_size=4, base_url=standin.url)
+        scraper.fetcher = HttpFetcher(pool_size=4)
+        scraper.today = 'today'
+        scraper.project_list = pd.Series([c['short_url'] for c in campaigns[::-1]] + ['missingcampaign'])
+        df_project_props, filepath = scraper.projectprops_scrape()
+        scraper.fetcher.close()
+
+    assert list(df_project_props['id']) == list(range(11, -1, -1))
+    assert (df_project_props['category.name'] == 'Kemanusiaan').all()
+    assert open(tmp_path / 'log_projectprops.txt').read().splitlines()[-1] == 'error when reading missingcampaign'
@@ -0,0 +1,30 @@
+import pandas as pd
+
+from modules.sinks import CsvSink
+
+
+def test_csv_sink_writes_in_batches_with_fixed_columns(tmp_path):
+    filepath = tmp_path / 'out.csv'
+
+    with CsvSink(filepath, columns=['id', 'amount', 'extra'], batch_rows=20) as sink:
+        for page in range(5):
+            sink.write(pd.DataFrame({'id': range(page * 10, page * 10 + 10), 'amount': 1000}))
+            # nothing more than a batch is ever held in memory
+            assert sink._buffered_rows < 20
+
+    df = pd.read_csv(filepath)
+    assert list(df.columns) == ['id', 'amount', 'extra']
+    assert list(df['id']) == list(range(50))
+    assert sink.rows_written == 50
+
+
+def test_csv_sink_appends_to_existing_file(tmp_path):
+    filepath = tmp_path / 'out.csv'
+    pd.DataFrame({'id': [1, 2], 'amount': [10, 20]}).to_csv(filepath, index=False)
+
+    with CsvSink(filepath, append=True) as sink:
+        sink.write(pd.DataFrame({'amount': [30], 'id': [3]}))
+
+    df = pd.read_csv(filepath)
+    assert list(df['id']) == [1, 2, 3]
+    assert list(df['amount']) == [10, 20, 30]
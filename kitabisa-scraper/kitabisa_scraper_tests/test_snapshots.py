@@ -0,0 +1,112 @@
+import pandas as pd
+
+from modules import projects
+from modules.fetchers import HttpFetcher
+from modules.snapshots import SnapshotStore
+from modules.storage import ParquetStore
+from kitabisa_scraper_tests.standin import KitabisaStandin, make_campaigns
+
+
+def make_props(received, days_remaining, time_scraped):
+    return pd.DataFrame({'short_url': ['bantuwarga0', 'bantuwarga1'],
+                         'title': ['Bantu Warga 0', 'Bantu Warga 1'],
+                         'donation_received': received,
+                         'donation_target': [1000000, 1000000],
+                         'donation_percentage': [r / 1000000 for r in received],
+                         'days_remaining': days_remaining,
+                         'time_scraped': time_scraped})
+
+
+def test_snapshot_store_only_records_the_changed_fields(tmp_path):
+    with SnapshotStore(tmp_path / 'history.db') as snapshots:
+        first = snapshots.record(make_props([100000, 0], [30, 30], '2024-04-10 08:00:00'))
+        second = snapshots.record(make_props([250000, 0], [29, 29], '2024-04-11 08:00:00'))
+        third = snapshots.record(make_props([250000, 0], [29, 29], '2024-04-12 08:00:00'))
+        # an older snapshot recorded late doesn't overwrite the newer values
+        stale = snapshots.record(make_props([90000, 0], [31, 31], '2024-04-09 08:00:00'))
+
+        assert (first['new_campaigns'], first['changed_fields']) == (2, 0)
+        assert (second['changed_campaigns'], second['changed_fields']) == (2, 4)
+        assert third['changed_fields'] == 0
+        assert stale['stale'] == 4
+        # 5 fields of 2 campaigns, then the received amount, percentage and days remaining of one and the days remaining of the other
+        assert snapshots.stats() == {'campaigns': 2, 'rows': 14, 'current_rows': 10}
+
+        before = snapshots.as_of('2024-04-10 20:00:00', fields=['donation_received', 'days_remaining'])
+        now = snapshots.as_of()
+        assert before.to_dict('records') == [{'short_url': 'bantuwarga0', 'donation_received': 100000, 'days_remaining': 30},
+                                             {'short_url': 'bantuwarga1', 'donation_received': 0, 'days_remaining': 30}]
+        assert now.loc[0, 'donation_received'] == 250000
+        assert now.loc[1, 'title'] == 'Bantu Warga 1'
+        assert snapshots.as_of('2024-04-01').empty
+
+        trajectory = snapshots.trajectory(['bantuwarga0'])
+        assert list(trajectory.columns) == ['short_url', 'valid_from', 'donation_received', 'donation_percentage', 'days_remaining']
+        assert list(trajectory['donation_received']) == [100000, 250000]
+        assert list(trajectory['valid_from'].dt.day) == [10, 11]
+
+        # a period starts with the values current at its start
+        trajectory = snapshots.trajectory(start='2024-04-10 12:00:00', end='2024-04-10 23:59:59')
+        assert list(trajectory['days_remaining']) == [30, 30]
+        assert (trajectory['valid_from'] == pd.Timestamp('2024-04-10 12:00:00')).all()
+
+
+def test_projectprops_scrape_records_only_the_changes_to_the_snapshot_store(tmp_path):
+    campaigns = make_campaigns(6)
+
+    with KitabisaStandin({}, campaigns=campaigns) as standin, SnapshotStore(tmp_path / 'history.db') as snapshots:
+        scraper = projects.Scraper(str(tmp_path) + '/', pool_size=2, base_url=standin.url, snapshots=snapshots)
+        scraper.fetcher = HttpFetcher(pool_size=2)
+        scraper.today = '2024-04-11 19:00:00'
+        scraper.project_list = pd.Series([c['short_url'] for c in campaigns])
+        df_first, filepath = scraper.projectprops_scrape()
+        first_rows = snapshots.stats()['rows']
+
+        campaigns[2]['donation_received'] += 50000
+        campaigns[2]['days_remaining'] -= 1
+        scraper.today = '2024-04-12 19:00:00'
+        scraper.project_list = scraper.project_list[:4]
+        scraper.projectprops_scrape()
+        scraper.fetcher.close()
+
+        assert filepath == tmp_path / 'history.db'
+        assert scraper.changes['changed_campaigns'] == 1
+        assert scraper.changes['changed_fields'] == 2
+        assert snapshots.stats()['rows'] == first_rows + 2
+
+        # the full snapshot of every run is rebuilt from the changes
+        first = snapshots.snapshot('2024-04-11 23:00:00')
+        second = snapshots.snapshot()
+        assert first.drop(columns='time_scraped').equals(df_first.drop(columns='time_scraped')[first.columns.drop('time_scraped')])
+        assert list(second['short_url']) == [c['short_url'] for c in campaigns[:4]]
+        assert second.set_index('short_url').loc['bantuwarga2', 'donation_received'] == campaigns[2]['donation_received']
+        assert (second['time_scraped'] == '2024-04-12 19:00:00').all()
+        assert snapshots.snapshot('2024-04-01').empty
+
+        # the cleaning step reads the last run from the store
+        finalize = projects.ProjectsFinalize(snapshots, str(tmp_path) + '/')
+        finalize.projects_data_cleaning(['short_url', 'donation_received', 'campaign_start', 'campaign_end'])
+        assert len(finalize.df_projects_cleaned) == 4
+
+    # no full snapshot is saved next to the store
+    assert not list(tmp_path.glob('project_props_*.csv'))
+    assert len(pd.read_csv(tmp_path / 'project_cleaned_2024-04-12 19:00:00.csv')) == 4
+
+
+def test_projectprops_scrape_saves_the_full_snapshot_without_a_store(tmp_path):
+    campaigns = make_campaigns(4)
+    store = ParquetStore(tmp_path / 'lake')
+
+    with KitabisaStandin({}, campaigns=campaigns) as standin:
+        scraper = projects.Scraper(str(tmp_path) + '/', base_url=standin.url, store=store)
+        scraper.fetcher = HttpFetcher()
+        scraper.today = '2024-04-12 19:00:00'
+        scraper.project_list = pd.Series([c['short_url'] for c in campaigns])
+        scraper.projectprops_scrape()
+        scraper.fetcher.close()
+
+    # the columns load_campaigns of the analysis reads
+    df = store.read('project_props', columns=['id', 'campaign_last_update', 'is_open_for_donation', 'is_verified', 'campaigner.type'],
+                    filters=[('scrape_date', '=', '2024-04-12')])
+    assert len(df) == len(campaigns)
+    assert scraper.changes is None
@@ -0,0 +1,140 @@
+import pandas as pd
+
+from modules import donors
+from modules.state import CrawlState
+from kitabisa_scraper_tests.standin import KitabisaStandin, make_donations
+
+
+def test_crawl_state_commit_and_get(tmp_path):
+    with CrawlState(tmp_path / 'state.db') as state:
+        assert state.get('bantuwarga') is None
+        state.commit('bantuwarga', '123_456', pages=2, rows=20, file_offset=2048)
+        state.commit('bantuwarga', '', pages=3, rows=25, file_offset=2500, status='done')
+
+    with CrawlState(tmp_path / 'state.db') as state:
+        committed = state.get('bantuwarga')
+
+    assert committed['next_cursor'] == ''
+    assert (committed['pages'], committed['rows'], committed['file_offset']) == (3, 25, 2500)
+    assert committed['status'] == 'done'
+
+
+def test_donors_scrape_resumes_from_committed_cursor(tmp_path):
+    donations = {'bantuwarga': make_donations(45)}
+    save_path = str(tmp_path) + '/'
+    appended_path = tmp_path / 'donorsinfo_appended_bantuwarga.csv'
+    twentieth = donations['bantuwarga'][19]
+
+    with KitabisaStandin(donations) as standin:
+        standin.fail_cursors.add(f"{twentieth['id']}_{twentieth['created']}")
+        with donors.Scraper(save_path, base_url=standin.url, batch_rows=10) as scraper:
+            summary = scraper.donors_scrape('bantuwarga', max_attempts=2)
+
+        assert summary['completed'] is False
+        assert summary['rows'] == 20
+
+        # rows written after the last commit, e.g. by a crash right before committing, are cut off on resume
+        with open(appended_path, 'a') as fh:
+            fh.write('999,True\n')
+
+        standin.fail_cursors.clear()
+        standin.requests.clear()
+        with donors.Scraper(save_path, base_url=standin.url, batch_rows=10) as scraper:
+            summary = scraper.donors_scrape('bantuwarga', max_attempts=2)
+
+    assert summary == {'project_id': 'bantuwarga', 'pages': 5, 'rows': 45, 'duplicates': 0, 'duplicate_rate': 0.0, 'completed': True}
+    assert len(standin.requests) == 3
+
+    df = pd.read_csv(appended_path)
+    assert list(df['id']) == [d['id'] for d in donations['bantuwarga']]
+
+
+def test_donors_scrape_from_a_given_page_counts_the_rows_already_saved(tmp_path):
+    donations = {'bantuwarga': make_donations(20)}
+    save_path = str(tmp_path) + '/'
+    appended_path = tmp_path / 'donorsinfo_appended_bantuwarga.csv'
+
+    with KitabisaStandin(donations) as standin:
+        with donors.Scraper(save_path, base_url=standin.url, batch_rows=10) as scraper:
+            scraper.donors_scrape('bantuwarga', max_attempts=2)
+
+        # read again from the first page, appending to the saved file, until the third page fails
+        donations['bantuwarga'] = make_donations(45)
+        twentieth = donations['bantuwarga'][19]
+        standin.fail_cursors.add(f"{twentieth['id']}_{twentieth['created']}")
+        with donors.Scraper(save_path, base_url=standin.url, batch_rows=10) as scraper:
+            summary = scraper.donors_scrape('bantuwarga', max_attempts=2, start_id='page_1', init=False)
+            committed = scraper.state.get('bantuwarga')
+
+        assert summary['completed'] is False
+        assert (committed['pages'], committed['rows']) == (4, 40)
+        assert committed['file_offset'] == appended_path.stat().st_size
+
+        # the resumed crawl goes on from the committed counts, matching the file
+        standin.fail_cursors.clear()
+        with donors.Scraper(save_path, base_url=standin.url, batch_rows=10) as scraper:
+            summary = scraper.donors_scrape('bantuwarga', max_attempts=2)
+
+    df = pd.read_csv(appended_path)
+    assert summary['completed'] is True
+    assert summary['rows'] == len(df) == 45
+    assert sorted(df['id']) == sorted(d['id'] for d in donations['bantuwarga'])
+
+
+def test_donors_scrape_incremental_only_reads_new_donations(tmp_path):
+    donations = {'bantuwarga': make_donations(45)}
+    save_path = str(tmp_path) + '/'
+
+    with KitabisaStandin(donations) as standin:
+        with donors.Scraper(save_path, base_url=standin.url) as scraper:
+            scraper.donors_scrape('bantuwarga', max_attempts=2)
+
+            # 13 new donations arrive on top of the ones we already stored
+            donations['bantuwarga'] = make_donations(58)
+            standin.requests.clear()
+            summary = scraper.donors_scrape('bantuwarga', max_attempts=2, incremental=True)
+
+    assert summary['rows'] == 58
+    # the second page still holds 3 new donations, the third one only stored donations
+    assert len(standin.requests) == 3
+
+    df = pd.read_csv(tmp_path / 'donorsinfo_appended_bantuwarga.csv')
+    assert sorted(df['id']) == sorted(d['id'] for d in donations['bantuwarga'])
+    assert not df['id'].duplicated().any()
+
+
+def test_donors_scrape_incremental_keeps_a_donation_verified_late(tmp_path):
+    donations = {'bantuwarga': make_donations(45)}
+    save_path = str(tmp_path) + '/'
+
+    with KitabisaStandin(donations) as standin:
+        with donors.Scraper(save_path, base_url=standin.url) as scraper:
+            scraper.donors_scrape('bantuwarga', max_attempts=2)
+
+            # the listing is sorted by verification time, a donation made before the ones stored but verified since then comes first
+            late = make_donations(1, start_id=999990)
+            donations['bantuwarga'] = late + make_donations(48)
+            summary = scraper.donors_scrape('bantuwarga', max_attempts=2, incremental=True)
+
+    df = pd.read_csv(tmp_path / 'donorsinfo_appended_bantuwarga.csv')
+    assert summary['rows'] == 49
+    assert 999990 in set(df['id'])
+    assert sorted(df['id']) == sorted(d['id'] for d in donations['bantuwarga'])
+
+
+def test_crawl_state_plans_the_work_left(tmp_path):
+    with CrawlState(tmp_path / 'state.db') as state:
+        state.commit('selesai', '', pages=3, rows=25, file_offset=2500, status='done')
+        state.commit('terhenti', '123_456', pages=2, rows=20, file_offset=2048, status='failed')
+        state.commit('lama', '', pages=1, rows=5, file_offset=500, status='done')
+        state.conn.execute("UPDATE crawl_state SET updated_at = '2024-01-01 00:00:00' WHERE project_id = 'lama'")
+
+        plan = state.plan(['baru', 'selesai', 'lama', 'terhenti', 'baru'])
+        recent_skipped = state.plan(['selesai', 'lama'], refresh_after=12)
+        summary = state.summary()
+
+    # unfinished crawls come before the projects never read, the stalest refresh first
+    assert plan == {'to_read': ['terhenti', 'baru'], 'to_refresh': ['lama', 'selesai']}
+    assert recent_skipped['to_refresh'] == ['lama']
+    assert summary['done'] == {'projects': 2, 'rows': 30, 'pages': 4}
+    assert summary['failed']['projects'] == 1
@@ -0,0 +1,100 @@
+import pandas as pd
+
+from modules import donors, projects
+from modules.storage import ParquetStore, read_frame
+from kitabisa_scraper_tests.standin import KitabisaStandin, make_donations
+
+
+def test_store_writes_typed_partitions_and_pushes_filters_down(tmp_path):
+    store = ParquetStore(tmp_path / 'lake')
+    df = pd.DataFrame({'short_url': ['a', 'b', 'c'], 'donation_count': [1, 2, 3], 'is_open_goal': [False, True, None],
+                       'campaigner.type': [None, None, None]})
+
+    path = store.write('project_props', df.assign(scrape_date='2024-04-11'))
+    store.write('project_props', df.assign(scrape_date='2024-04-12', donation_count=[4, 5, 6]))
+    # a rerun on the same day replaces its partition
+    store.write('project_props', df.assign(scrape_date='2024-04-12', donation_count=[7, 8, 9]))
+
+    assert path == tmp_path / 'lake' / 'project_props' / 'scrape_date=2024-04-11'
+    assert store.partitions('project_props', 'scrape_date') == ['2024-04-11', '2024-04-12']
+
+    latest = store.read('project_props', columns=['short_url', 'donation_count'], filters=[('scrape_date', '=', '2024-04-12')])
+    assert list(latest.columns) == ['short_url', 'donation_count']
+    assert list(latest['donation_count']) == [7, 8, 9]
+    assert latest['donation_count'].dtype == 'int64'
+
+    assert list(read_frame(path, columns=['short_url'])['short_url']) == ['a', 'b', 'c']
+
+
+def test_finalize_reads_and_writes_the_lake(tmp_path):
+    store = ParquetStore(tmp_path / 'lake')
+    df = pd.DataFrame({'short_url': ['a', 'b', 'c'], 'donation_percentage': [0.05, 0.3, 0.8],
+                       'campaign_start': [1700000000] * 3, 'campaign_end': [1720000000] * 3,
+                       'is_forever_running': [False] * 3, 'is_open_goal': [False] * 3, 'title': ['x', 'y', 'z']})
+    path = store.write('project_props', df.assign(scrape_date='2024-04-12'))
+
+    finalize = projects.ProjectsFinalize(path, str(tmp_path) + '/', store=store)
+    finalize.projects_data_cleaning(['short_url', 'donation_percentage', 'campaign_start', 'campaign_end', 'is_forever_running', 'is_open_goal'])
+    df_final, final_path = finalize.projects_filter(0.5, dev_mode=True)
+
+    assert list(df_final['short_url']) == ['b']
+    assert final_path == tmp_path / 'lake' / 'project_final' / 'scrape_date=2024-04-12'
+    # the timestamps survive the round trip instead of coming back as strings
+    assert pd.api.types.is_datetime64_any_dtype(read_frame(final_path)['campaign_start'])
+
+
+def test_finalize_handles_no_projects(tmp_path):
+    columns = ['short_url', 'donation_percentage', 'campaign_start', 'campaign_end', 'is_forever_running', 'is_open_goal']
+    store = ParquetStore(tmp_path / 'lake')
+
+    # no project read at all, then projects none of which passes the filter
+    empty = pd.DataFrame({column: [] for column in columns + ['time_scraped']})
+    none_pass = pd.DataFrame({'short_url': ['a'], 'donation_percentage': [0.9], 'campaign_start': [1700000000], 'campaign_end': [1720000000],
+                              'is_forever_running': [False], 'is_open_goal': [False], 'time_scraped': ['2024-04-12 19:00:00']})
+
+    for df, save_store in [(empty, None), (empty, store), (none_pass, store)]:
+        finalize = projects.ProjectsFinalize(df, str(tmp_path) + '/', store=save_store)
+        finalize.projects_data_cleaning(columns)
+        df_final, final_path = finalize.projects_filter(0.5, dev_mode=True)
+
+        assert len(df_final) == 0
+        if save_store is None:
+            assert len(read_frame(final_path)) == 0
+
+
+def test_finalize_names_the_files_after_the_run(tmp_path):
+    columns = ['short_url', 'donation_percentage', 'campaign_start', 'campaign_end', 'is_forever_running', 'is_open_goal']
+    # the run started before midnight, its pages were read after it
+    df = pd.DataFrame({'short_url': ['a'], 'donation_percentage': [0.3], 'campaign_start': [1700000000], 'campaign_end': [1720000000],
+                       'is_forever_running': [False], 'is_open_goal': [False], 'time_scraped': ['2024-04-13 00:00:10']})
+
+    finalize = projects.ProjectsFinalize(df, str(tmp_path) + '/', timestamp='2024-04-12 23:59:00')
+    finalize.projects_data_cleaning(columns)
+    _, final_path = finalize.projects_filter(0.5, dev_mode=True)
+    assert final_path == tmp_path / 'project_final_2024-04-12 23:59:00.csv'
+
+    finalize = projects.ProjectsFinalize(df, str(tmp_path) + '/', store=ParquetStore(tmp_path / 'lake'), timestamp='2024-04-12 23:59:00')
+    finalize.projects_data_cleaning(columns)
+    _, final_path = finalize.projects_filter(0.5, dev_mode=True)
+    assert final_path == tmp_path / 'lake' / 'project_final' / 'scrape_date=2024-04-12'
+
+
+def test_donors_scrape_publishes_completed_crawls(tmp_path):
+    donations = {'bantuwarga': make_donations(45)}
+    save_path = str(tmp_path) + '/'
+    store = ParquetStore(tmp_path / 'lake')
+
+    with KitabisaStandin(donations) as standin:
+        with donors.Scraper(save_path, base_url=standin.url, store=store) as scraper:
+            scraper.donors_scrape('bantuwarga', max_attempts=2)
+
+            donations['bantuwarga'][:0] = make_donations(13, start_id=donations['bantuwarga'][0]['id'] + 1)
+            scraper.donors_scrape('bantuwarga', max_attempts=2, incremental=True)
+
+    df = store.read('donors', columns=['id', 'amount', 'is_anonymous', 'short_url'], filters=[('short_url', '=', 'bantuwarga')])
+
+    # the delta only adds the new donations to the partitions already published
+    assert sorted(df['id']) == sorted(d['id'] for d in donations['bantuwarga'])
+    assert df['amount'].dtype == 'int64'
+    assert df['is_anonymous'].dtype == 'bool'
+    assert set(df['short_url'].astype(str)) == {'bantuwarga'}
@@ -0,0 +1,293 @@
+import atexit
+import threading
+import queue
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.fetchers import USER_AGENT, SeleniumFetcher
+from modules.metrics import driver_memory
+
+
+# requests the scrapers never need: images, fonts, media and analytics, only the html and the scripts building it matter
+BLOCKED_URLS = ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico',
+                '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+                '*.mp4', '*.webm', '*.mp3', '*.m3u8',
+                '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*', '*facebook.net*',
+                '*connect.facebook.com*', '*hotjar.com*', '*clarity.ms*', '*sentry.io*', '*branch.io*']
+
+
+def new_driver(headless=True, block_resources=True, page_load_strategy='eager'):
+    '''
+    Start a new Chrome WebDriver with the options shared by the scrapers.
+
+    Args:
+        headless (bool, optional): Whether to hide the chrome ui when running the webdriver. Defaults to True.
+        block_resources (bool, optional): Whether to block the images, fonts, media and analytics of BLOCKED_URLS. Defaults to True.
+        page_load_strategy (str, optional): 'eager' returns from get() once the html is parsed, without waiting for the
+                                            images and stylesheets, 'normal' waits for the whole page. Defaults to 'eager'.
+
+    Returns:
+        webdriver.Chrome: The started driver.
+    '''
+    # selenium is only loaded once a driver is started, the http engine and the cli never pay for it
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    chrome_options = Options()
+    if headless:
+        # the new headless mode renders like a normal window, so the explore listing keeps loading cards when scrolled
+        chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--window-size=1920,1080")
+    # user agent to avoid the web incorrectly read the user agent as a headless browser
+    chrome_options.add_argument(f'user-agent={USER_AGENT}')
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.page_load_strategy = page_load_strategy
+    if block_resources:
+        chrome_options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+
+    driver = webdriver.Chrome(options=chrome_options)
+    if block_resources:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URLS})
+    return driver
+
+
+class DriverPool:
+    '''
+    A pool of reusable headless drivers to load many pages in parallel.
+
+    Every driver is quit and replaced after it has loaded `recycle_after` pages, or as soon as its memory
+    goes above `max_memory`, so the memory leaked by long-running Chrome instances stays bounded. A driver
+    whose lease raised is replaced right away.
+
+    Args:
+        size (int): Number of drivers in the pool.
+        recycle_after (int, optional): Number of pages a driver loads before it gets restarted. Defaults to 200.
+        driver_factory (callable, optional): Function returning a new driver. Defaults to new_driver.
+        max_memory (int, optional): Memory in bytes above which a driver gets restarted. Defaults to None, no ceiling.
+        check_every (int, optional): Number of pages between two checks of the memory of a driver. Defaults to 10.
+        memory_of (callable, optional): Function returning the memory of a driver in bytes. Defaults to driver_memory.
+    '''
+
+    def __init__(self, size, recycle_after=200, driver_factory=new_driver, max_memory=None, check_every=10, memory_of=driver_memory):
+        if size < 1:
+            raise ValueError("size should be at least 1.")
+
+        self.size = size
+        self.recycle_after = recycle_after
+        self.driver_factory = driver_factory
+        self.max_memory = max_memory
+        self.check_every = check_every
+        self.memory_of = memory_of
+        self.restarts = 0
+        self.memory_restarts = 0
+        self._idle = queue.Queue()
+        self._drivers = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _checkout(self):
+        while True:
+            try:
+                slot = self._idle.get_nowait()
+            except queue.Empty:
+                # start drivers lazily, only as many as the work actually needs
+                with self._lock:
+                    if len(self._drivers) < self.size:
+                        slot = [self.driver_factory(), 0]
+                        self._drivers.append(slot)
+                        return slot
+                slot = self._idle.get()
+            # None stands for a dropped driver, its place is free for a new one
+            if slot is not None:
+                return slot
+
+    def _drop(self, slot):
+        with self._lock:
+            self._drivers = [s for s in self._drivers if s is not slot]
+        # wake up a lease waiting for a driver, so it starts a new one
+        self._idle.put(None)
+
+    def _quit(self, driver):
+        try:
+            driver.quit()
+        except Exception:
+            # a crashed driver can fail to quit, it's replaced either way
+            pass
+
+    def _over_memory(self, slot):
+        if self.max_memory is None or slot[1] % self.check_every != 0:
+            return False
+        try:
+            memory = self.memory_of(slot[0])
+        except Exception:
+            return False
+        return memory is not None and memory > self.max_memory
+
+    def _checkin(self, slot, failed=False):
+        slot[1] += 1
+        over_memory = not failed and self._over_memory(slot)
+        if failed or slot[1] >= self.recycle_after or over_memory:
+            self._quit(slot[0])
+            try:
+                slot[0] = self.driver_factory()
+            except Exception:
+                # the next lease starts a driver in its place, and raises if it fails again
+                self._drop(slot)
+                return
+            slot[1] = 0
+            with self._lock:
+                self.restarts += 1
+                self.memory_restarts += int(over_memory)
+        self._idle.put(slot)
+
+    @contextmanager
+    def lease(self):
+        '''
+        Borrow a driver from the pool for the body of a 'with' statement.
+
+        If the body raises, the driver may have crashed or hung, so it's quit and replaced instead of going back to the pool.
+        '''
+        slot = self._checkout()
+        failed = False
+        try:
+            yield slot[0]
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._checkin(slot, failed)
+
+    def run(self, func, item):
+        '''
+        Call `func(driver, item)` with a driver borrowed from the pool.
+        '''
+        with self.lease() as driver:
+            return func(driver, item)
+
+    def map(self, func, items):
+        '''
+        Call `func(driver, item)` for every item across the drivers of the pool.
+
+        Returns:
+            list: The results, in the same order as the items.
+        '''
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            return list(executor.map(lambda item: self.run(func, item), items))
+
+    def close(self):
+        with self._lock:
+            for driver, _ in self._drivers:
+                self._quit(driver)
+            self._drivers = []
+            self._idle = queue.Queue()
+
+
+class BrowserManager:
+    '''
+    Warm Chrome drivers shared by the scrapers, so a run only pays the start of a browser once however many
+    scrapers and pages use it.
+
+    The drivers are started lazily, block the resources of BLOCKED_URLS, return from a page load once the html
+    is parsed, and are restarted after `recycle_after` pages or once they use more than `max_memory_mb`.
+
+    Args:
+        size (int, optional): Maximum number of drivers running at once. Defaults to 2.
+        recycle_after (int, optional): Number of pages a driver loads before it gets restarted. Defaults to 200.
+        max_memory_mb (int, optional): Memory of a driver, with all its chrome processes, above which it gets restarted. Defaults to 1024.
+        headless (bool, optional): Whether to hide the chrome ui. Defaults to True.
+        block_resources (bool, optional): Whether to block images, fonts, media and analytics. Defaults to True.
+        page_load_strategy (str, optional): See new_driver. Defaults to 'eager'.
+        driver_factory (callable, optional): Function returning a new driver, replacing the options above. Defaults to None.
+    '''
+
+    def __init__(self, size=2, recycle_after=200, max_memory_mb=1024, headless=True, block_resources=True, page_load_strategy='eager',
+                 driver_factory=None):
+        if driver_factory is None:
+            def driver_factory():
+                return new_driver(headless, block_resources, page_load_strategy)
+
+        self.size = size
+        self.pool = DriverPool(size, recycle_after, driver_factory,
+                               max_memory=max_memory_mb * 1024 ** 2 if max_memory_mb is not None else None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def lease(self):
+        '''
+        Borrow a warm driver for the body of a 'with' statement, it goes back to the pool afterwards.
+        '''
+        return self.pool.lease()
+
+    def map(self, func, items):
+        '''
+        Call `func(driver, item)` for every item across the drivers, keeping the order of the items.
+        '''
+        return self.pool.map(func, items)
+
+    def stats(self):
+        return {'drivers': len(self.pool._drivers), 'restarts': self.pool.restarts, 'memory_restarts': self.pool.memory_restarts}
+
+    def close(self):
+        self.pool.close()
+
+
+class BrowserFetcher:
+    '''
+    Fetch backend loading every page with a driver borrowed from a BrowserManager, so it can be shared by many threads.
+
+    Args:
+        browser (BrowserManager): The drivers to borrow from.
+        metrics (RunMetrics, optional): Records the latency of the page loads and the memory of the drivers. Defaults to None.
+    '''
+
+    def __init__(self, browser, metrics=None):
+        self.browser = browser
+        self.metrics = metrics
+
+    def _call(self, url, method):
+        with self.browser.lease() as driver:
+            result = getattr(SeleniumFetcher(driver, self.metrics), method)(url)
+            if self.metrics is not None:
+                self.metrics.set('driver_rss_bytes', driver_memory(driver))
+            return result
+
+    def get_text(self, url):
+        return self._call(url, 'get_text')
+
+    def get_json_text(self, url):
+        return self._call(url, 'get_json_text')
+
+    def get_json(self, url):
+        return self._call(url, 'get_json')
+
+    def close(self):
+        # the drivers belong to the browser manager
+        pass
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_browser(**options):
+    '''
+    Return the BrowserManager shared by the whole process, created with the given options on the first call
+    and closed when the process exits.
+    '''
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = BrowserManager(**options)
+            atexit.register(_shared.close)
+        return _shared
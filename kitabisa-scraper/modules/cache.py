@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+# time to live in seconds of the cached responses, the first pattern found in the URL wins
+# donor pages after the first one are addressed by a cursor and don't change anymore, the rest keeps moving
+DEFAULT_TTLS = [
+    ('next=', 7 * 24 * 60 * 60),
+    ('/donors', 60 * 60),
+    ('/campaign/', 12 * 60 * 60),
+]
+
+
+class ResponseCache:
+    '''
+    On-disk cache of raw responses, so pages can be re-parsed offline and same-day reruns skip the network.
+
+    The bodies are content-addressed (stored once under the sha256 of their content) and a small SQLite
+    index keeps the URL, fetch time, size and last access of every response. Every endpoint has its own
+    time to live, and the least recently used responses are evicted once the cache grows over max_bytes.
+
+    Args:
+        cache_dir (str or Path): Folder of the cache.
+        ttls (list, optional): (pattern, seconds) pairs, the first pattern found in the URL gives its time to live. Defaults to DEFAULT_TTLS.
+        default_ttl (int, optional): Time to live of the URLs matching no pattern, in seconds. Defaults to 1 day.
+        max_bytes (int, optional): Maximum total size of the cached bodies. Defaults to 2 GB.
+        clock (callable, optional): Function returning the current unix time. Defaults to time.time.
+    '''
+
+    def __init__(self, cache_dir, ttls=None, default_ttl=24 * 60 * 60, max_bytes=2 * 1024 ** 3, clock=time.time):
+        self.cache_dir = Path(cache_dir)
+        self.ttls = ttls if ttls is not None else DEFAULT_TTLS
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        (self.cache_dir / 'objects').mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.cache_dir / 'index.db'), timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)')
+        # running total of the cached bodies, so a put doesn't sum the whole index
+        self._total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _object_path(self, digest):
+        return self.cache_dir / 'objects' / digest[:2] / digest
+
+    def ttl_for(self, url):
+        '''
+        Return the time to live in seconds of the given URL.
+        '''
+        for pattern, ttl in self.ttls:
+            if pattern in url:
+                return ttl
+        return self.default_ttl
+
+    def get(self, url, ignore_ttl=False):
+        '''
+        Return the cached body of a URL.
+
+        Args:
+            url (str): The URL of the response.
+            ignore_ttl (bool, optional): Whether to also return stale responses, e.g. to re-parse offline. Defaults to False.
+
+        Returns:
+            str: The cached body, or None if it's missing or stale.
+        '''
+        now = self.clock()
+        with self._lock:
+            row = self.conn.execute('SELECT digest, fetched_at FROM responses WHERE url = ?', (url,)).fetchone()
+            if row is None or (not ignore_ttl and now - row[1] > self.ttl_for(url)):
+                self.misses += 1
+                return None
+
+            try:
+                body = self._object_path(row[0]).read_text(encoding='utf-8')
+            except FileNotFoundError:
+                self._delete(url)
+                self.misses += 1
+                return None
+
+            self.conn.execute('UPDATE responses SET last_access = ? WHERE url = ?', (now, url))
+            self.hits += 1
+            return body
+
+    def put(self, url, body):
+        '''
+        Store the body of a URL, evicting the least recently used responses if the cache grows too large.
+        '''
+        data = body.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        now = self.clock()
+
+        with self._lock:
+            if not path.exists():
+                # write to a temporary file first so a crash never leaves a truncated body behind
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+                tmp_path.write_bytes(data)
+                os.replace(tmp_path, path)
+
+            previous = self.conn.execute('SELECT digest, size FROM responses WHERE url = ?', (url,)).fetchone()
+            self.conn.execute('''
+                INSERT INTO responses (url, digest, fetched_at, size, last_access) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET digest = excluded.digest, fetched_at = excluded.fetched_at,
+                    size = excluded.size, last_access = excluded.last_access
+            ''', (url, digest, now, len(data), now))
+            self._total += len(data) - (previous[1] if previous is not None else 0)
+            if previous is not None and previous[0] != digest:
+                self._drop_object(previous[0])
+
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _drop_object(self, digest):
+        # bodies are shared between URLs with the same content, only delete the last reference
+        if self.conn.execute('SELECT 1 FROM responses WHERE digest = ? LIMIT 1', (digest,)).fetchone() is None:
+            self._object_path(digest).unlink(missing_ok=True)
+
+    def _delete(self, url):
+        row = self.conn.execute('SELECT size FROM responses WHERE url = ?', (url,)).fetchone()
+        if row is not None:
+            self.conn.execute('DELETE FROM responses WHERE url = ?', (url,))
+            self._total -= row[0]
+
+    def _evict(self):
+        # other processes sharing the cache move the total too, so it's counted again before evicting anything
+        self._total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        while self._total > self.max_bytes:
+            url, digest = self.conn.execute('SELECT url, digest FROM responses ORDER BY last_access LIMIT 1').fetchone()
+            self._delete(url)
+            self._drop_object(digest)
+
+    def size(self):
+        '''
+        Return the number of cached responses and their total size in bytes.
+        '''
+        with self._lock:
+            return tuple(self.conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone())
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class CachedFetcher:
+    '''
+    Wrap a fetch backend so responses are read from the cache while they're fresh, and stored after every fetch.
+
+    Args:
+        fetcher: The fetch backend to wrap, e.g. HttpFetcher.
+        cache (ResponseCache): The response cache.
+        offline (bool, optional): Whether to only read from the cache, ignoring the time to live and never hitting the network. Defaults to False.
+    '''
+
+    def __init__(self, fetcher, cache, offline=False):
+        self.fetcher = fetcher
+        self.cache = cache
+        self.offline = offline
+
+    def _cached(self, url):
+        body = self.cache.get(url, ignore_ttl=self.offline)
+        if body is None and self.offline:
+            raise LookupError(f'{url} is not in the cache.')
+        return body
+
+    def get_text(self, url):
+        body = self._cached(url)
+        if body is None:
+            body = self.fetcher.get_text(url)
+            self.cache.put(url, body)
+        return body
+
+    def get_json_text(self, url):
+        body = self._cached(url)
+        if body is None:
+            body = self.fetcher.get_json_text(url)
+            self.cache.put(url, body)
+        return body
+
+    def get_json(self, url):
+        # the raw body is cached, as it came from the server, and decoded on every read
+        return json.loads(self.get_json_text(url))
+
+    def close(self):
+        self.fetcher.close()
@@ -0,0 +1,188 @@
+'''
+Command line entry point of the scrapers, installed as the `kitabisa-scraper` console script.
+
+    kitabisa-scraper listing                              # read the explore listing into data/project_list_<time>.csv
+    kitabisa-scraper props                                # read the campaign pages of the newest project list
+    kitabisa-scraper donors bantuwarga sedekahjumat       # crawl the donors of some campaigns
+    kitabisa-scraper resume                               # finish every donors crawl that stopped halfway
+    kitabisa-scraper status --projects projects.csv       # what the crawl state holds, and what's left to read
+
+Every subcommand imports what it needs when it runs. status only opens the SQLite crawl state, so a cron
+wrapper checking it every few minutes doesn't load pandas, selenium or Dagster.
+'''
+import argparse
+import csv
+import glob
+import json
+import sys
+from datetime import datetime
+
+
+def _read_project_ids(path):
+    '''
+    Read the short names of the projects from a CSV file with a short_url column, e.g. a project list, or a text file with one per line.
+    '''
+    with open(path, newline='') as fh:
+        if path.endswith('.csv'):
+            return [row['short_url'] for row in csv.DictReader(fh)]
+        return [line.strip() for line in fh if line.strip()]
+
+
+def _state_path(args):
+    return args.state if args.state is not None else args.save_path + 'crawl_state.db'
+
+
+def _options(args, **options):
+    # only pass the options given on the command line, the scrapers keep their own defaults for the others
+    if args.base_url is not None:
+        options['base_url'] = args.base_url
+    return options
+
+
+def cmd_listing(args):
+    from modules import projects
+
+    with projects.Scraper(args.save_path) as scraper:
+        if args.api is not None:
+            # the data source behind the listing, no browser is started
+            df_projects = scraper.projectlist_fetch(args.api)
+        else:
+            df_projects = scraper.projectlist_scrape(args.url, args.num_scroll)
+
+    print(f'Saved {len(df_projects)} projects to {args.save_path}project_list_{scraper.today}.csv')
+    return 0
+
+
+def cmd_props(args):
+    from modules import projects
+
+    project_list = args.projects
+    if project_list is None:
+        project_lists = sorted(glob.glob(args.save_path + 'project_list_*.csv'))
+        if not project_lists:
+            print(f'No project list in {args.save_path}, run the listing first or pass --projects.', file=sys.stderr)
+            return 1
+        project_list = project_lists[-1]
+
+    snapshots = None
+    if args.history is not None:
+        from modules.snapshots import SnapshotStore
+        snapshots = SnapshotStore(args.history)
+
+    try:
+        with projects.Scraper(args.save_path, args.pool_size, engine=args.engine, snapshots=snapshots, **_options(args)) as scraper:
+            # the projects come from a saved list instead of a listing read in the same run
+            scraper.project_list = _read_project_ids(project_list)
+            scraper.today = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            df_project_props, filepath = scraper.projectprops_scrape(args.max_attempts)
+    finally:
+        if snapshots is not None:
+            snapshots.close()
+
+    print(f'Read {len(df_project_props)} of {len(scraper.project_list)} projects into {filepath}')
+    return 0 if len(df_project_props) == len(scraper.project_list) else 1
+
+
+def _crawl(args, project_ids, incremental):
+    from modules import donors
+    from modules.crawler import DonorsCrawler
+
+    with donors.Scraper(args.save_path, state_path=_state_path(args), **_options(args)) as scraper:
+        progress = DonorsCrawler(scraper, max_concurrency=args.concurrency).crawl(project_ids, args.max_attempts, incremental)
+
+    for project_id, p in progress.items():
+        print(f"{project_id:<40} {p['status']:<8} {p['pages']:>7} pages {p['rows']:>9} rows" + (f"  {p['error']}" if p['error'] else ''))
+    return 0 if all(p['status'] == 'done' for p in progress.values()) else 1
+
+
+def cmd_donors(args):
+    return _crawl(args, args.project_ids, args.incremental)
+
+
+def cmd_resume(args):
+    from modules.state import CrawlState
+
+    with CrawlState(_state_path(args)) as state:
+        project_ids = state.unfinished()
+    if not project_ids:
+        print('No unfinished crawl.')
+        return 0
+    # the donors scraper picks every crawl up from its last committed page
+    return _crawl(args, project_ids, incremental=False)
+
+
+def cmd_status(args):
+    from modules.state import CrawlState
+
+    with CrawlState(_state_path(args)) as state:
+        summary = state.summary()
+        unfinished = state.unfinished()
+        plan = state.plan(_read_project_ids(args.projects), args.refresh_after) if args.projects is not None else None
+
+    if args.json:
+        print(json.dumps({'summary': summary, 'unfinished': unfinished, 'plan': plan}))
+        return 0
+
+    print(f"{'status':<10} {'projects':>9} {'rows':>12} {'pages':>9}")
+    for status, counts in sorted(summary.items()):
+        print(f"{status:<10} {counts['projects']:>9} {counts['rows']:>12} {counts['pages']:>9}")
+    if unfinished:
+        print('unfinished: ' + ' '.join(unfinished))
+    if plan is not None:
+        print(f"to read: {len(plan['to_read'])}, to refresh: {len(plan['to_refresh'])}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='kitabisa-scraper', description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--save-path', default='data/', help='folder of the scraped data, with a trailing slash (default: data/)')
+
+    listing = commands.add_parser('listing', parents=[common], help='read the list of projects')
+    listing.add_argument('--url', default='https://kitabisa.com/explore/all', help='explore page scrolled with a headless driver')
+    listing.add_argument('--num-scroll', type=int, default=300, help='upper bound of the scrolls, it stops once the listing stops growing')
+    listing.add_argument('--api', default=None, help='read this campaigns listing endpoint instead of scrolling the explore page')
+    listing.set_defaults(func=cmd_listing)
+
+    props = commands.add_parser('props', parents=[common], help='read the properties of the projects')
+    props.add_argument('--projects', default=None, help='CSV file with a short_url column, or one short_url per line (default: the newest project list)')
+    props.add_argument('--engine', choices=['http', 'selenium'], default='http', help='how to read the project pages (default: http)')
+    props.add_argument('--pool-size', type=int, default=4, help='connections or drivers reading the pages in parallel (default: 4)')
+    props.add_argument('--max-attempts', type=int, default=3, help='attempts on every page (default: 3)')
+    props.add_argument('--history', default=None, help='record only the changed properties to this snapshot store, instead of a full snapshot')
+    props.add_argument('--base-url', default=None, help='root URL of the campaign pages, e.g. a local stand-in server')
+    props.set_defaults(func=cmd_props)
+
+    crawl = argparse.ArgumentParser(add_help=False, parents=[common])
+    crawl.add_argument('--state', default=None, help='crawl state database (default: <save-path>crawl_state.db)')
+    crawl.add_argument('--max-attempts', type=int, default=3, help='attempts on a page before giving up on a project (default: 3)')
+    crawl.add_argument('--concurrency', type=int, default=8, help='projects crawled at the same time (default: 8)')
+    crawl.add_argument('--base-url', default=None, help='root URL of the donors API, e.g. a local stand-in server')
+
+    donors = commands.add_parser('donors', parents=[crawl], help='crawl the donors of the given projects')
+    donors.add_argument('project_ids', nargs='+', metavar='short_url', help='short names of the projects')
+    donors.add_argument('--incremental', action='store_true', help='only read the new donations of the projects crawled completely before')
+    donors.set_defaults(func=cmd_donors)
+
+    resume = commands.add_parser('resume', parents=[crawl], help='finish the donors crawls that stopped halfway')
+    resume.set_defaults(func=cmd_resume)
+
+    status = commands.add_parser('status', parents=[common], help='show the crawl state')
+    status.add_argument('--state', default=None, help='crawl state database (default: <save-path>crawl_state.db)')
+    status.add_argument('--projects', default=None, help='also plan these projects, a CSV file with a short_url column or one per line')
+    status.add_argument('--refresh-after', type=float, default=20, help='hours before a complete crawl is due a refresh (default: 20)')
+    status.add_argument('--json', action='store_true', help='print the state as json')
+    status.set_defaults(func=cmd_status)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+
+class HostBudget:
+    '''
+    Caps how many requests can be in flight against the same host at once.
+
+    Args:
+        max_per_host (int): Maximum number of concurrent requests per host.
+    '''
+
+    def __init__(self, max_per_host):
+        self.max_per_host = max_per_host
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def slot(self, url):
+        '''
+        Return the semaphore guarding the host of the given URL, use it in a 'with' statement around the request.
+        '''
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._semaphores[host]
+
+
+class BudgetedFetcher:
+    '''
+    Wrap a fetch backend so that every request waits for a free slot in the host budget.
+
+    Args:
+        fetcher: The fetch backend to wrap, e.g. HttpFetcher.
+        budget (HostBudget): The per-host request budget.
+    '''
+
+    def __init__(self, fetcher, budget):
+        self.fetcher = fetcher
+        self.budget = budget
+
+    def get_text(self, url):
+        with self.budget.slot(url):
+            return self.fetcher.get_text(url)
+
+    def get_json_text(self, url):
+        with self.budget.slot(url):
+            return self.fetcher.get_json_text(url)
+
+    def get_json(self, url):
+        with self.budget.slot(url):
+            return self.fetcher.get_json(url)
+
+    def close(self):
+        self.fetcher.close()
+
+
+class DonorsCrawler:
+    '''
+    Run the donors cursor chains of many projects at once. Each chain is still read page by page,
+    but different projects are crawled in parallel so a batch takes as long as its longest project.
+
+    Args:
+        scraper (donors.Scraper): An entered donors scraper using the 'http' engine.
+        max_concurrency (int, optional): Global cap on how many projects are crawled at the same time. Defaults to 8.
+        max_per_host (int, optional): Cap on concurrent requests against a single host. Defaults to 4.
+    '''
+
+    def __init__(self, scraper, max_concurrency=8, max_per_host=4):
+        if scraper.engine != 'http' and max_concurrency > 1:
+            raise ValueError("Only the 'http' engine can be shared between concurrent crawls.")
+
+        self.scraper = scraper
+        self.max_concurrency = max_concurrency
+        self.budget = HostBudget(max_per_host)
+        self.progress = {}
+        self._lock = threading.Lock()
+
+        # every chain shares the scraper's session, gated by the per-host budget
+        if not isinstance(scraper.fetcher, BudgetedFetcher):
+            scraper.fetcher = BudgetedFetcher(scraper.fetcher, self.budget)
+
+    def _update(self, project_id, **values):
+        with self._lock:
+            self.progress[project_id].update(values)
+
+    def _crawl_project(self, project_id, max_attempts, incremental):
+        self._update(project_id, status='running')
+        try:
+            summary = self.scraper.donors_scrape(project_id, max_attempts, incremental=incremental)
+        except Exception as e:
+            self._update(project_id, status='failed', error=repr(e))
+            return
+
+        status = 'done' if summary['completed'] else 'failed'
+        error = None if summary['completed'] else f'stopped after {max_attempts} failed attempts'
+        self._update(project_id, status=status, pages=summary['pages'], rows=summary['rows'], error=error)
+
+    def crawl(self, project_ids, max_attempts, incremental=False):
+        '''
+        Crawl the donors of all the given projects.
+
+        Args:
+            project_ids (list): The short names of the projects to crawl.
+            max_attempts (int): How many times to retry a page before giving up on a project.
+            incremental (bool, optional): Whether to only read the new donations of projects already crawled completely. Defaults to False.
+
+        Returns:
+            dict: Progress for every project, with its status ('done' or 'failed'), pages, rows and error.
+        '''
+        for project_id in project_ids:
+            self.progress[project_id] = {'status': 'pending', 'pages': 0, 'rows': 0, 'error': None}
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            for project_id in project_ids:
+                executor.submit(self._crawl_project, project_id, max_attempts, incremental)
+
+        return {project_id: self.progress[project_id] for project_id in project_ids}
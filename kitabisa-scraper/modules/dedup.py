@@ -0,0 +1,184 @@
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+class DonationIndex:
+    '''
+    Persistent index of the donation ids stored for every campaign, so a donation showing up again on a shifted page
+    (new donations keep pushing the older ones down while we page through them) or in a later run is dropped before
+    it reaches the appended file.
+
+    Every id is recorded with the size of the appended file once its batch was written, like the cursor in CrawlState,
+    so a resumed crawl cuts the index back together with the file and a donation cut off the file is read again.
+
+    Args:
+        db_path (str or Path): Path to the SQLite database file, e.g. the one of the crawl state.
+    '''
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS seen_donations (
+                project_id TEXT NOT NULL,
+                donation_id INTEGER NOT NULL,
+                file_offset INTEGER NOT NULL,
+                PRIMARY KEY (project_id, donation_id)
+            ) WITHOUT ROWID
+        ''')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def load(self, project_id, truncate_at=None, filepath=None):
+        '''
+        Load the ids stored for a campaign, to dedup a crawl appending to its file.
+
+        Args:
+            project_id (str): The short name of the project.
+            truncate_at (int, optional): Size the appended file was cut back to, the ids written after it are forgotten. Defaults to None.
+            filepath (str or Path, optional): The appended file, its ids are indexed first if the index holds none of them,
+                                              e.g. for a file written before the index existed. Defaults to None.
+
+        Returns:
+            SeenDonations: The ids of the campaign.
+        '''
+        with self._lock:
+            if truncate_at is not None:
+                self.conn.execute('DELETE FROM seen_donations WHERE project_id = ? AND file_offset > ?', (project_id, truncate_at))
+            rows = self.conn.execute('SELECT donation_id FROM seen_donations WHERE project_id = ?', (project_id,)).fetchall()
+        ids = np.fromiter((row[0] for row in rows), dtype='int64', count=len(rows))
+
+        if len(ids) == 0 and filepath is not None and Path(filepath).exists() and Path(filepath).stat().st_size > 0:
+            ids = pd.read_csv(filepath, usecols=['id'])['id'].dropna().to_numpy(dtype='int64')
+            self.add(project_id, ids, Path(filepath).stat().st_size)
+
+        return SeenDonations(self, project_id, ids)
+
+    def add(self, project_id, ids, file_offset):
+        '''
+        Record the ids of a batch written to the appended file of a campaign.
+
+        Args:
+            project_id (str): The short name of the project.
+            ids (array-like): The donation ids of the batch.
+            file_offset (int): Size in bytes of the appended file once the batch was written.
+        '''
+        with self._lock:
+            self.conn.execute('BEGIN')
+            self.conn.executemany('INSERT OR IGNORE INTO seen_donations VALUES (?, ?, ?)',
+                                  ((project_id, int(i), file_offset) for i in ids))
+            self.conn.execute('COMMIT')
+
+    def reset(self, project_id):
+        '''
+        Forget every id of a campaign, e.g. before crawling it again from scratch into a new file.
+        '''
+        with self._lock:
+            self.conn.execute('DELETE FROM seen_donations WHERE project_id = ?', (project_id,))
+
+    def count(self, project_id):
+        with self._lock:
+            return self.conn.execute('SELECT COUNT(*) FROM seen_donations WHERE project_id = ?', (project_id,)).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class SeenDonations:
+    '''
+    The donation ids of one campaign during a crawl. The stored ids are held in a sorted int64 array, 8 bytes an id
+    instead of the ~70 of a python set, and looked up a page at a time with a binary search. The ids of the pages
+    written since the last batch went to disk are kept apart until commit() records them with the size of the file.
+
+    Args:
+        index (DonationIndex): The index the ids are recorded to.
+        project_id (str): The short name of the project.
+        ids (np.ndarray): The ids already stored.
+    '''
+
+    def __init__(self, index, project_id, ids):
+        self.index = index
+        self.project_id = project_id
+        self.read = 0
+        self.duplicates = 0
+        self._stored = np.unique(ids)
+        self._pending = set()
+
+    def drop_seen(self, df):
+        '''
+        Drop the donations of a page that were already stored, or already written earlier in the crawl or on the same page.
+
+        Args:
+            df (pd.DataFrame): A page of donations, with their 'id' column.
+
+        Returns:
+            pd.DataFrame: The donations not seen before.
+        '''
+        if len(df) == 0:
+            return df
+
+        ids = df['id'].to_numpy(dtype='int64')
+        seen = self.known(ids)
+        seen |= pd.Series(ids).duplicated().to_numpy()
+
+        self.read += len(ids)
+        self.duplicates += int(seen.sum())
+        return df[~seen] if seen.any() else df
+
+    def known(self, ids):
+        '''
+        Return which of the given donation ids were already stored or written earlier in the crawl, without counting them as duplicates.
+
+        Args:
+            ids (array-like): The donation ids, e.g. the 'id' column of a page.
+
+        Returns:
+            np.ndarray: A boolean mask, True for the ids already seen.
+        '''
+        ids = np.asarray(ids, dtype='int64')
+        if len(self._stored):
+            positions = np.searchsorted(self._stored, ids).clip(max=len(self._stored) - 1)
+            seen = self._stored[positions] == ids
+        else:
+            seen = np.zeros(len(ids), dtype=bool)
+        if self._pending:
+            seen |= np.fromiter((i in self._pending for i in ids.tolist()), dtype=bool, count=len(ids))
+        return seen
+
+    def add(self, df):
+        '''
+        Mark the donations of a page as seen once it's written, a page that failed before is read again in full.
+        '''
+        if len(df) > 0:
+            self._pending.update(df['id'].astype('int64').tolist())
+
+    def commit(self, file_offset):
+        '''
+        Record the ids read since the last commit, once their batch is on disk.
+
+        Args:
+            file_offset (int): Size in bytes of the appended file after the write.
+        '''
+        if not self._pending:
+            return
+        pending = np.fromiter(self._pending, dtype='int64', count=len(self._pending))
+        self.index.add(self.project_id, pending, file_offset)
+        self._stored = np.union1d(self._stored, pending)
+        self._pending = set()
+
+    @property
+    def duplicate_rate(self):
+        return self.duplicates / self.read if self.read else 0.0
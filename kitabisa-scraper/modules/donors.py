@@ -1,139 +1,305 @@
 import pandas as pd
-import json
 import copy
 from pathlib import Path  
 from datetime import datetime
 
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
+from modules.fetchers import HttpFetcher
+from modules.browser import BrowserManager, BrowserFetcher
+from modules.sinks import CsvSink
+from modules.state import CrawlState
+from modules.dedup import DonationIndex
+from modules.cache import CachedFetcher
+from modules.governor import GovernedFetcher, classify, PERMANENT
+from modules.metrics import RunMetrics
+
+
+# columns of the donors API once flattened, every appended file is written with this layout
+DONOR_COLUMNS = ['id', 'is_anonymous', 'comment', 'amount', 'created', 'expire', 'verified', 'formatted', 
+                 'formatted_without_comment', 'campaign.id', 'campaign.title', 'campaign.campaigner', 'user.id', 
+                 'user.name', 'user.string', 'status.id', 'status.name', 'status.description.id', 
+                 'status.description.en', 'invoice.base_donation', 'invoice.unique_code', 'invoice.transaction_fee', 
+                 'invoice.total_invoiced', 'payment_method.type', 'payment_method.name', 'time_scrapped', 'short_url']
+
+
+def _count_stored(filepath):
+    '''
+    Return the number of donors in an appended file and the newest donation id among them, or (0, None) if it's empty.
+    '''
+    if not Path(filepath).exists() or Path(filepath).stat().st_size == 0:
+        return 0, None
+    ids = pd.read_csv(filepath, usecols=['id'])['id']
+    return len(ids), int(ids.max()) if ids.notna().any() else None
 
 
 class Scraper:
     '''
-    Class to scrape donor information from Kitabisa using Selenium WebDriver.
+    Class to scrape donor information from Kitabisa, either directly through the donors API or using Selenium WebDriver.
     
     Args:
         save_path (str): Path to save the scraped data.
+        engine (str, optional): Fetch backend, 'http' to call the donors API directly or 'selenium' to load it in a browser. Defaults to 'http'.
+        base_url (str, optional): Root URL of the donors API, change it to point the scraper to a local stand-in server. Defaults to 'https://core.kitabisa.com'.
+        pool_size (int, optional): Number of keep-alive connections for the 'http' engine. Defaults to 10.
+        batch_rows (int, optional): Number of donors buffered in memory before they are written to disk. Defaults to 500.
+        state_path (str, optional): Path to the crawl state database. Defaults to 'crawl_state.db' under save_path.
+        sort (str, optional): Sort mode of the donors API, it has to list the newest donations first for the delta crawl. Defaults to 'verified'.
+        cache (ResponseCache, optional): Cache of the raw responses, read while they're fresh and filled after every fetch. Defaults to None.
+        offline (bool, optional): Whether to only read the responses from the cache, to re-parse them without the network. Defaults to False.
+        store (ParquetStore, optional): Data lake the donors of every completed crawl are published to, partitioned by project and scrape date. Defaults to None.
+        governor (RequestGovernor, optional): Paces the requests and backs off before retrying a failed page. Defaults to None, retrying right away.
+        metrics (RunMetrics, optional): Records the latency of every stage, the pages, rows, bytes and retries, and the driver memory. 
+                                        Defaults to None, keeping them in memory only.
+        browser (BrowserManager, optional): Warm drivers shared with other scrapers for the 'selenium' engine, e.g. shared_browser().
+                                            Defaults to None, starting a driver of its own and quitting it on exit.
+        dedup (bool, optional): Whether to drop the donations already stored for the project, in this crawl or an earlier one, as the pages come in. 
+                                The index of the stored ids lives next to the crawl state. Defaults to True.
     '''
 
-    def __init__(self, save_path):
+    def __init__(self, save_path, engine='http', base_url='https://core.kitabisa.com', pool_size=10, batch_rows=500, state_path=None, sort='verified',
+                 cache=None, offline=False, store=None, governor=None, metrics=None, browser=None, dedup=True):
+        if engine not in ('http', 'selenium'):
+            raise ValueError("engine should be either 'http' or 'selenium'.")
+
         self.save_path = save_path
-        self.driver = None
+        self.engine = engine
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size
+        self.batch_rows = batch_rows
+        self.sort = sort
+        self.cache = cache
+        self.offline = offline
+        self.store = store
+        self.governor = governor
+        self.metrics = metrics if metrics is not None else RunMetrics()
+        self.state_path = state_path if state_path is not None else save_path + 'crawl_state.db'
+        self.browser = browser
+        self._own_browser = browser is None
+        self.dedup = dedup
+        self.fetcher = None
+        self.state = None
+        self.index = None
 
 
     def __enter__(self):
         '''
-        Enter method to initialize the Selenium WebDriver when used in a 'with' statement.
+        Enter method to initialize the fetch backend and the crawl state store when used in a 'with' statement.
         '''
-        # driver for projects information -> use headless to fasten the scraping process
-        chrome_options = Options()
-        # hide the chrome ui when running the webdriver
-        chrome_options.add_argument("--headless")  
-        chrome_options.add_argument("--window-size=1920,1080")
-        # user agent to avoid the web incorrectly read the user agent as a headless browser
-        user_agent = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/60.0.3112.50 Safari/537.36' 
-        chrome_options.add_argument(f'user-agent={user_agent}')
-        self.driver = webdriver.Chrome(options=chrome_options)
+        self.state = CrawlState(self.state_path)
+        if self.dedup:
+            self.index = DonationIndex(self.state_path)
+
+        if self.engine == 'http':
+            self.fetcher = HttpFetcher(pool_size=self.pool_size, metrics=self.metrics)
+        else:
+            # headless driver for the donors pages, borrowed for every page so a shared browser manager can recycle it
+            if self._own_browser:
+                self.browser = BrowserManager(size=1)
+            self.fetcher = BrowserFetcher(self.browser, self.metrics)
+
+        # only the requests that actually go to the network are paced, the cache sits in front of the governor
+        if self.governor is not None:
+            self.fetcher = GovernedFetcher(self.fetcher, self.governor)
+        if self.cache is not None:
+            self.fetcher = CachedFetcher(self.fetcher, self.cache, self.offline)
 
         return self
 
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         '''
-        Exit method to close the Selenium WebDriver when exiting the 'with' statement.
+        Exit method to close the fetch backend and the crawl state store when exiting the 'with' statement.
         '''
-        self.driver.quit()
+        self.fetcher.close()
+        if self._own_browser and self.browser is not None:
+            self.browser.close()
+        self.state.close()
+        if self.index is not None:
+            self.index.close()
+        self.metrics.flush()
 
 
-    def donors_scrape(self, project_id, max_attempts, start_id=None, init=True):
+    def donors_scrape(self, project_id, max_attempts, start_id=None, init=True, debug_pages=False, resume=True, incremental=False):
         '''
         Function to scrape list of all donors from a donation.
+
+        The progress is committed to the crawl state store after every batch written to disk, so if a previous
+        crawl of the project didn't reach the last page, it automatically resumes from the last committed page.
+
+        With incremental=True, a project that was already crawled completely is only read from its newest donations
+        until a whole page is already stored, and just that delta is appended to its file. The pages are sorted by
+        verification time rather than by id, so with dedup the stored donations are recognized by their id in the index,
+        and a donation verified late, with an id older than the ones stored, is still picked up.
+
+        With dedup enabled, a donation whose id was already stored for the project is dropped before it's written,
+        so the file holds every donation once even when new donations shift the pages while we read them.
         
         Args:
             project_id (str): The short name of the project, taken from the URL.
             max_attempts (int): Define how many times we want to try before stopping the scraper.
             start_id (str, optional): The starting page ID for scraping. Defaults to None.
             init (bool, optional): Whether to initialize the scraper from the beginning of the donors information page. Defaults to True.
+            debug_pages (bool, optional): Whether to also save every page as its own CSV file, for debugging purpose. Defaults to False.
+            resume (bool, optional): Whether to resume an unfinished crawl from the crawl state store. Defaults to True.
+            incremental (bool, optional): Whether to only read the donations made since the last complete crawl. Defaults to False.
+
+        Returns:
+            dict: Summary of the crawl, with the number of pages and rows read, the duplicates dropped and whether the last page was reached.
         '''
         save_path = self.save_path
 
         if not init and start_id is None:
             raise ValueError("If init is False, start_id must be provided.")
 
-        # filepath_num for the iteration
-        # next to append next page, filled an initial value to not trigger the while loop
-        filepath_num = 0
-        url = 'view-source:https://core.kitabisa.com/campaigns/' + project_id + '/donors?sort=verified&'  
-        url_new = url
+        url = self.base_url + '/campaigns/' + project_id + '/donors?sort=' + self.sort + '&'  
+        Path(save_path + 'donorsinfo_individual_' + project_id).mkdir(parents=True, exist_ok=True)
+
+        # filepath_num and num_rows count the pages and donors read so far
+        # next_page_id is the cursor of the page to read, 'page_1' for the first page and '' after the last one
+        # max_id is the newest donation id stored, delta is set while a delta crawl reads the donations made since the last one
+        state = self.state.get(project_id) if init else None
+        sink_path = save_path + 'donorsinfo_appended_' + project_id + '.csv'
+        max_id, delta = None, False
+        publish_from = 0
 
-        # these will be used only if you set the init as False
         if init == False:
-            url_start = url + 'next=' + start_id
-            url_cont = url
-            i = 0
-
-        # placeholder for current_page_id and next_page_id
-        df_appended = pd.DataFrame()
-        next_page_id = 'page_1' 
-        current_page_id = 'page_1'
-    
-        attempt = 0
+            # resume manually from the given page, appending to what the previous crawl already saved
+            # the counts carry on from the donors already in the file, so a later resume of this crawl keeps them right
+            previous = self.state.get(project_id)
+            next_page_id = start_id
+            filepath_num = previous['pages'] if previous is not None else 0
+            num_rows, max_id = _count_stored(sink_path)
+            sink = CsvSink(sink_path, columns=DONOR_COLUMNS, batch_rows=self.batch_rows, append=True)
+            truncate_at = None
+        elif resume and state is not None and state['status'] != 'done' and state['pages'] > 0:
+            # resume from the last committed page, cutting off anything written after that commit
+            next_page_id, filepath_num, num_rows = state['next_cursor'], state['pages'], state['rows']
+            max_id = state['max_donation_id']
+            sink = CsvSink(sink_path, columns=DONOR_COLUMNS, batch_rows=self.batch_rows, append=True, truncate_at=state['file_offset'])
+            truncate_at = state['file_offset']
+        elif incremental and state is not None and state['status'] == 'done' and state['max_donation_id'] is not None:
+            # delta crawl from the newest donations, anything written by an earlier unfinished delta is cut off
+            next_page_id, filepath_num, num_rows = 'page_1', state['pages'], state['rows']
+            max_id, delta = state['max_donation_id'], True
+            publish_from = state['file_offset']
+            sink = CsvSink(sink_path, columns=DONOR_COLUMNS, batch_rows=self.batch_rows, append=True, truncate_at=state['file_offset'])
+            truncate_at = state['file_offset']
+        else:
+            next_page_id, filepath_num, num_rows = 'page_1', 0, 0
+            sink = CsvSink(sink_path, columns=DONOR_COLUMNS, batch_rows=self.batch_rows)
+            truncate_at = None
+            if self.index is not None:
+                self.index.reset(project_id)
 
-        while next_page_id != '' and attempt < max_attempts:
-            try:
-                if init == True:
-                    self.driver.get(url_new)
-                else:
-                    if i == 0:
-                        self.driver.get(url_start)
-                    else:
-                        self.driver.get(url_cont)
-                
-                content = self.driver.page_source
-                content = self.driver.find_element(By.CLASS_NAME, ('line-content')).text
+        # the ids already stored for the project, cut back with the file so whatever gets cut off is read again
+        seen = self.index.load(project_id, truncate_at, sink_path) if self.index is not None else None
+
+        current_page_id = next_page_id
+        attempt = 0
+        metrics = self.metrics
 
-                data = json.loads(content)  # this is the json data for the list of the donors
+        # debuggers to see which pages we already read and which went to error, kept open for the whole crawl
+        # and closed (flushing the last lines) whatever ends it, e.g. an error escaping the retries or an interrupt
+        with open(f'{save_path}donorsinfo_individual_{project_id}/log_donorsinfo.txt', 'a') as log:
+            while next_page_id != '' and attempt < max_attempts:
+                page_url = url if next_page_id == 'page_1' else url + 'next=' + next_page_id
+                page_start = metrics.clock()
+                try:
+                    data = self.fetcher.get_json(page_url)  # this is the json data for the list of the donors
             
-                df = pd.json_normalize(data, record_path=['data'])
-                df['time_scrapped']= datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                df['short_url'] = project_id
-                df_appended = pd.concat([df_appended, df], ignore_index=True)
-
-                filepath_num = filepath_num + 1
-                filepath = Path(save_path + 'donorsinfo_individual_' + project_id + '/' + str(filepath_num) +'.csv')  
-                filepath.parent.mkdir(parents=True, exist_ok=True)  
-                df.to_csv(filepath, index=False)
-                
-                # create a current_page_id first, which is the value of current page for debugging purpose
-                # then, we can update the the next_page_id with the new id
-                current_page_id = copy.deepcopy(next_page_id)
-                next_page_id = data['next']
-                url_new = url + 'next=' + next_page_id
-
-                if init == False:
-                    url_cont = url + 'next=' + next_page_id
-                    i += 1
+                    with metrics.time('json_normalize'):
+                        df = pd.json_normalize(data, record_path=['data'])
+                    df['time_scrapped']= datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    df['short_url'] = project_id
+
+                    # the pages are sorted from the newest verified donation, so in a delta crawl a page holding only stored donations ends it
+                    # without the index, the newest stored id is the only watermark, missing the donations verified late
+                    reached_stored = False
+                    if delta and len(df) > 0:
+                        if seen is not None:
+                            stored = seen.known(df['id'])
+                        else:
+                            stored = (df['id'] <= state['max_donation_id']).to_numpy()
+                        reached_stored = bool(stored.all()) if seen is not None else bool(stored.any())
+                        df = df[~stored]
+                    num_read = len(df)
+                    if seen is not None:
+                        df = seen.drop_seen(df)
+                    if len(df) > 0:
+                        max_id = int(df['id'].max()) if max_id is None else max(max_id, int(df['id'].max()))
+
+                    filepath_num = filepath_num + 1
+                    num_rows = num_rows + len(df)
+                    if debug_pages:
+                        filepath = Path(save_path + 'donorsinfo_individual_' + project_id + '/' + str(filepath_num) +'.csv')  
+                        df.to_csv(filepath, index=False)
                 
-                # debuggers to see which files we already read
-                with open(f'{save_path}donorsinfo_individual_{project_id}/log_donorsinfo.txt', 'a') as fh:
-                    print('succesfully read ' + project_id + ' at the page of ' + current_page_id, file=fh)
+                    # create a current_page_id first, which is the value of current page for debugging purpose
+                    # then, we can update the the next_page_id with the new id
+                    current_page_id = copy.deepcopy(next_page_id)
+                    next_page_id = '' if reached_stored else data['next']
 
-                # reset attempt counter if we successfully read the donors info at that page
-                attempt = 0
+                    # stream every page to a single file instead of keeping all the donors in memory
+                    # once a batch is on disk, commit the cursor of the page right after it
+                    # a delta crawl only commits at the end, until then the state still points to the previous complete crawl
+                    with metrics.time('csv_write'):
+                        file_offset = sink.write(df)
+                    if seen is not None:
+                        seen.add(df)
+                    # the ids go to the index before the cursor, a crash in between only leaves ids past the committed offset, cut on resume
+                    if file_offset is not None and seen is not None:
+                        seen.commit(file_offset)
+                    if file_offset is not None and not delta:
+                        with metrics.time('state_commit'):
+                            self.state.commit(project_id, next_page_id, filepath_num, num_rows, file_offset, max_donation_id=max_id)
                 
-            except:
-                attempt += 1
-                # debuggers to see which files went to error
-                with open(f'{save_path}donorsinfo_individual_{project_id}/log_donorsinfo.txt', 'a') as fh:
-                    print(f'Attempt {attempt}: error when reading {project_id} at the page of {current_page_id}', file=fh)
-                pass
+                    print('succesfully read ' + project_id + ' at the page of ' + current_page_id, file=log)
+                    page_seconds = metrics.clock() - page_start
+                    metrics.observe('page', page_seconds)
+                    metrics.inc('pages')
+                    metrics.inc('rows', len(df))
+                    metrics.inc('duplicates', num_read - len(df))
+                    metrics.event('page', scraper='donors', project_id=project_id, cursor=current_page_id, rows=len(df), 
+                                  duplicates=num_read - len(df), seconds=round(page_seconds, 6))
+
+                    # reset attempt counter if we successfully read the donors info at that page
+                    attempt = 0
                 
-        filepath = Path(save_path + 'donorsinfo_appended_' + project_id + '.csv')  
-        filepath.parent.mkdir(parents=True, exist_ok=True)  
-        df_appended.to_csv(filepath, index=False)
+                except Exception as e:
+                    attempt += 1
+                    kind = classify(e)
+                    print(f'Attempt {attempt}: {kind} error when reading {project_id} at the page of {current_page_id}: {e!r}', file=log)
+                    metrics.inc('errors_' + kind)
+                    metrics.event('error', scraper='donors', project_id=project_id, cursor=next_page_id, attempt=attempt, kind=kind, error=repr(e))
+
+                    # e.g. the project doesn't exist anymore, retrying won't help
+                    if kind == PERMANENT or attempt >= max_attempts:
+                        break
+                    metrics.inc('retries')
+                    if self.governor is not None:
+                        self.governor.backoff(page_url, attempt, e)
+
+        file_offset = sink.close()
+        if seen is not None:
+            seen.commit(file_offset)
+        status = 'done' if next_page_id == '' else 'failed'
+        if not delta or status == 'done':
+            self.state.commit(project_id, next_page_id, filepath_num, num_rows, file_offset, status, max_id)
+        if status == 'done' and self.store is not None:
+            self._publish(project_id, sink_path, publish_from)
+
+        return {'project_id': project_id, 'pages': filepath_num, 'rows': num_rows, 'duplicates': seen.duplicates if seen is not None else 0,
+                'duplicate_rate': round(seen.duplicate_rate, 6) if seen is not None else 0.0, 'completed': next_page_id == ''}
 
 
+    def _publish(self, project_id, sink_path, publish_from):
+        '''
+        Publish the donors of a completed crawl to the data lake. A delta crawl only adds its new donations to today's
+        partition, any other crawl replaces all the partitions of the project with the whole appended file.
+        '''
+        if publish_from == 0:
+            self.store.drop_partition('donors', short_url=project_id)
+        self.store.write_donors_csv(sink_path, project_id, datetime.now().strftime("%Y-%m-%d"), start_offset=publish_from)
+
 if __name__ == '__main__':
     # only for testing purpose, change the project_id accordingly
     project_id = 'sehatisyawaljumatbaik'
@@ -0,0 +1,122 @@
+import json
+from contextlib import nullcontext
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# user agent to avoid the web incorrectly read the user agent as a headless browser
+USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/60.0.3112.50 Safari/537.36'
+
+
+def _timer(metrics, stage):
+    return metrics.time(stage) if metrics is not None else nullcontext()
+
+
+class HttpFetcher:
+    '''
+    Fetch backend that calls Kitabisa endpoints directly through a pooled keep-alive HTTP session.
+
+    Args:
+        pool_size (int, optional): Number of keep-alive connections kept per host. Defaults to 10.
+        timeout (float, optional): Timeout in seconds for every request. Defaults to 30.
+        user_agent (str, optional): User agent sent with every request. Defaults to USER_AGENT.
+        metrics (RunMetrics, optional): Records the latency of the requests and of the json decoding, and the bytes fetched. Defaults to None.
+    '''
+
+    def __init__(self, pool_size=10, timeout=30, user_agent=USER_AGENT, metrics=None):
+        self.timeout = timeout
+        self.metrics = metrics
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': user_agent, 'Accept': 'application/json, text/html'})
+
+        # reuse the tcp connections between pages instead of opening a new one for every request
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get_text(self, url):
+        '''
+        Fetch the raw body of a page.
+
+        Args:
+            url (str): The URL to fetch.
+
+        Returns:
+            str: The body of the response.
+        '''
+        with _timer(self.metrics, 'fetch'):
+            response = self.session.get(url, timeout=self.timeout)
+        if self.metrics is not None:
+            self.metrics.inc('bytes', len(response.content))
+        response.raise_for_status()
+        return response.text
+
+    def get_json_text(self, url):
+        '''
+        Fetch the raw body of a JSON endpoint, without decoding it, e.g. to cache it as it came.
+        '''
+        return self.get_text(url)
+
+    def get_json(self, url):
+        '''
+        Fetch a JSON endpoint and decode it.
+
+        Args:
+            url (str): The URL to fetch.
+
+        Returns:
+            dict: The decoded JSON body.
+        '''
+        text = self.get_json_text(url)
+        with _timer(self.metrics, 'json_decode'):
+            return json.loads(text)
+
+    def close(self):
+        self.session.close()
+
+
+class SeleniumFetcher:
+    '''
+    Fetch backend that loads pages through a Selenium WebDriver, kept as a fallback for the HTTP backend.
+
+    Args:
+        driver: The Selenium WebDriver object used to load the pages.
+        metrics (RunMetrics, optional): Records the latency of the navigation, of reading the page back and of the json decoding,
+                                        and the bytes read. Defaults to None.
+    '''
+
+    def __init__(self, driver, metrics=None):
+        self.driver = driver
+        self.metrics = metrics
+
+    def get_text(self, url):
+        with _timer(self.metrics, 'navigate'):
+            self.driver.get(url)
+        with _timer(self.metrics, 'page_source'):
+            content = self.driver.page_source
+        self._count_bytes(content)
+        return content
+
+    def get_json_text(self, url):
+        from selenium.webdriver.common.by import By
+
+        # the browser wraps the json body with html, so read it back from the view-source page
+        with _timer(self.metrics, 'navigate'):
+            self.driver.get('view-source:' + url)
+        with _timer(self.metrics, 'page_source'):
+            content = self.driver.find_element(By.CLASS_NAME, 'line-content').text
+        self._count_bytes(content)
+        return content
+
+    def get_json(self, url):
+        content = self.get_json_text(url)
+        with _timer(self.metrics, 'json_decode'):
+            return json.loads(content)
+
+    def _count_bytes(self, content):
+        if self.metrics is not None:
+            self.metrics.inc('bytes', len(content.encode()))
+
+    def close(self):
+        self.driver.quit()
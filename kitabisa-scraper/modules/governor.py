@@ -0,0 +1,267 @@
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+
+# how a failed request is handled
+# throttled: the site asks us to slow down, transient: worth retrying, parse: the page came back broken, permanent: retrying won't help
+THROTTLED, TRANSIENT, PARSE, PERMANENT = 'throttled', 'transient', 'parse', 'permanent'
+
+# what the rate limiter or the bot protection in front of kitabisa puts in the page of a 403 it answers instead of a 429
+CHALLENGE_MARKERS = ('rate limit', 'too many requests', 'captcha', 'cf-chl', 'just a moment', 'attention required')
+
+
+def _is_challenge(response):
+    # a forbidden or removed page is a plain 403, a throttled request carries a Retry-After or a challenge page
+    if 'Retry-After' in response.headers or response.headers.get('cf-mitigated') == 'challenge':
+        return True
+    try:
+        body = response.text[:4096].lower()
+    except Exception:
+        return False
+    return any(marker in body for marker in CHALLENGE_MARKERS)
+
+
+def classify(error):
+    '''
+    Classify the failure of a request.
+
+    Args:
+        error (Exception): The exception raised by the fetch backend or while parsing the response.
+
+    Returns:
+        str: THROTTLED, TRANSIENT, PARSE or PERMANENT.
+    '''
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        # kitabisa answers 403 instead of 429 once it flags us as a bot, with a challenge page instead of the campaign
+        if status == 429 or (status == 403 and _is_challenge(error.response)):
+            return THROTTLED
+        if status == 408 or status >= 500:
+            return TRANSIENT
+        return PERMANENT
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return TRANSIENT
+    # a driver error can only come up once a driver was started, so selenium isn't imported for the http engine
+    selenium_exceptions = sys.modules.get('selenium.common.exceptions')
+    if selenium_exceptions is not None and isinstance(error, selenium_exceptions.WebDriverException):
+        return TRANSIENT
+    if isinstance(error, (ValueError, KeyError, IndexError, TypeError)):
+        # json.JSONDecodeError is a ValueError
+        return PARSE
+    if isinstance(error, LookupError):
+        # missing from the cache while offline
+        return PERMANENT
+    return TRANSIENT
+
+
+def retry_after(error):
+    '''
+    Return the number of seconds the server asked us to wait in its Retry-After header, or None.
+    '''
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+class _HostState:
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.tokens = burst
+        self.updated = now
+        self.latency = None
+        self.consecutive_failures = 0
+        self.open_until = 0
+        self.stats = {'requests': 0, 'succeeded': 0, THROTTLED: 0, TRANSIENT: 0, PARSE: 0, PERMANENT: 0,
+                      'circuit_opened': 0, 'waited_s': 0.0}
+
+
+class RequestGovernor:
+    '''
+    Shared request governor of the scrapers, pacing the requests of every host.
+
+    Every host gets a token bucket whose rate adapts to what we observe: it grows step by step while the
+    responses come back fast, and is cut when the latency climbs or the site throttles us (additive increase,
+    multiplicative decrease). Failed requests are classified and retried after an exponential backoff with
+    jitter, and a host failing failure_threshold times in a row is paused for cooldown seconds.
+
+    Args:
+        rate (float, optional): Starting rate in requests per second per host. Defaults to 2.
+        min_rate (float, optional): Lowest rate the bucket slows down to. Defaults to 0.2.
+        max_rate (float, optional): Highest rate the bucket speeds up to. Defaults to 20.
+        burst (float, optional): Capacity of the bucket, how many requests can go out at once. Defaults to 4.
+        target_latency (float, optional): Latency in seconds above which we stop speeding up and slow down. Defaults to 2.
+        backoff_base (float, optional): Backoff of the first retry in seconds, doubled on every attempt. Defaults to 1.
+        backoff_cap (float, optional): Longest backoff in seconds. Defaults to 60.
+        failure_threshold (int, optional): Consecutive failures of a host before its circuit opens. Defaults to 5.
+        cooldown (float, optional): How long an open circuit pauses the host, in seconds. Defaults to 60.
+        clock (callable, optional): Monotonic clock. Defaults to time.monotonic.
+        sleep (callable, optional): Function to wait with. Defaults to time.sleep.
+        rng (random.Random, optional): Source of the jitter. Defaults to a new random.Random().
+    '''
+
+    def __init__(self, rate=2, min_rate=0.2, max_rate=20, burst=4, target_latency=2, backoff_base=1, backoff_cap=60,
+                 failure_threshold=5, cooldown=60, clock=time.monotonic, sleep=time.sleep, rng=None):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.target_latency = target_latency
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.sleep = sleep
+        self.rng = rng if rng is not None else random.Random()
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, url):
+        host = urlparse(url).netloc
+        if host not in self._hosts:
+            self._hosts[host] = _HostState(self.rate, self.burst, self.clock())
+        return self._hosts[host]
+
+    def _wait(self, state, seconds):
+        with self._lock:
+            state.stats['waited_s'] += seconds
+        self.sleep(seconds)
+
+    def acquire(self, url):
+        '''
+        Block until a request to the host of the URL is allowed: its circuit is closed and its bucket has a token.
+        '''
+        while True:
+            with self._lock:
+                state = self._host(url)
+                now = self.clock()
+
+                if now < state.open_until:
+                    wait = state.open_until - now
+                else:
+                    state.tokens = min(self.burst, state.tokens + (now - state.updated) * state.rate)
+                    state.updated = now
+                    if state.tokens >= 1:
+                        state.tokens -= 1
+                        state.stats['requests'] += 1
+                        return
+                    wait = (1 - state.tokens) / state.rate
+
+            self._wait(state, wait)
+
+    def record(self, url, latency=None, error=None):
+        '''
+        Adapt the rate of the host to the outcome of a request.
+
+        Args:
+            url (str): The URL requested.
+            latency (float, optional): How long the request took, in seconds. Defaults to None.
+            error (Exception, optional): The failure of the request, None if it succeeded. Defaults to None.
+
+        Returns:
+            str: The class of the failure, or None if it succeeded.
+        '''
+        kind = classify(error) if error is not None else None
+
+        with self._lock:
+            state = self._host(url)
+
+            if kind is None:
+                state.stats['succeeded'] += 1
+                state.consecutive_failures = 0
+                if latency is not None:
+                    state.latency = latency if state.latency is None else 0.8 * state.latency + 0.2 * latency
+                if state.latency is not None and state.latency > self.target_latency:
+                    state.rate = max(self.min_rate, state.rate * 0.9)
+                else:
+                    state.rate = min(self.max_rate, state.rate + 0.1 * self.rate)
+                return None
+
+            state.stats[kind] += 1
+            if kind == THROTTLED:
+                state.rate = max(self.min_rate, state.rate / 2)
+            elif kind == TRANSIENT:
+                state.rate = max(self.min_rate, state.rate * 0.8)
+
+            # a broken page or a missing one says nothing about the health of the host
+            if kind in (THROTTLED, TRANSIENT):
+                state.consecutive_failures += 1
+                if state.consecutive_failures >= self.failure_threshold:
+                    # stays one failure away from opening again, so the first request after the pause is a probe
+                    state.consecutive_failures = self.failure_threshold - 1
+                    state.open_until = self.clock() + self.cooldown
+                    state.stats['circuit_opened'] += 1
+
+        return kind
+
+    def backoff(self, url, attempt, error=None):
+        '''
+        Wait before retrying a failed request, exponentially longer on every attempt and with full jitter,
+        or for as long as the server asked in its Retry-After header.
+
+        Args:
+            url (str): The URL that failed.
+            attempt (int): How many times in a row it failed, starting at 1.
+            error (Exception, optional): The failure. Defaults to None.
+        '''
+        wait = retry_after(error) if error is not None else None
+        if wait is None:
+            wait = self.rng.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** (attempt - 1)))
+        with self._lock:
+            state = self._host(url)
+        self._wait(state, wait)
+
+    def stats(self):
+        '''
+        Return the current rate, smoothed latency and counters of every host, e.g. to log them as metrics.
+        '''
+        with self._lock:
+            return {host: dict(state.stats, rate=round(state.rate, 3), latency_s=state.latency,
+                               circuit_open=self.clock() < state.open_until)
+                    for host, state in self._hosts.items()}
+
+
+class GovernedFetcher:
+    '''
+    Wrap a fetch backend so every request goes through the request governor.
+
+    Args:
+        fetcher: The fetch backend to wrap, e.g. HttpFetcher.
+        governor (RequestGovernor): The governor pacing the requests.
+    '''
+
+    def __init__(self, fetcher, governor):
+        self.fetcher = fetcher
+        self.governor = governor
+
+    def _call(self, url, func):
+        self.governor.acquire(url)
+        start = time.perf_counter()
+        try:
+            result = func(url)
+        except Exception as e:
+            self.governor.record(url, time.perf_counter() - start, e)
+            raise
+        self.governor.record(url, time.perf_counter() - start)
+        return result
+
+    def get_text(self, url):
+        return self._call(url, self.fetcher.get_text)
+
+    def get_json_text(self, url):
+        return self._call(url, self.fetcher.get_json_text)
+
+    def get_json(self, url):
+        return self._call(url, self.fetcher.get_json)
+
+    def close(self):
+        self.fetcher.close()
@@ -0,0 +1,264 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+# upper bounds of the latency buckets, in seconds, from a parsed page to a slow browser navigation
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    '''
+    Latency histogram with fixed, cumulative buckets (as Prometheus exposes them).
+
+    Args:
+        buckets (tuple, optional): Sorted upper bounds of the buckets, in seconds. Defaults to LATENCY_BUCKETS.
+    '''
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        '''
+        Estimate a quantile by interpolating linearly within the bucket it falls into.
+        '''
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen, lower = 0, 0.0
+        for upper, count in zip(self.buckets + (self.max,), self.counts):
+            if count and seen + count >= rank:
+                return lower + (min(upper, self.max) - lower) * (rank - seen) / count
+            seen += count
+            lower = upper
+        return self.max
+
+    def summary(self):
+        return {'count': self.count, 'sum_s': round(self.sum, 6), 'mean_s': round(self.sum / self.count, 6) if self.count else None,
+                'p50_s': _round(self.quantile(0.5)), 'p95_s': _round(self.quantile(0.95)), 'max_s': round(self.max, 6)}
+
+
+def _round(value):
+    return None if value is None else round(value, 6)
+
+
+def _rss_of(pid):
+    # resident memory of a process in bytes, read from /proc so it works without any extra dependency
+    with open(f'/proc/{pid}/status') as fh:
+        for line in fh:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def _children_of(pid):
+    children = []
+    for task in os.listdir(f'/proc/{pid}/task'):
+        try:
+            with open(f'/proc/{pid}/task/{task}/children') as fh:
+                children.extend(int(child) for child in fh.read().split())
+        except OSError:
+            continue
+    return children
+
+
+def driver_memory(driver):
+    '''
+    Return the resident memory of a Chrome WebDriver in bytes: chromedriver and every browser process it started.
+
+    Args:
+        driver: The Selenium WebDriver object.
+
+    Returns:
+        int: The memory in bytes, or None if it can't be measured (e.g. outside of Linux).
+    '''
+    try:
+        pids = [driver.service.process.pid]
+        total = 0
+        while pids:
+            pid = pids.pop()
+            total += _rss_of(pid)
+            pids.extend(_children_of(pid))
+        return total
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def peak_rss():
+    '''
+    Return the peak resident memory of the current process in bytes.
+    '''
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kilobytes, macos bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class RunMetrics:
+    '''
+    Metrics of a scraping run, shared by every thread of the scrapers.
+
+    Records a latency histogram per stage (e.g. fetch, json_normalize, csv_write), counters (pages, rows, bytes,
+    retries, errors) and gauges (driver memory). Events are kept in a buffer and appended to a JSON lines log
+    every `buffer_size` events, and every flush also rewrites a Prometheus text file with the current values.
+
+    Args:
+        log_path (str, optional): JSON lines file the events are appended to. Defaults to None, keeping no events.
+        prom_path (str, optional): Prometheus text file rewritten on every flush. Defaults to None.
+        buffer_size (int, optional): Number of events buffered before they are written. Defaults to 500.
+        prefix (str, optional): Prefix of the Prometheus metric names. Defaults to 'kitabisa_scraper'.
+        labels (dict, optional): Labels added to every Prometheus metric, e.g. {'project_id': 'bantuwarga'}. Defaults to None.
+        clock (callable, optional): Clock the stages are timed with. Defaults to time.perf_counter.
+    '''
+
+    def __init__(self, log_path=None, prom_path=None, buffer_size=500, prefix='kitabisa_scraper', labels=None, clock=time.perf_counter):
+        self.log_path = log_path
+        self.prom_path = prom_path
+        self.buffer_size = buffer_size
+        self.prefix = prefix
+        self.labels = dict(labels or {})
+        self.clock = clock
+        self.started = clock()
+        self.stages = {}
+        self.counters = {}
+        self.gauges = {}
+        self._events = []
+        self._log = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            if stage not in self.stages:
+                self.stages[stage] = Histogram()
+            self.stages[stage].observe(seconds)
+
+    @contextmanager
+    def time(self, stage):
+        '''
+        Time the body of a 'with' statement as one observation of the stage, failed or not.
+        '''
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.observe(stage, self.clock() - start)
+
+    def inc(self, counter, value=1):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def set(self, gauge, value):
+        '''
+        Set a gauge, also keeping its highest value under `<gauge>_max`.
+        '''
+        if value is None:
+            return
+        with self._lock:
+            self.gauges[gauge] = value
+            self.gauges[gauge + '_max'] = max(value, self.gauges.get(gauge + '_max', value))
+
+    def event(self, name, **fields):
+        '''
+        Add a structured event to the log buffer, e.g. event('page', project_id='bantuwarga', cursor='page_1', rows=10).
+        '''
+        if self.log_path is None:
+            return
+        fields = dict(ts=round(time.time(), 3), event=name, **fields)
+        with self._lock:
+            self._events.append(fields)
+            full = len(self._events) >= self.buffer_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        '''
+        Write the buffered events to the log and rewrite the Prometheus text file.
+        '''
+        # the events are taken under the lock, but written outside of it so the scraping threads don't wait for the disk
+        with self._lock:
+            events, self._events = self._events, []
+
+        with self._write_lock:
+            if events:
+                if self._log is None:
+                    Path(self.log_path).parent.mkdir(parents=True, exist_ok=True)
+                    self._log = open(self.log_path, 'a')
+                self._log.write(''.join(json.dumps(e, default=str) + '\n' for e in events))
+                self._log.flush()
+
+            if self.prom_path is not None:
+                # write next to the file first, so a scraper of the textfile never reads half of it
+                path = Path(self.prom_path)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_name(path.name + '.tmp')
+                tmp_path.write_text(self.to_prometheus())
+                tmp_path.replace(path)
+
+    def close(self):
+        self.flush()
+        with self._write_lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+    def summary(self):
+        '''
+        Summarize the run, e.g. for the materialization metadata: elapsed time, pages per second, counters, gauges
+        and the count, mean, p50, p95 and max latency of every stage.
+        '''
+        elapsed = self.clock() - self.started
+        with self._lock:
+            pages = self.counters.get('pages', 0)
+            return {'elapsed_s': round(elapsed, 3),
+                    'pages_per_s': round(pages / elapsed, 3) if elapsed > 0 else None,
+                    'counters': dict(self.counters),
+                    'gauges': dict(self.gauges),
+                    'stages': {stage: histogram.summary() for stage, histogram in self.stages.items()}}
+
+    def to_prometheus(self):
+        '''
+        Render the metrics in the Prometheus text exposition format.
+        '''
+        def labels(**extra):
+            pairs = dict(self.labels, **extra)
+            return '{' + ','.join(f'{k}="{v}"' for k, v in pairs.items()) + '}' if pairs else ''
+
+        name = self.prefix + '_stage_seconds'
+        lines = [f'# TYPE {name} histogram']
+        with self._lock:
+            for stage, histogram in sorted(self.stages.items()):
+                cumulative = 0
+                for upper, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{labels(stage=stage, le=upper)} {cumulative}')
+                lines.append(f'{name}_sum{labels(stage=stage)} {histogram.sum}')
+                lines.append(f'{name}_count{labels(stage=stage)} {histogram.count}')
+            for counter, value in sorted(self.counters.items()):
+                lines += [f'# TYPE {self.prefix}_{counter}_total counter', f'{self.prefix}_{counter}_total{labels()} {value}']
+            for gauge, value in sorted(self.gauges.items()):
+                lines += [f'# TYPE {self.prefix}_{gauge} gauge', f'{self.prefix}_{gauge}{labels()} {value}']
+        return '\n'.join(lines) + '\n'
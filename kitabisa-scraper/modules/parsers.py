@@ -0,0 +1,129 @@
+import json
+
+import lxml.html
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the standard library decoder is only slower
+    orjson = None
+
+
+# change this accordingly later based on the dynamics of Kitabisa
+# (tag, class attribute) of every field inside a campaign card of the explore listing
+PROJECT_CARD_FIELDS = {
+    'project_org': ('div', 'my-[0.25em] mx-[0em] flex w-full items-center align-middle text-xs text-[rgba(0,0,0,0.9)]'),
+    'project_name': ('span', 'my-[0.25em] mx-[0em] overflow-hidden break-words text-sm font-semibold text-tundora'),
+    'donation_received': ('div', 'flex flex-col'),
+    'days_to_go': ('div', 'flex flex-col text-right'),
+}
+
+PROJECT_LIST_COLUMNS = ['short_url', 'project_org', 'project_name', 'donation_received', 'days_to_go']
+
+
+def _find_card(link, max_depth=6):
+    '''
+    Return the element holding the whole campaign card of a link: the link itself if it wraps the card,
+    otherwise its closest ancestor that holds the card's name.
+    '''
+    tag, class_name = PROJECT_CARD_FIELDS['project_name']
+    element = link
+    for _ in range(max_depth):
+        if element is None:
+            break
+        if any(el.get('class') == class_name for el in element.iter(tag)):
+            return element
+        element = element.getparent()
+    return link
+
+
+def parse_project_cards(content):
+    '''
+    Parse the campaign cards of the explore listing, walking the page once with lxml.
+
+    Every field is read from inside its own card, so a card with a missing field only leaves
+    that cell empty instead of shifting the following rows.
+
+    Args:
+    - content (str): The HTML of the explore listing, after scrolling.
+
+    Returns:
+    - pd.DataFrame: One row per campaign card, with the columns of PROJECT_LIST_COLUMNS.
+    '''
+    tree = lxml.html.fromstring(content)
+    records = {}
+
+    for link in tree.iter('a'):
+        href = link.get('href') or ''
+        if 'campaign/' not in href:
+            continue
+
+        # a card can hold more than one link to its campaign, e.g. an image-only link and a link wrapping the name,
+        # and the name link is then taken for the card, so the links are merged on their campaign instead of their card
+        short_url = href.split('campaign/')[1].split('?')[0].split('#')[0].strip('/')
+        record = records.setdefault(short_url, dict(dict.fromkeys(PROJECT_LIST_COLUMNS), short_url=short_url))
+        for element in _find_card(link).iter('div', 'span'):
+            class_name = element.get('class')
+            for field, (tag, field_class) in PROJECT_CARD_FIELDS.items():
+                if record[field] is None and element.tag == tag and class_name == field_class:
+                    record[field] = element.text_content()
+
+    for record in records.values():
+        if record['donation_received'] is not None:
+            record['donation_received'] = record['donation_received'].replace('TerkumpulRp', '').replace('TersediaRp', '').replace('.', '')
+        if record['days_to_go'] is not None:
+            record['days_to_go'] = record['days_to_go'].replace('Sisa hari', '')
+
+    return pd.DataFrame.from_records(list(records.values()), columns=PROJECT_LIST_COLUMNS)
+
+
+# fields of `dataCampaigns` we actually use downstream, nested fields are joined with a dot like pd.json_normalize does
+CAMPAIGN_FIELDS = ['id', 'title', 'short_url', 'is_forever_running', 'is_open_goal', 'donation_received', 'donation_count',
+                   'donation_target', 'donation_percentage', 'campaign_start', 'campaign_end', 'campaign_last_update',
+                   'days_remaining', 'is_open_for_donation', 'is_verified', 'campaigner.type', 'category.name']
+
+
+def extract_next_data(content):
+    '''
+    Pull the `__NEXT_DATA__` JSON payload out of the raw HTML of a page and decode it.
+
+    Args:
+    - content (str): The raw HTML of the page.
+
+    Returns:
+    - dict: The decoded payload.
+    '''
+    marker = content.find('id="__NEXT_DATA__"')
+    if marker == -1:
+        raise ValueError("The page has no __NEXT_DATA__ script.")
+
+    start = content.index('>', marker) + 1
+    end = content.index('</script>', start)
+    payload = content[start:end]
+
+    return orjson.loads(payload) if orjson is not None else json.loads(payload)
+
+
+def extract_campaign(content, fields=CAMPAIGN_FIELDS):
+    '''
+    Extract the campaign properties from the raw HTML of a campaign page.
+
+    Args:
+    - content (str): The raw HTML of the campaign page.
+    - fields (list, optional): The fields to keep, nested fields are joined with a dot. Defaults to CAMPAIGN_FIELDS.
+
+    Returns:
+    - dict: One flat record holding only the given fields.
+    '''
+    json_format = extract_next_data(content)
+
+    # BEWARE: json_format hierarchical structure might change over time, always check
+    campaign = json_format['props']['pageProps']['dehydratedState']['queries'][0]['state']['data']['dataCampaigns']
+
+    record = {}
+    for field in fields:
+        value = campaign
+        for key in field.split('.'):
+            value = value.get(key) if isinstance(value, dict) else None
+        record[field] = value
+    return record
@@ -1,210 +1,357 @@
 import pandas as pd
-import json
 import time
 import os
 import math
 from datetime import datetime
 from pathlib import Path  
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from bs4 import BeautifulSoup
+from modules.browser import new_driver, BrowserManager, BrowserFetcher
+from modules.fetchers import HttpFetcher
+from modules.cache import CachedFetcher
+from modules.governor import GovernedFetcher, classify, PERMANENT
+from modules.parsers import parse_project_cards, extract_campaign, PROJECT_LIST_COLUMNS, CAMPAIGN_FIELDS
+from modules.storage import read_frame
+from modules.snapshots import SnapshotStore
+from modules.metrics import RunMetrics, driver_memory
 
 
 class Scraper:
     '''
-    A class to scrape projects data from Kitabisa homepage using Selenium and BeautifulSoup.
+    A class to scrape projects data from Kitabisa homepage using Selenium and lxml.
 
     Attributes:
     - url (str): The URL of the website to scrape.
     - num_scroll (int): The number of times to scroll the page to load all content.
     - save_path (str): The file path to save the scraped data.
-    - driver: The Selenium WebDriver object for interacting with the website.
+    - driver_projectlist: The Selenium WebDriver object scrolling the explore listing, while it's being read.
+    - browser (BrowserManager): The warm drivers reading the listing and, with the 'selenium' engine, the project pages.
+    - fetcher (HttpFetcher): The http session reading the project pages with the 'http' engine.
     '''
 
-    def __init__(self, save_path):
+    def __init__(self, save_path, pool_size=1, recycle_after=200, engine='http', base_url='https://kitabisa.com', cache=None, offline=False,
+                 store=None, governor=None, metrics=None, browser=None, headless_listing=True, snapshots=None):
         '''
         Initialize the Scraper object with the given URL, number of scrolls, and file path.
 
         Args:
         - save_path (str): The file path to save the scraped data.
+        - pool_size (int, optional): Number of connections or headless drivers reading the project pages in parallel. Defaults to 1.
+        - recycle_after (int, optional): Number of pages a driver reads before it gets restarted, when the scraper starts its own drivers. Defaults to 200.
+        - engine (str, optional): How to read the project pages, 'http' to fetch the raw html directly or 'selenium' to use the driver pool. Defaults to 'http'.
+        - base_url (str, optional): Root URL of the campaign pages, change it to point the scraper to a local stand-in server. Defaults to 'https://kitabisa.com'.
+        - cache (ResponseCache, optional): Cache of the raw campaign pages, read while they're fresh and filled after every fetch. Defaults to None.
+        - offline (bool, optional): Whether to only read the campaign pages from the cache, to re-parse them without the network. Defaults to False.
+        - store (ParquetStore, optional): Data lake to save the snapshots to as Parquet partitions instead of timestamped CSV files. Defaults to None.
+        - governor (RequestGovernor, optional): Paces the requests for the project pages and backs off before retrying one. Defaults to None.
+        - metrics (RunMetrics, optional): Records the latency of every stage, the pages, bytes and retries, and the driver memory. Defaults to None, keeping them in memory only.
+        - browser (BrowserManager, optional): Warm drivers shared with other scrapers, e.g. shared_browser(). Defaults to None, starting 
+                                              drivers of its own when they're needed and quitting them on exit.
+        - headless_listing (bool, optional): Whether to read the explore listing with a headless driver of the browser manager, 
+                                             instead of a visible chrome window of its own. Defaults to True.
+        - snapshots (SnapshotStore, optional): Change-data-capture store the project properties are recorded to, only keeping the fields
+                                               that changed since the previous run, instead of saving the full project_props snapshot.
+                                               Defaults to None.
         '''
+        if engine not in ('http', 'selenium'):
+            raise ValueError("engine should be either 'http' or 'selenium'.")
+
         self.save_path = save_path
+        self.engine = engine
+        self.base_url = base_url.rstrip('/')
+        self.cache = cache
+        self.offline = offline
+        self.store = store
+        self.governor = governor
+        self.metrics = metrics if metrics is not None else RunMetrics()
+        self.pool_size = pool_size
+        self.recycle_after = recycle_after
+        self.browser = browser
+        self.headless_listing = headless_listing
+        self.snapshots = snapshots
+        self.changes = None
+        self._own_browser = browser is None
         self.driver_projectlist = None
-        self.driver_projectprops = None
+        self.fetcher = None
 
     def __enter__(self):
         '''
-        Enter method to initialize the Selenium WebDriver when used in a 'with' statement.
+        Enter method to initialize the fetch backends when used in a 'with' statement.
         '''
-        # driver for kitabisa homepage -> didn't allow us to read the page with a headless
-        self.driver_projectlist = webdriver.Chrome()
-
-        # driver for projects information -> use headless to fasten the scraping process
-        chrome_options = Options()
-        # hide the chrome ui when running the webdriver
-        chrome_options.add_argument("--headless")  
-        chrome_options.add_argument("--window-size=1920,1080")
-        # user agent to avoid the web incorrectly read the user agent as a headless browser
-        user_agent = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/60.0.3112.50 Safari/537.36' 
-        chrome_options.add_argument(f'user-agent={user_agent}')
-        self.driver_projectprops = webdriver.Chrome(options=chrome_options)
+        # headless drivers for the listing and the projects information, they're only started when used
+        # so reading the project pages with the 'http' engine never launches one
+        if self._own_browser:
+            self.browser = BrowserManager(self.pool_size, self.recycle_after)
+
+        # http session for the pages we can read without rendering them
+        self.fetcher = self._wrap_fetcher(HttpFetcher(pool_size=self.pool_size, metrics=self.metrics))
 
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         '''
-        Exit method to close the Selenium WebDriver when exiting the 'with' statement.
+        Exit method to close the fetch backends when exiting the 'with' statement, a shared browser manager is left running.
+        '''
+        if self._own_browser:
+            self.browser.close()
+        self.fetcher.close()
+        self.metrics.flush()
+
+    def _listing_size(self):
+        '''
+        Return the current height of the listing page and the number of campaign cards loaded so far.
         '''
-        self.driver_projectlist.quit()
-        self.driver_projectprops.quit()
+        return tuple(self.driver_projectlist.execute_script(
+            "return [document.body.scrollHeight, document.querySelectorAll('a[href*=\"campaign/\"]').length];"))
 
-    def projectlist_scrape(self, url, num_scroll):
+    def _load_listing(self, num_scroll, patience, scroll_timeout):
         '''
-        Scrape list of projects data from the homepage using Selenium and BeautifulSoup.
+        Scroll the infinite listing until it stops growing.
+
+        After every scroll we wait until the page height or the number of cards grows, instead of sleeping for a fixed time.
+        Once nothing new showed up for `patience` scrolls in a row, or after `num_scroll` scrolls, we stop.
+
+        Args:
+        - num_scroll (int): The maximum number of times to scroll the page.
+        - patience (int): The number of scrolls in a row without new content before stopping.
+        - scroll_timeout (float): How long to wait for new content after every scroll, in seconds.
+
+        Returns:
+        - int: The number of scrolls done.
+        '''
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        # wait for the first cards instead of a fixed sleep after loading the page
+        WebDriverWait(self.driver_projectlist, scroll_timeout, poll_frequency=0.2).until(lambda d: self._listing_size()[1] > 0)
+
+        size = self._listing_size()
+        stalled = 0
+        i = 0
+
+        while i < num_scroll and stalled < patience:
+            self.driver_projectlist.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            i = i + 1
+            previous = size
+            try:
+                WebDriverWait(self.driver_projectlist, scroll_timeout, poll_frequency=0.2).until(
+                    lambda d: any(new > old for new, old in zip(self._listing_size(), previous)))
+                stalled = 0
+            except TimeoutException:
+                stalled = stalled + 1
+            size = self._listing_size()
+
+        return i
+
+    @contextmanager
+    def _listing_driver(self):
+        '''
+        Lend the driver for the explore listing: a warm headless one from the browser manager, or a visible window
+        started for it only if headless_listing is False.
+        '''
+        if self.headless_listing:
+            with self.browser.lease() as driver:
+                yield driver
+                # leave the listing, its thousands of cards would otherwise stay in the memory of the warm driver
+                driver.get('about:blank')
+        else:
+            driver = new_driver(headless=False)
+            try:
+                yield driver
+            finally:
+                driver.quit()
+
+    def projectlist_scrape(self, url, num_scroll, patience=3, scroll_timeout=5):
+        '''
+        Scrape list of projects data from the homepage using Selenium and lxml.
 
         Args:
         - url (str): The URL of the website to scrape.
-        - num_scroll (int): The number of times to scroll the page to load all content.
+        - num_scroll (int): The maximum number of times to scroll the page to load all content.
+        - patience (int, optional): Stop scrolling once this many scrolls in a row loaded nothing new. Defaults to 3.
+        - scroll_timeout (float, optional): How long to wait for new content after every scroll, in seconds. Defaults to 5.
 
         Returns:
         - df_projects (pd.DataFrame): A DataFrame containing the scraped data.
         '''
-        self.driver_projectlist.get(url)
-        time.sleep(2)
-        scroll_pause_time = 1  
-        screen_height = self.driver_projectlist.execute_script("return window.screen.height;")
-        df_projects = pd.DataFrame()
-        i = 1
-        r = 0
-
-        while True:
-            self.driver_projectlist.execute_script("window.scrollTo(0, {screen_height}*{i});".format(screen_height=screen_height, i=i))
-            i = i + 1
-            time.sleep(scroll_pause_time)
-            scroll_height = self.driver_projectlist.execute_script("return document.body.scrollHeight;")  
-            if i == num_scroll:
-                break 
+        metrics = self.metrics
+        with self._listing_driver() as self.driver_projectlist:
+            with metrics.time('navigate'):
+                self.driver_projectlist.get(url)
+            with metrics.time('scroll'):
+                num_scrolls = self._load_listing(num_scroll, patience, scroll_timeout)
+            with metrics.time('page_source'):
+                content = self.driver_projectlist.page_source
+            metrics.inc('bytes', len(content.encode()))
+            metrics.set('driver_rss_bytes', driver_memory(self.driver_projectlist))
+        self.driver_projectlist = None
 
-        content = self.driver_projectlist.page_source
-    
-        soup = BeautifulSoup(content, "html.parser")
-
-        # change this accordingly later based on the dynamics of Kitabisa
-        div_class_projectorg = 'my-[0.25em] mx-[0em] flex w-full items-center align-middle text-xs text-[rgba(0,0,0,0.9)]'
-        div_class_projectname = 'my-[0.25em] mx-[0em] overflow-hidden break-words text-sm font-semibold text-tundora'
-        div_class_donationreceived = 'flex flex-col'
-        div_class_daystogo = 'flex flex-col text-right'
-
-        # find all the campaign short url and append it to df_donation
-        for don in soup.find_all('a', href=True):
-            # print("Found the campaign index:", don['href'])
-            donation = don['href']
-            if "campaign/" in donation:
-                donation = donation.split("campaign/")[1]
-                df_projects.loc[r, 'short_url'] = donation
-            r = r + 1
-        df_projects.reset_index(drop=True, inplace=True)
-        
-        r = 0
-        # find all the campaign name and append it to df_donation
-        for don in soup.find_all("div", {"class": div_class_projectorg}):
-            don = don.text
-            df_projects.loc[r, 'project_org'] = don
-            r = r + 1
-        
-        r = 0
-        # find all the campaign organizer and append it to df_donation
-        for don in soup.find_all("span", {"class": div_class_projectname}):
-            don = don.text
-            df_projects.loc[r, 'project_name'] = don
-            r = r + 1
-        
-        r = 0
-        # find all the campaign total donation and append it to df_donation
-        for don in soup.find_all("div", {"class": div_class_donationreceived}):
-            don = don.text
-            don = don.replace('TerkumpulRp', '')
-            don = don.replace('TersediaRp', '')
-            don = don.replace('.', '')
-            df_projects.loc[r, 'donation_received'] = don
-            r = r + 1
-        
-        r = 0    
-        # find all the campaign days remaining and append it to df_donation
-        for don in soup.find_all("div", {"class": div_class_daystogo}):
-            don = don.text
-            don = don.replace('Sisa hari', '')
-            df_projects.loc[r, 'days_to_go'] = don
-            r = r + 1
-        
+        # one record per campaign card, built in a single pass over the page
+        with metrics.time('listing_parse'):
+            df_projects = parse_project_cards(content)
+        metrics.inc('listing_cards', len(df_projects))
+        metrics.event('listing', scraper='projects', scrolls=num_scrolls, cards=len(df_projects))
         df_projects['time_scraped'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
+
+        return self._projectlist_save(df_projects)
+
+    def projectlist_fetch(self, api_url, max_pages=500):
+        '''
+        Read the list of projects straight from the data source behind the explore listing, without rendering the page.
+
+        The endpoint is paged the same way as the donors API: every response holds the campaigns in `data`
+        and the cursor of the following page in `next`, which is empty on the last page.
+
+        Args:
+        - api_url (str): The URL of the campaigns listing endpoint.
+        - max_pages (int, optional): The maximum number of pages to read. Defaults to 500.
+
+        Returns:
+        - df_projects (pd.DataFrame): A DataFrame with the same columns as projectlist_scrape().
+        '''
+        separator = '&' if '?' in api_url else '?'
+        records = []
+        next_page_id = None
+
+        for _ in range(max_pages):
+            page_url = api_url if next_page_id is None else api_url + separator + 'next=' + next_page_id
+            data = self.fetcher.get_json(page_url)
+            self.metrics.inc('listing_pages')
+
+            for campaign in data['data']:
+                records.append({
+                    'short_url': campaign.get('short_url'),
+                    'project_org': (campaign.get('campaigner') or {}).get('name'),
+                    'project_name': campaign.get('title'),
+                    'donation_received': campaign.get('donation_received'),
+                    'days_to_go': campaign.get('days_remaining'),
+                })
+
+            next_page_id = data.get('next') or ''
+            if next_page_id == '':
+                break
+
+        df_projects = pd.DataFrame(records, columns=PROJECT_LIST_COLUMNS)
+        df_projects['time_scraped'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        return self._projectlist_save(df_projects)
+
+    def _projectlist_save(self, df_projects):
+        '''
+        Save the list of projects and keep it for the projectprops_scrape() method.
+        '''
         today = str(datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
         self.today = today
         
-        filepath = Path(self.save_path + 'project_list_' + today + '.csv')  
-        filepath.parent.mkdir(parents=True, exist_ok=True)  
-        
         # prepare the project_list for the projectprops_scrape() method
         self.project_list = df_projects['short_url'] 
-        df_projects.to_csv(filepath, index=False)
+        self._snapshot_save(df_projects, 'project_list')
         
         return df_projects
+
+    def _snapshot_save(self, df, name):
+        '''
+        Save a snapshot either into the data lake, partitioned by the scrape date, or as a timestamped CSV file.
+
+        Returns:
+        - Path: The partition folder or the CSV file.
+        '''
+        if self.store is not None:
+            return self.store.write(name, df.assign(scrape_date=self.today[:10]))
+
+        filepath = Path(self.save_path + name + '_' + self.today + '.csv')
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        df.to_csv(filepath, index=False)
+        return filepath
     
 
-    def projectprops_scrape(self):
+    def _wrap_fetcher(self, fetcher):
+        # only the requests that actually go to the network are paced, the cache sits in front of the governor
+        if self.governor is not None:
+            fetcher = GovernedFetcher(fetcher, self.governor)
+        if self.cache is not None:
+            fetcher = CachedFetcher(fetcher, self.cache, self.offline)
+        return fetcher
+
+    def _projectprops_read(self, fetcher, project_id, max_attempts=3):
+        '''
+        Read the information of a single project with the given fetch backend, retrying up to max_attempts times.
+
+        Returns:
+        - dict: The record of the project, or None if the page couldn't be read.
+        '''
+        url = self.base_url + '/campaign/' + project_id
+        metrics = self.metrics
+
+        for attempt in range(1, max_attempts + 1):
+            page_start = metrics.clock()
+            try:
+                content = fetcher.get_text(url)
+
+                # only parse the json from the __NEXT_DATA__ script of the raw html, keeping the fields we use
+                with metrics.time('parse'):
+                    record = extract_campaign(content)
+                record['time_scraped'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+                page_seconds = metrics.clock() - page_start
+                metrics.observe('page', page_seconds)
+                metrics.inc('pages')
+                metrics.event('page', scraper='projects', project_id=project_id, seconds=round(page_seconds, 6))
+                return record
+            
+            except Exception as e:
+                kind = classify(e)
+                metrics.inc('errors_' + kind)
+                metrics.event('error', scraper='projects', project_id=project_id, attempt=attempt, kind=kind, error=repr(e))
+                if kind == PERMANENT or attempt == max_attempts:
+                    return None
+                metrics.inc('retries')
+                if self.governor is not None:
+                    self.governor.backoff(url, attempt, e)
+
+    def projectprops_scrape(self, max_attempts=3):
         '''
         Scrape all information about the projects from a list of projects we got from the homepage.
-        
+
         Args:
-        - donation_list (list): List of donation IDs to scrape.
-        - flpath (str): Path to save the scraped data.
+        - max_attempts (int, optional): How many times to try reading a project page. Defaults to 3.
         
         Returns:
         - pd.DataFrame: DataFrame containing the scraped data.
+        - Path: The file path of the saved CSV file, the partition folder when saving to the data lake, or the database of the snapshot store.
         '''
+        project_list = list(self.project_list)
 
-        df_project_props = pd.DataFrame()
-
-        project_list = self.project_list
-        
-        for project_id in project_list:
-            try:
-                url = 'view-source:https://kitabisa.com/campaign/' + project_id
-            
-                self.driver_projectprops.get(url)
-                content = self.driver_projectprops.page_source
+        # read the projects in parallel, the results come back in the order of project_list
+        # with the 'selenium' engine every page borrows a warm driver, so there are as many threads as drivers
+        if self.engine == 'http':
+            fetcher, num_workers = self.fetcher, self.pool_size
+        else:
+            fetcher, num_workers = self._wrap_fetcher(BrowserFetcher(self.browser, self.metrics)), self.browser.size
 
-                # only parse the json file from the html, the hidden script
-                # start and the end is the html structure from kitabisa to take only the JSON part, adjust based on the dynamics of the changes
-                start = '__NEXT_DATA__</span>" <span class="html-attribute-name">type</span>="<span class="html-attribute-value">application/json</span>"&gt;</span>'
-                end = '<span class="html-tag">&lt;/script&gt;</span><span class="html-tag">'
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            results = list(executor.map(lambda project_id: self._projectprops_read(fetcher, project_id, max_attempts), project_list))
 
-                json_script = content.split(start)[1].split(end)[0]
-                #print(json_script)
-        
-                json_format = json.loads(json_script)
+        df_project_props = pd.DataFrame.from_records([r for r in results if r is not None], columns=CAMPAIGN_FIELDS + ['time_scraped'])
 
-                # BEWARE: json_format hierarchical structure might change over time, always check
-                df = pd.json_normalize(json_format['props']['pageProps']['dehydratedState']['queries'][0]['state']['data']['dataCampaigns'])
-                df['time_scraped'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-                df_project_props = pd.concat([df_project_props, df], ignore_index=True)
-                
-                # debuggers to see which projects we already read
-                with open(f'{self.save_path}log_projectprops.txt', 'a') as fh:
+        # debuggers to see which projects we already read and which went to error
+        with open(f'{self.save_path}log_projectprops.txt', 'a') as fh:
+            for project_id, record in zip(project_list, results):
+                if record is not None:
                     print('succesfully read ' + str(project_id), file=fh)
-            
-            except:
-                # debuggers to see which files went to error
-                with open(f'{self.save_path}log_projectprops.txt', 'a') as fh:
+                else:
                     print('error when reading ' + str(project_id), file=fh)
-                    pass
-                
-        filepath = Path(self.save_path + 'project_props_' + self.today + '.csv')
-        filepath.parent.mkdir(parents=True, exist_ok=True)
-        df_project_props.to_csv(filepath, index=False)
+
+        # most fields of a campaign don't move from one day to the next, the snapshot store only keeps the ones that did,
+        # valid from the start of the run, and the cleaning step and the analysis rebuild the full snapshot from it
+        if self.snapshots is not None:
+            with self.metrics.time('snapshot_record'):
+                self.changes = self.snapshots.record(df_project_props, scraped_at=self.today)
+            self.metrics.inc('changed_fields', self.changes['changed_fields'])
+            filepath = self.snapshots.db_path
+        else:
+            filepath = self._snapshot_save(df_project_props, 'project_props')
         
         return df_project_props, filepath
     
@@ -237,13 +384,29 @@ class ProjectsFinalize:
     A class for finalizing project data by cleaning and filtering.
 
     Parameters:
-    - file_path (str): The path to the CSV file containing project data.
+    - file_path (str, DataFrame or SnapshotStore): The path to the CSV file containing project data, its partition folder in the data lake,
+                                                   the project data itself, or the snapshot store its last run was recorded to.
     - save_path (str): The path to save the cleaned and filtered CSV files.
+    - store (ParquetStore, optional): Data lake to save the cleaned and filtered projects to instead of CSV files. Defaults to None.
+    - timestamp (str, optional): The time of the run that scraped the projects (Scraper.today), naming the saved files like its project_props.
+                                 Defaults to None, taking it from the file name, the partition or the time the first project was scraped.
     '''
 
-    def __init__(self, file_path, save_path):
+    def __init__(self, file_path, save_path, store=None, timestamp=None):
         self.file_path = file_path
         self.save_path = save_path
+        self.store = store
+        self.timestamp = timestamp
+
+    def _save(self, df, name):
+        # same naming as the input: a partition of the scrape date in the data lake, or a timestamped CSV file
+        if self.store is not None:
+            return self.store.write(name, df.assign(scrape_date=self.timestamp_part[:10]))
+
+        filepath = Path(self.save_path + name + '_' + self.timestamp_part + '.csv')
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        df.to_csv(filepath, index=False)
+        return filepath
 
 
     def projects_data_cleaning(self, cols_to_take):
@@ -253,8 +416,15 @@ class ProjectsFinalize:
         Parameters:
         - cols_to_take (list): A list of column names to keep in the cleaned data.
         '''
-        df_projects_cleaned = pd.read_csv(self.file_path)
-        df_projects_cleaned = df_projects_cleaned[cols_to_take].copy(deep=True)
+        # only load the columns we keep
+        if isinstance(self.file_path, SnapshotStore):
+            # the run didn't save a full snapshot, rebuild it from the changes
+            self.file_path = self.file_path.snapshot(self.timestamp, fields=[c for c in cols_to_take if c != 'short_url'])
+
+        if isinstance(self.file_path, pd.DataFrame):
+            df_projects_cleaned = self.file_path[cols_to_take].copy(deep=True)
+        else:
+            df_projects_cleaned = read_frame(self.file_path, columns=cols_to_take)
 
         # calculate days passed since the campaign started
         current_timestamp = int(time.time())
@@ -265,18 +435,29 @@ class ProjectsFinalize:
         df_projects_cleaned['campaign_start'] = df_projects_cleaned['campaign_start'].apply(lambda x: datetime.fromtimestamp(x))
         df_projects_cleaned['campaign_end'] = df_projects_cleaned['campaign_end'].apply(lambda x: datetime.fromtimestamp(x))
 
-        # take the timestamp part of the filename, as it will be used to name our file
-        file_name = os.path.basename(self.file_path)
-        timestamp_part = file_name.split('_')[-1].replace('.csv', '')  
+        # take the time of the run, or else the timestamp part of the filename (or the scrape date of the partition,
+        # or the time the data was scraped), as it will be used to name our file
+        if self.timestamp is not None:
+            timestamp_part = self.timestamp
+        elif isinstance(self.file_path, pd.DataFrame):
+            # no project at all was read, e.g. the listing came back empty, so there's no scrape time to take
+            if len(self.file_path) > 0:
+                timestamp_part = str(self.file_path['time_scraped'].iloc[0])
+            else:
+                timestamp_part = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        else:
+            file_name = os.path.basename(os.path.normpath(self.file_path))
+            if file_name.startswith('scrape_date='):
+                timestamp_part = file_name.split('=')[-1]
+            else:
+                timestamp_part = file_name.split('_')[-1].replace('.csv', '')  
 
-        # save the dataframe to local, for cache
-        filepath = Path(self.save_path + 'project_cleaned_' + timestamp_part + '.csv')
-        filepath.parent.mkdir(parents=True, exist_ok=True)
-        df_projects_cleaned.to_csv(filepath, index=False)
-        
         # container for the variables we'd use again later
         self.timestamp_part = timestamp_part
-        self.projects_cleaned_path = filepath
+
+        # save the dataframe to local, for cache, and keep it for projects_filter()
+        self.projects_cleaned_path = self._save(df_projects_cleaned, 'project_cleaned')
+        self.df_projects_cleaned = df_projects_cleaned
 
 
     def projects_filter(self, donation_pct, dev_mode=False):
@@ -293,7 +474,7 @@ class ProjectsFinalize:
         Returns:
         - df_projects_final (DataFrame): The final filtered DataFrame of projects.
         '''
-        df_projects_final = pd.read_csv(self.projects_cleaned_path)
+        df_projects_final = self.df_projects_cleaned
 
         # criteria list for projects that we want to analyze
         df_projects_final = df_projects_final[df_projects_final['is_forever_running'] == False]
@@ -308,9 +489,7 @@ class ProjectsFinalize:
             raise ValueError("dev_mode should be boolean value.")
 
         # save the final dataframe of our projects list
-        filepath = Path(self.save_path + 'project_final_' + self.timestamp_part + '.csv')
-        filepath.parent.mkdir(parents=True, exist_ok=True)
-        df_projects_final.to_csv(filepath, index=False)
+        filepath = self._save(df_projects_final, 'project_final')
 
         return df_projects_final, filepath
 
@@ -329,7 +508,7 @@ if __name__ == '__main__':
     cols_to_take = ['short_url', 'donation_count', 'donation_received', 'donation_target', 'donation_percentage', 
                     'campaign_start', 'campaign_end', 'days_remaining', 'category.name', 'is_forever_running', 'is_open_goal']
 
-    df_projects_final = ProjectsFinalize(file_path, save_path)
+    df_projects_final = ProjectsFinalize(file_path, save_path, timestamp=scraper.today)
     df_projects_final.projects_data_cleaning(cols_to_take)
 
     df_projects_final = df_projects_final.projects_filter(donation_pct=0.3, dev_mode=True)
@@ -0,0 +1,96 @@
+import os
+from pathlib import Path
+
+import pandas as pd
+
+
+class CsvSink:
+    '''
+    Append-only CSV sink that buffers pages of records and writes them out in bounded batches,
+    so the memory used by a crawl stays flat however many pages it reads.
+
+    Args:
+        filepath (str or Path): The CSV file to write.
+        columns (list, optional): Fixed columns of the file, records are reindexed to them. Defaults to the columns of the first batch.
+        batch_rows (int, optional): Number of buffered rows that triggers a write to disk. Defaults to 500.
+        append (bool, optional): Whether to append to an existing file instead of overwriting it. Defaults to False.
+        truncate_at (int, optional): When appending, first cut the existing file back to this many bytes. Defaults to None.
+    '''
+
+    def __init__(self, filepath, columns=None, batch_rows=500, append=False, truncate_at=None):
+        self.filepath = Path(filepath)
+        self.columns = list(columns) if columns is not None else None
+        self.batch_rows = batch_rows
+        self.rows_written = 0
+        self._buffer = []
+        self._buffered_rows = 0
+
+        self.filepath.parent.mkdir(parents=True, exist_ok=True)
+        if not append and self.filepath.exists():
+            self.filepath.unlink()
+        if append and truncate_at is not None and self.filepath.exists():
+            # drop whatever was written after the last committed offset
+            os.truncate(self.filepath, truncate_at)
+
+        # an existing file already carries the header, keep its columns
+        self._has_header = self.filepath.exists() and self.filepath.stat().st_size > 0
+        if self._has_header and self.columns is None:
+            self.columns = list(pd.read_csv(self.filepath, nrows=0).columns)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, df):
+        '''
+        Buffer a page of records, writing the buffer to disk once it reaches batch_rows.
+
+        Args:
+            df (pd.DataFrame): The records to write.
+
+        Returns:
+            int: Size of the file in bytes if the buffer was written to disk, otherwise None.
+        '''
+        self._buffer.append(df)
+        self._buffered_rows += len(df)
+        if self._buffered_rows >= self.batch_rows:
+            return self.flush()
+        return None
+
+    def flush(self):
+        '''
+        Write all buffered records to disk.
+
+        Returns:
+            int: Size of the file in bytes after the write.
+        '''
+        if self._buffer:
+            df = pd.concat(self._buffer, ignore_index=True)
+            if self.columns is None:
+                self.columns = list(df.columns)
+
+            with open(self.filepath, 'a', newline='') as fh:
+                df.reindex(columns=self.columns).to_csv(fh, index=False, header=not self._has_header)
+                fh.flush()
+                os.fsync(fh.fileno())
+
+            self._has_header = True
+            self.rows_written += len(df)
+            self._buffer = []
+            self._buffered_rows = 0
+
+        return self.filepath.stat().st_size if self.filepath.exists() else 0
+
+    def close(self):
+        '''
+        Write the remaining buffered records.
+
+        Returns:
+            int: Size of the file in bytes.
+        '''
+        offset = self.flush()
+        # leave an (empty) file behind even if nothing was written, it marks the crawl as done
+        self.filepath.touch()
+        return offset
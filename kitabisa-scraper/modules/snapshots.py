@@ -0,0 +1,260 @@
+import json
+import math
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+
+# the progress of a campaign over time, as read by the seed money analysis
+TRAJECTORY_FIELDS = ['donation_received', 'donation_percentage', 'days_remaining']
+
+
+def _ts(when):
+    # timestamps are stored as '%Y-%m-%d %H:%M:%S' strings, like time_scraped, so they compare in time order
+    if when is None:
+        return None
+    return pd.Timestamp(when).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _encode(value):
+    # the values are stored as json, so an int read back from a csv with missing values (5000.0) still equals 5000
+    if hasattr(value, 'item'):
+        value = value.item()
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return 'null'
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, (pd.Timestamp, datetime)):
+        value = _ts(value)
+    return json.dumps(value, ensure_ascii=False)
+
+
+class SnapshotStore:
+    '''
+    Change-data-capture store of the project properties: rather than one more copy of every campaign per run, a campaign only
+    gets a new row for the fields whose value changed since the previous run, valid from the time it was scraped
+    until the time it changed again (valid_to is empty while it's the current value). Next to the changes, every run
+    only keeps the list of the campaigns it read, so the storage grows with the real changes, the full snapshot of a run
+    can still be rebuilt with snapshot(), and the value of a campaign at any point in time is one indexed query away.
+
+    Args:
+        db_path (str or Path): Path to the SQLite database file.
+        fields (list, optional): The fields to track. Defaults to every column of the recorded snapshots but short_url and time_scraped.
+    '''
+
+    def __init__(self, db_path, fields=None):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.fields = fields
+        self._lock = threading.Lock()
+
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS project_history (
+                short_url TEXT NOT NULL,
+                field TEXT NOT NULL,
+                value TEXT NOT NULL,
+                valid_from TEXT NOT NULL,
+                valid_to TEXT,
+                PRIMARY KEY (short_url, field, valid_from)
+            ) WITHOUT ROWID
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS project_history_current ON project_history (short_url, field) WHERE valid_to IS NULL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS project_runs (
+                scraped_at TEXT PRIMARY KEY,
+                short_urls TEXT NOT NULL
+            )
+        ''')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def record(self, df, scraped_at=None):
+        '''
+        Record a snapshot of the project properties, writing only the fields that changed since the previous one.
+
+        Snapshots should be recorded in time order, e.g. when backfilling the old project_props CSV files.
+        A value scraped before the current one of its field is ignored.
+
+        Args:
+            df (pd.DataFrame): One row per campaign, with short_url and the tracked fields, as returned by projectprops_scrape().
+            scraped_at (str or datetime, optional): When the snapshot was scraped, e.g. the start of the run. Defaults to the time_scraped
+                                                    of every row, or now. The run is listed at this time, or at the last time_scraped.
+
+        Returns:
+            dict: The number of campaigns recorded, the new and changed ones, the fields changed and the stale values ignored.
+        '''
+        fields = self.fields or [c for c in df.columns if c not in ('short_url', 'time_scraped')]
+        if scraped_at is not None:
+            times = [_ts(scraped_at)] * len(df)
+        elif 'time_scraped' in df:
+            times = [_ts(t) for t in df['time_scraped']]
+        else:
+            times = [_ts(datetime.now())] * len(df)
+
+        summary = {'campaigns': len(df), 'new_campaigns': 0, 'changed_campaigns': 0, 'changed_fields': 0, 'stale': 0}
+        with self._lock:
+            current = {(s, f): (value, valid_from) for s, f, value, valid_from in
+                       self.conn.execute('SELECT short_url, field, value, valid_from FROM project_history WHERE valid_to IS NULL')}
+
+            self.conn.execute('BEGIN')
+            try:
+                for short_url, at, values in zip(df['short_url'], times, df[fields].itertuples(index=False, name=None)):
+                    new = not any((short_url, f) in current for f in fields)
+                    changed = 0
+                    for field, value in zip(fields, values):
+                        value = _encode(value)
+                        previous = current.get((short_url, field))
+                        if previous is not None and previous[0] == value:
+                            continue
+                        if previous is not None and at < previous[1]:
+                            summary['stale'] += 1
+                            continue
+
+                        if previous is not None and at == previous[1]:
+                            # a rerun of the same snapshot corrects its value
+                            self.conn.execute('UPDATE project_history SET value = ? WHERE short_url = ? AND field = ? AND valid_from = ?',
+                                              (value, short_url, field, at))
+                        else:
+                            if previous is not None:
+                                self.conn.execute('UPDATE project_history SET valid_to = ? WHERE short_url = ? AND field = ? AND valid_from = ?',
+                                                  (at, short_url, field, previous[1]))
+                            self.conn.execute('INSERT INTO project_history VALUES (?, ?, ?, ?, NULL)', (short_url, field, value, at))
+                        current[(short_url, field)] = (value, at)
+                        changed += 1
+
+                    summary['new_campaigns'] += int(new)
+                    summary['changed_campaigns'] += int(changed > 0 and not new)
+                    summary['changed_fields'] += 0 if new else changed
+
+                # the campaigns read by the run, to rebuild its snapshot
+                run_at = _ts(scraped_at) if scraped_at is not None else max(times, default=None)
+                if run_at is not None:
+                    self.conn.execute('INSERT OR REPLACE INTO project_runs VALUES (?, ?)', (run_at, json.dumps(list(df['short_url']))))
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+
+        return summary
+
+    def _select(self, where, params, short_urls, fields):
+        if short_urls is not None:
+            short_urls = list(short_urls)
+            where += f" AND short_url IN ({','.join('?' * len(short_urls))})"
+            params += short_urls
+        if fields is not None:
+            where += f" AND field IN ({','.join('?' * len(fields))})"
+            params += list(fields)
+        with self._lock:
+            return self.conn.execute('SELECT short_url, field, value, valid_from FROM project_history WHERE ' + where, params).fetchall()
+
+    def as_of(self, when=None, short_urls=None, fields=None):
+        '''
+        Return the properties of the campaigns as they were at a point in time.
+
+        Args:
+            when (str or datetime, optional): The point in time, e.g. '2024-04-12 21:31:07'. Defaults to None, the current values.
+            short_urls (list, optional): The campaigns to return. Defaults to all of them.
+            fields (list, optional): The fields to return. Defaults to all of them.
+
+        Returns:
+            pd.DataFrame: One row per campaign known at that time, with short_url and the fields.
+        '''
+        if when is None:
+            rows = self._select('valid_to IS NULL', [], short_urls, fields)
+        else:
+            when = _ts(when)
+            rows = self._select('valid_from <= ? AND (valid_to IS NULL OR valid_to > ?)', [when, when], short_urls, fields)
+
+        records = {}
+        for short_url, field, value, _ in rows:
+            records.setdefault(short_url, {'short_url': short_url})[field] = json.loads(value)
+
+        columns = ['short_url'] + (list(fields) if fields is not None else sorted({f for _, f, _, _ in rows}))
+        df = pd.DataFrame.from_records(list(records.values()), columns=columns)
+        return df.sort_values('short_url', ignore_index=True).infer_objects()
+
+    def snapshot(self, when=None, fields=None):
+        '''
+        Rebuild the full snapshot of a run from the changes: the campaigns it read, with their values at that time.
+
+        Args:
+            when (str or datetime, optional): The time of the run, or a later time to take the last run before it. Defaults to None, the last run.
+            fields (list, optional): The fields to return. Defaults to all of them.
+
+        Returns:
+            pd.DataFrame: One row per campaign read by the run, with short_url, the fields and time_scraped, the time the run was listed at.
+                          Empty if no run was recorded by then.
+        '''
+        with self._lock:
+            if when is None:
+                run = self.conn.execute('SELECT scraped_at, short_urls FROM project_runs ORDER BY scraped_at DESC LIMIT 1').fetchone()
+            else:
+                run = self.conn.execute('SELECT scraped_at, short_urls FROM project_runs WHERE scraped_at <= ? ORDER BY scraped_at DESC LIMIT 1',
+                                        (_ts(when),)).fetchone()
+        if run is None:
+            return pd.DataFrame(columns=['short_url'] + list(fields or []) + ['time_scraped'])
+
+        scraped_at, short_urls = run
+        # the campaigns are filtered here rather than in the query, a run reads more of them than sqlite takes parameters
+        df = self.as_of(scraped_at, fields=fields)
+        df = df[df['short_url'].isin(json.loads(short_urls))].reset_index(drop=True)
+        df['time_scraped'] = scraped_at
+        return df
+
+    def trajectory(self, short_urls=None, fields=TRAJECTORY_FIELDS, start=None, end=None):
+        '''
+        Return how the given fields of the campaigns moved over time, one row every time one of them changed.
+
+        Args:
+            short_urls (list, optional): The campaigns to return. Defaults to all of them.
+            fields (list, optional): The fields to follow. Defaults to TRAJECTORY_FIELDS.
+            start (str or datetime, optional): Start of the period, the values current at that time come first. Defaults to None.
+            end (str or datetime, optional): End of the period, included. Defaults to None.
+
+        Returns:
+            pd.DataFrame: short_url, valid_from and the fields, carrying forward the fields that didn't change,
+                          sorted by campaign and time.
+        '''
+        where, params = '1', []
+        if start is not None:
+            where += ' AND (valid_to IS NULL OR valid_to > ?)'
+            params.append(_ts(start))
+        if end is not None:
+            where += ' AND valid_from <= ?'
+            params.append(_ts(end))
+        rows = self._select(where, params, short_urls, fields)
+
+        df = pd.DataFrame(rows, columns=['short_url', 'field', 'value', 'valid_from'])
+        if start is not None:
+            # a value set before the period is the one it starts with
+            df['valid_from'] = df['valid_from'].clip(lower=_ts(start))
+        df['value'] = df['value'].map(json.loads)
+
+        df = df.pivot(index=['short_url', 'valid_from'], columns='field', values='value').reindex(columns=list(fields))
+        df = df.groupby(level='short_url').ffill().reset_index()
+        df.columns.name = None
+        df['valid_from'] = pd.to_datetime(df['valid_from'], format='%Y-%m-%d %H:%M:%S')
+        return df.infer_objects()
+
+    def stats(self):
+        '''
+        Return the number of campaigns and of rows stored, and how many of them are current.
+        '''
+        with self._lock:
+            campaigns, rows, current = self.conn.execute(
+                'SELECT COUNT(DISTINCT short_url), COUNT(*), SUM(valid_to IS NULL) FROM project_history').fetchone()
+        return {'campaigns': campaigns, 'rows': rows, 'current_rows': current or 0}
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,139 @@
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+
+class CrawlState:
+    '''
+    Small SQLite store that records how far the donors crawl of every project went, so a failed
+    or killed crawl can resume where it stopped instead of starting over from the first page.
+
+    Every commit is a single transaction holding the `next` cursor together with the size of the
+    appended file at that point, so a restart can cut off whatever was written after the last commit.
+
+    It's also the manifest of everything crawled so far: plan() tells which projects still need work
+    with one query on the primary key, instead of scanning the data folder.
+
+    Args:
+        db_path (str or Path): Path to the SQLite database file.
+    '''
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        # the crawler shares a single store between its threads, the lock serializes the access
+        # campaigns crawled in other processes write to the same file, so wait for their transactions to end
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=FULL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS crawl_state (
+                project_id TEXT PRIMARY KEY,
+                next_cursor TEXT NOT NULL,
+                pages INTEGER NOT NULL,
+                rows INTEGER NOT NULL,
+                file_offset INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                max_donation_id INTEGER
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS crawl_state_status ON crawl_state (status, updated_at)')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get(self, project_id):
+        '''
+        Return the last committed state of a project.
+
+        Args:
+            project_id (str): The short name of the project.
+
+        Returns:
+            dict: The state with next_cursor, pages, rows, file_offset, status, updated_at and max_donation_id, or None if the project was never crawled.
+        '''
+        with self._lock:
+            cursor = self.conn.execute('SELECT * FROM crawl_state WHERE project_id = ?', (project_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            return dict(zip([c[0] for c in cursor.description], row))
+
+    def commit(self, project_id, next_cursor, pages, rows, file_offset, status='running', max_donation_id=None):
+        '''
+        Durably record the progress of a project.
+
+        Args:
+            project_id (str): The short name of the project.
+            next_cursor (str): The cursor of the next page to read, '' once the last page was read.
+            pages (int): Number of pages read so far.
+            rows (int): Number of rows written so far.
+            file_offset (int): Size in bytes of the appended file that matches this progress.
+            status (str, optional): 'running', 'failed' or 'done'. Defaults to 'running'.
+            max_donation_id (int, optional): The newest donation id stored for the project. Defaults to None.
+        '''
+        with self._lock:
+            self.conn.execute('''
+                INSERT INTO crawl_state (project_id, next_cursor, pages, rows, file_offset, status, updated_at, max_donation_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(project_id) DO UPDATE SET
+                    next_cursor = excluded.next_cursor, pages = excluded.pages, rows = excluded.rows,
+                    file_offset = excluded.file_offset, status = excluded.status, updated_at = excluded.updated_at,
+                    max_donation_id = excluded.max_donation_id
+            ''', (project_id, next_cursor, pages, rows, file_offset, status, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), max_donation_id))
+
+    def plan(self, project_ids, refresh_after=0):
+        '''
+        Split the given projects by the work they need.
+
+        Args:
+            project_ids (list): The short names of the projects to consider, e.g. the filtered projects of today.
+            refresh_after (float, optional): Only refresh the projects whose last complete crawl is older than this, in hours. Defaults to 0.
+
+        Returns:
+            dict: 'to_read' holds the projects to crawl from the start or resume, the unfinished crawls first,
+                  'to_refresh' holds the projects crawled completely before, the stalest first.
+        '''
+        cutoff = (datetime.now() - timedelta(hours=refresh_after)).strftime("%Y-%m-%d %H:%M:%S")
+
+        with self._lock:
+            self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS candidates (project_id TEXT PRIMARY KEY, position INTEGER NOT NULL)')
+            self.conn.execute('DELETE FROM candidates')
+            self.conn.executemany('INSERT OR IGNORE INTO candidates VALUES (?, ?)', [(p, i) for i, p in enumerate(project_ids)])
+            rows = self.conn.execute('''
+                SELECT c.project_id, s.status, s.updated_at FROM candidates c
+                LEFT JOIN crawl_state s ON s.project_id = c.project_id
+                ORDER BY s.status IS NULL, s.updated_at, c.position
+            ''').fetchall()
+
+        to_read = [p for p, status, _ in rows if status is not None and status != 'done']
+        to_read += [p for p, status, _ in rows if status is None]
+        to_refresh = [p for p, status, updated_at in rows if status == 'done' and updated_at <= cutoff]
+        return {'to_read': to_read, 'to_refresh': to_refresh}
+
+    def unfinished(self):
+        '''
+        Return the projects whose last crawl stopped before the last page, the least recently updated first.
+        '''
+        with self._lock:
+            rows = self.conn.execute("SELECT project_id FROM crawl_state WHERE status != 'done' ORDER BY updated_at").fetchall()
+        return [project_id for project_id, in rows]
+
+    def summary(self):
+        '''
+        Return the number of projects, rows and pages crawled, by status.
+        '''
+        with self._lock:
+            rows = self.conn.execute('SELECT status, COUNT(*), SUM(rows), SUM(pages) FROM crawl_state GROUP BY status').fetchall()
+        return {status: {'projects': n, 'rows': num_rows, 'pages': pages} for status, n, num_rows, pages in rows}
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,188 @@
+import io
+import os
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+# types of the donors table once it lands in the lake, every other column is stored as a string
+DONOR_INT_COLUMNS = ['id', 'amount', 'created', 'expire', 'verified', 'campaign.id', 'user.id', 'status.id',
+                     'invoice.base_donation', 'invoice.unique_code', 'invoice.transaction_fee', 'invoice.total_invoiced']
+DONOR_BOOL_COLUMNS = ['is_anonymous']
+
+
+def read_frame(path, columns=None, filters=None):
+    '''
+    Read a table saved either as a CSV file or as a Parquet file or (partitioned) dataset folder.
+
+    With Parquet only the requested columns are read, and the filters are pushed down to skip whole
+    partitions and row groups. With CSV only the columns are projected.
+
+    Args:
+        path (str or Path): The CSV file, Parquet file or Parquet dataset folder.
+        columns (list, optional): The columns to read. Defaults to all of them.
+        filters (list, optional): pyarrow filters, e.g. [('short_url', 'in', ['a', 'b'])]. Defaults to None.
+
+    Returns:
+        pd.DataFrame: The table.
+    '''
+    path = Path(path)
+    if path.suffix == '.csv':
+        return pd.read_csv(path, usecols=columns)
+    return pq.read_table(path, columns=columns, filters=filters, partitioning='hive').to_pandas()
+
+
+def _with_string_nulls(table):
+    # a column that is entirely empty in one snapshot would be typed as null, which doesn't merge with the others
+    fields = [pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in table.schema]
+    return table.cast(pa.schema(fields))
+
+
+class ParquetStore:
+    '''
+    A small data lake of typed, compressed Parquet datasets, partitioned by scrape date and campaign.
+
+    Every dataset lives in its own folder under root, with hive-style partition folders
+    (e.g. `donors/short_url=bantuwarga/scrape_date=2024-04-12/`).
+
+    Args:
+        root (str or Path): Folder of the data lake.
+        compression (str, optional): Parquet compression codec. Defaults to 'zstd'.
+    '''
+
+    def __init__(self, root, compression='zstd'):
+        self.root = Path(root)
+        self.compression = compression
+
+    def dataset_path(self, dataset):
+        return self.root / dataset
+
+    def partition_path(self, dataset, **partition):
+        path = self.dataset_path(dataset)
+        for column, value in partition.items():
+            path = path / f'{column}={value}'
+        return path
+
+    def write(self, dataset, df, partition_cols=('scrape_date',), replace=True):
+        '''
+        Write a DataFrame into a dataset.
+
+        Args:
+            dataset (str): Name of the dataset, e.g. 'project_props'.
+            df (pd.DataFrame): The rows to write, holding the partition columns.
+            partition_cols (tuple, optional): Columns to partition the dataset by. Defaults to ('scrape_date',).
+            replace (bool, optional): Whether to replace the partitions that are written, e.g. a rerun of the same day,
+                                      instead of adding files next to them. Defaults to True.
+
+        Returns:
+            Path: The folder of the (first) partition written.
+        '''
+        table = _with_string_nulls(pa.Table.from_pandas(df, preserve_index=False))
+        pq.write_to_dataset(table, str(self.dataset_path(dataset)), partition_cols=list(partition_cols),
+                            compression=self.compression,
+                            existing_data_behavior='delete_matching' if replace else 'overwrite_or_ignore',
+                            basename_template='part-' + pd.Timestamp.now().strftime('%Y%m%d%H%M%S%f') + '-{i}.parquet')
+
+        first = df.iloc[0] if len(df) else None
+        return self.partition_path(dataset, **{c: first[c] for c in partition_cols}) if first is not None else self.dataset_path(dataset)
+
+    def read(self, dataset, columns=None, filters=None):
+        '''
+        Read a dataset, loading only the given columns and the partitions and row groups matching the filters.
+
+        Args:
+            dataset (str): Name of the dataset.
+            columns (list, optional): The columns to read. Defaults to all of them.
+            filters (list, optional): pyarrow filters, e.g. [('scrape_date', '=', '2024-04-12')]. Defaults to None.
+
+        Returns:
+            pd.DataFrame: The rows of the dataset.
+        '''
+        return read_frame(self.dataset_path(dataset), columns, filters)
+
+    def partitions(self, dataset, column):
+        '''
+        Return the sorted values of a partition column of a dataset, e.g. all the scrape dates.
+        '''
+        path = self.dataset_path(dataset)
+        if not path.exists():
+            return []
+        return sorted({p.name.split('=', 1)[1] for p in path.rglob(f'{column}=*') if p.is_dir()})
+
+    def drop_partition(self, dataset, **partition):
+        '''
+        Delete a partition of a dataset, e.g. before replacing all the donors of a campaign.
+        '''
+        shutil.rmtree(self.partition_path(dataset, **partition), ignore_errors=True)
+
+    def write_donors_csv(self, csv_path, short_url, scrape_date, start_offset=0, chunksize=100000):
+        '''
+        Publish the donors appended to a CSV file since start_offset into the `donors` dataset, with typed columns.
+
+        The CSV is read in chunks, so publishing a large campaign never loads it whole into memory.
+
+        Args:
+            csv_path (str or Path): The donorsinfo_appended CSV file of the campaign.
+            short_url (str): The campaign.
+            scrape_date (str): The scrape date partition to write into.
+            start_offset (int, optional): Byte offset in the CSV where the new rows start. Defaults to 0.
+            chunksize (int, optional): Number of rows converted at a time. Defaults to 100000.
+
+        Returns:
+            int: Number of rows written.
+        '''
+        if os.path.getsize(csv_path) <= start_offset:
+            return 0
+
+        path = self.partition_path('donors', short_url=short_url, scrape_date=scrape_date)
+        path.mkdir(parents=True, exist_ok=True)
+        file_path = path / ('part-' + pd.Timestamp.now().strftime('%Y%m%d%H%M%S%f') + '.parquet')
+
+        rows = 0
+        writer = None
+        with open(csv_path, 'rb') as fh:
+            header = fh.readline()
+            columns = pd.read_csv(io.BytesIO(header)).columns
+            schema = self._donors_schema(columns)
+            if start_offset > len(header):
+                fh.seek(start_offset)
+
+            try:
+                for chunk in pd.read_csv(fh, names=columns, header=None, chunksize=chunksize, dtype=str):
+                    table = pa.Table.from_pandas(self._type_donors(chunk), schema=schema, preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(str(file_path), schema, compression=self.compression)
+                    writer.write_table(table)
+                    rows += len(chunk)
+            finally:
+                if writer is not None:
+                    writer.close()
+
+        return rows
+
+    def _donors_schema(self, columns):
+        fields = []
+        for column in columns:
+            if column == 'short_url':
+                continue
+            if column in DONOR_INT_COLUMNS:
+                fields.append(pa.field(column, pa.int64()))
+            elif column in DONOR_BOOL_COLUMNS:
+                fields.append(pa.field(column, pa.bool_()))
+            else:
+                fields.append(pa.field(column, pa.string()))
+        return pa.schema(fields)
+
+    def _type_donors(self, df):
+        # short_url is carried by the partition folder
+        df = df.drop(columns=['short_url'], errors='ignore')
+        for column in DONOR_INT_COLUMNS:
+            if column in df:
+                df[column] = pd.to_numeric(df[column]).astype('Int64')
+        for column in DONOR_BOOL_COLUMNS:
+            if column in df:
+                df[column] = df[column].map({'True': True, 'False': False}).astype('boolean')
+        return df
@@ -6,9 +6,12 @@ setup(
     install_requires=[
         "dagster",
         "dagster-cloud",
-        "beautifulsoup4==4.11.1",
+        "lxml",
         "pandas==1.5.3",
+        "pyarrow",
+        "requests",
         "selenium==4.19.0"
     ],
     extras_require={"dev": ["dagster-webserver", "pytest"]},
+    entry_points={"console_scripts": ["kitabisa-scraper=modules.cli:main"]},
 )